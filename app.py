@@ -1,12 +1,261 @@
 # furniture_shop_with_orders.py
-import tkinter as tk
-from tkinter import ttk, messagebox
+import argparse
+import functools
+import logging
 import sqlite3
+import sys
+import tkinter as tk
+import uuid
+from tkinter import ttk, messagebox, filedialog
+from bisect import bisect_left
 from datetime import datetime
 
+from database import DB_PATH, DEFAULT_PROFILE, connect, migrate
+from importer import BulkImporter
+from query_log import SLOW_MS, STATS, InstrumentedConnection
+from render_profile import PROFILER, TRACE_FILE, traced, traced_dialog
+from search_index import PrefixIndex
+from services import (ORDER_STATUSES, PAGE_SIZE, OrderService, OutOfStockError, ProductCache, ReportService,
+                      ReservationService, ShopError, ShopRepository)
+from worker import DbWorker
+
+# Пауза после последнего нажатия клавиши перед поиском по мере ввода, мс
+SEARCH_DELAY_MS = 200
+
+# Куда app.py --profile пишет статистику запросов при выходе
+QUERY_STATS_FILE = 'query_stats.json'
+
+# Вкладки, данные которых загружаются при первом открытии (индексы в Notebook)
+CUSTOMERS_TAB, CATEGORIES_TAB, ORDERS_TAB, REPORTS_TAB = 1, 2, 3, 5
+
+# Группировка отчёта о выручке: подпись в списке -> период ReportService.revenue
+REPORT_PERIODS = {'По дням': 'day', 'По неделям': 'week', 'По месяцам': 'month'}
+
+
+def longest_increasing_run(positions):
+    """Индексы элементов, образующих наибольшую возрастающую подпоследовательность"""
+    tails, tails_idx, parents = [], [], [None] * len(positions)
+    for i, pos in enumerate(positions):
+        k = bisect_left(tails, pos)
+        if k == len(tails):
+            tails.append(pos)
+            tails_idx.append(i)
+        else:
+            tails[k] = pos
+            tails_idx[k] = i
+        parents[i] = tails_idx[k - 1] if k else None
+    
+    result = set()
+    i = tails_idx[-1] if tails_idx else None
+    while i is not None:
+        result.add(i)
+        i = parents[i]
+    return result
+
+
+def lazy_tab(tab):
+    """Метод загрузки вкладки tab: пока её не открывали, вызовы пропускаются — данные загрузятся при открытии"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if tab in self.pending_tabs:
+                return None
+            return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class TreeSync:
+    """Инкрементальная синхронизация Treeview с результатом запроса.
+    
+    Элементы таблицы используют id строки как iid, поэтому при обновлении
+    изменённые строки правятся на месте, новые вставляются, исчезнувшие
+    удаляются, а порядок восстанавливается минимальным числом перемещений.
+    """
+    
+    def __init__(self, tree):
+        self.tree = tree
+        self.items = {}   # row_id -> значения в таблице
+        self.order = []   # row_id в порядке отображения
+        self.seen = None
+    
+    def begin(self):
+        """Начать полную сверку"""
+        self.seen = []
+    
+    def update(self, rows):
+        """Применить отформатированные строки (первый столбец — id)"""
+        for values in rows:
+            values = tuple(values)
+            row_id = values[0]
+            old = self.items.get(row_id)
+            if old is None:
+                self.tree.insert('', 'end', iid=str(row_id), values=values)
+                self.order.append(row_id)
+            else:
+                if old != values:
+                    self.tree.item(str(row_id), values=values)
+                if self.seen is None and self.order[-1] != row_id:
+                    # Дозагрузка страницы: строка должна оказаться в конце
+                    self.order.remove(row_id)
+                    self.order.append(row_id)
+                    self.tree.move(str(row_id), '', 'end')
+            self.items[row_id] = values
+            if self.seen is not None:
+                self.seen.append(row_id)
+    
+    def finish(self):
+        """Удалить строки, не попавшие в сверку, и восстановить порядок"""
+        seen, self.seen = self.seen, None
+        wanted = set(seen)
+        stale = [row_id for row_id in self.order if row_id not in wanted]
+        if stale:
+            self.tree.delete(*(str(row_id) for row_id in stale))
+            for row_id in stale:
+                del self.items[row_id]
+            self.order = [row_id for row_id in self.order if row_id in wanted]
+        
+        if self.order != seen:
+            target = {row_id: i for i, row_id in enumerate(seen)}
+            keep = longest_increasing_run([target[row_id] for row_id in self.order])
+            stay = {self.order[i] for i in keep}
+            current = list(self.order)
+            for i, row_id in enumerate(seen):
+                if row_id not in stay:
+                    # Ставим строку сразу после её соседа из новой выборки
+                    pos = current.index(seen[i - 1]) + 1 if i else 0
+                    self.tree.move(str(row_id), '', pos)
+                    current.remove(row_id)
+                    current.insert(current.index(seen[i - 1]) + 1 if i else 0, row_id)
+            self.order = seen
+    
+    def replace(self, rows):
+        """Полная сверка таблицы с новым набором строк"""
+        self.begin()
+        self.update(rows)
+        self.finish()
+    
+    def refresh_row(self, values):
+        """Обновить одну уже показанную строку"""
+        values = tuple(values)
+        row_id = values[0]
+        if self.items.get(row_id) != values:
+            self.tree.item(str(row_id), values=values)
+            self.items[row_id] = values
+    
+    def remove(self, row_id):
+        """Удалить одну строку"""
+        if row_id in self.items:
+            self.tree.delete(str(row_id))
+            del self.items[row_id]
+            self.order.remove(row_id)
+    
+    def __contains__(self, row_id):
+        return row_id in self.items
+    
+    def __len__(self):
+        return len(self.order)
+
+
+class KeysetPager:
+    """Постраничная подгрузка строк в Treeview при прокрутке.
+    
+    Страницы запрашиваются в фоновом потоке; новая выборка отменяет
+    ещё не завершённую предыдущую. Ошибка запроса передаётся on_error(e),
+    а без него — обработчику исключений Tk.
+    """
+    
+    def __init__(self, tree, scrollbar, format_row, worker, key, page_size=PAGE_SIZE, on_error=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.worker = worker
+        self.key = key
+        self.page_size = page_size
+        self.on_error = on_error
+        self.sync = TreeSync(tree)
+        self.fetch_page = None
+        self.last_row = None
+        self.fetched = 0
+        self.exhausted = True
+        self.loading = False
+        self.tree.configure(yscrollcommand=self.on_scroll)
+    
+    def reset(self, fetch_page):
+        """Начать выборку заново: fetch_page(conn, last_row, limit) -> rows"""
+        self.fetch_page = fetch_page
+        self.load_first(self.page_size)
+    
+    def reload(self):
+        """Перечитать уже загруженные строки, сохранив фильтр и прокрутку"""
+        if self.fetch_page is not None:
+            self.load_first(max(self.page_size, len(self.sync)))
+    
+    def load_first(self, limit):
+        """Сверить таблицу с первыми limit строками выборки"""
+        self.sync.begin()
+        self.request(None, limit, finish=True)
+    
+    @traced
+    def load_more(self):
+        """Загрузить следующую страницу после последней показанной строки"""
+        if not self.exhausted and not self.loading:
+            self.request(self.last_row, self.page_size, finish=False)
+    
+    def request(self, last_row, limit, finish):
+        """Запросить страницу в фоновом потоке"""
+        fetch_page = self.fetch_page
+        self.last_row = last_row
+        self.fetched = 0
+        self.loading = True
+        self.worker.submit(lambda conn: fetch_page(conn, last_row, limit),
+                           on_chunk=self.add_rows,
+                           on_done=lambda: self.page_loaded(limit, finish),
+                           on_error=lambda e: self.page_failed(e, finish),
+                           key=self.key)
+    
+    def add_rows(self, rows):
+        """Показать очередную порцию строк"""
+        with PROFILER.span('format'):
+            values = [self.format_row(row) for row in rows]
+        with PROFILER.span('insert'):
+            self.sync.update(values)
+        self.last_row = rows[-1]
+        self.fetched += len(rows)
+    
+    def page_loaded(self, limit, finish):
+        """Страница получена целиком"""
+        if finish:
+            with PROFILER.span('insert'):
+                self.sync.finish()
+        self.loading = False
+        self.exhausted = self.fetched < limit
+        PROFILER.layout(self.tree)
+    
+    def page_failed(self, error, finish):
+        """Страница не получена: снять признак загрузки, чтобы прокрутка могла повторить запрос"""
+        self.loading = False
+        if finish:
+            # Сверка не завершена: уже показанные строки остаются, дозагрузка — после новой выборки
+            self.sync.seen = None
+            self.exhausted = True
+        if self.on_error is None:
+            raise error
+        self.on_error(error)
+    
+    def on_scroll(self, first, last):
+        """Обработчик yscrollcommand: догружаем страницу у конца списка"""
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9:
+            self.load_more()
+
+
 class FurnitureShop:
-    def __init__(self, root):
+    def __init__(self, root, db_profile=DEFAULT_PROFILE, profile_queries=False, trace_file=None):
         self.root = root
+        # С trace_file замеряется время отрисовки (render_profile), трасса пишется при выходе
+        self.trace_file = trace_file
+        PROFILER.enabled = trace_file is not None
         self.root.title("🏠 Мебельный магазин - Полная версия")
         self.root.geometry("1300x750")
         
@@ -27,11 +276,31 @@ class FurnitureShop:
         # Настройка стилей
         self.setup_styles()
         
-        # База данных
-        self.conn = sqlite3.connect('furniture_shop.db')
-        self.cursor = self.conn.cursor()
+        # База данных; с profile_queries все запросы замеряются (query_log)
+        self.profile_queries = profile_queries
+        factory = InstrumentedConnection if profile_queries else sqlite3.Connection
+        self.conn = connect(DB_PATH, db_profile, factory=factory)
+        self.repo = ShopRepository(self.conn)
         self.create_db()
-        self.add_test_data()
+        self.fts_enabled = self.repo.fts_enabled
+        self.product_cache = ProductCache(self.repo)
+        self.orders = OrderService(self.conn)
+        # Корзина окна держит резервы товаров, чтобы их не продала другая касса
+        self.reservations = ReservationService(self.conn, uuid.uuid4().hex)
+        
+        # Запросы для таблиц выполняются в фоновом потоке
+        self.worker = DbWorker(self.root, DB_PATH, db_profile, factory=factory)
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+        
+        # Вкладка -> загрузка её данных при первом открытии (см. load_data)
+        self.pending_tabs = {}
+        
+        # Индексы поиска по мере ввода строятся в фоне; до этого ищет SQLite
+        self.product_index = None
+        self.customer_index = None
+        self.stale_products = set()
+        self.stale_customers = set()
+        self.search_jobs = {}
         
         # Текущий заказ
         self.current_order = {
@@ -44,6 +313,7 @@ class FurnitureShop:
         # Создание интерфейса
         self.create_widgets()
         self.load_data()
+        self.load_search_indexes()
     
     def setup_styles(self):
         """Настройка стилей"""
@@ -107,111 +377,29 @@ class FurnitureShop:
                  foreground=[('selected', self.colors['primary'])])
     
     def create_db(self):
-        """Создание таблиц"""
-        self.cursor.executescript('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL
-            );
-            
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                stock INTEGER DEFAULT 0,
-                category_id INTEGER,
-                material TEXT,
-                color TEXT,
-                description TEXT,
-                FOREIGN KEY (category_id) REFERENCES categories (id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                phone TEXT,
-                email TEXT UNIQUE
-            );
-            
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER,
-                order_date TEXT,
-                total_amount REAL,
-                status TEXT DEFAULT 'Новый',
-                payment_method TEXT,
-                FOREIGN KEY (customer_id) REFERENCES customers (id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER,
-                product_id INTEGER,
-                quantity INTEGER,
-                price_per_unit REAL,
-                subtotal REAL,
-                FOREIGN KEY (order_id) REFERENCES orders (id),
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            );
-        ''')
-        self.conn.commit()
-    
-    def add_test_data(self):
-        """Добавление тестовых данных"""
-        # Категории
-        self.cursor.execute("SELECT COUNT(*) FROM categories")
-        if self.cursor.fetchone()[0] == 0:
-            categories = ['Диваны', 'Кресла', 'Столы', 'Стулья', 'Шкафы', 'Кровати', 'Матрасы', 'Комоды']
-            for cat in categories:
-                self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (cat,))
-        
-        # Товары
-        self.cursor.execute("SELECT COUNT(*) FROM products")
-        if self.cursor.fetchone()[0] == 0:
-            products = [
-                ('Диван "Комфорт"', 45000, 5, 1, 'Ткань, дерево', 'Бежевый', 'Мягкий удобный диван'),
-                ('Диван "Престиж"', 65000, 3, 1, 'Кожа, дерево', 'Коричневый', 'Кожаный диван'),
-                ('Диван "Маленький"', 25000, 7, 1, 'Ткань', 'Серый', 'Компактный диван'),
-                ('Кресло "Релакс"', 15000, 8, 2, 'Ткань, металл', 'Серый', 'Удобное кресло'),
-                ('Кресло-качалка', 18000, 4, 2, 'Дерево', 'Натуральный', 'Для уюта'),
-                ('Стол обеденный', 25000, 4, 3, 'Дерево', 'Дуб', 'Большой стол'),
-                ('Стол компьютерный', 12000, 6, 3, 'ЛДСП', 'Белый', 'С полками'),
-                ('Стул деревянный', 5000, 15, 4, 'Дерево', 'Натуральный', 'Удобный стул'),
-                ('Стул мягкий', 7000, 10, 4, 'Ткань, металл', 'Синий', 'С подлокотниками'),
-                ('Шкаф-купе', 55000, 2, 5, 'ЛДСП', 'Белый', 'Вместительный шкаф'),
-                ('Шкаф для одежды', 35000, 3, 5, 'Дерево', 'Венге', 'С зеркалом'),
-                ('Кровать двуспальная', 35000, 3, 6, 'Дерево', 'Венге', 'Спальная кровать'),
-                ('Кровать односпальная', 18000, 5, 6, 'Металл', 'Белый', 'Для подростка'),
-                ('Матрас ортопедический', 15000, 8, 7, 'Пена', 'Белый', 'Жесткий'),
-                ('Матрас мягкий', 10000, 6, 7, 'Пружины', 'Бежевый', 'Мягкий'),
-                ('Комод', 22000, 4, 8, 'Дерево', 'Дуб', '6 ящиков')
-            ]
-            for p in products:
-                self.cursor.execute('''
-                    INSERT INTO products (name, price, stock, category_id, material, color, description)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', p)
-        
-        # Клиенты
-        self.cursor.execute("SELECT COUNT(*) FROM customers")
-        if self.cursor.fetchone()[0] == 0:
-            customers = [
-                ('Иван', 'Петров', '+7 (999) 123-45-67', 'ivan@mail.com'),
-                ('Мария', 'Иванова', '+7 (999) 765-43-21', 'maria@mail.com'),
-                ('Петр', 'Сидоров', '+7 (999) 555-55-55', 'petr@mail.com'),
-                ('Анна', 'Козлова', '+7 (999) 111-22-33', 'anna@mail.com'),
-                ('Сергей', 'Смирнов', '+7 (999) 444-55-66', 'sergey@mail.com'),
-                ('Елена', 'Попова', '+7 (999) 777-88-99', 'elena@mail.com')
-            ]
-            for c in customers:
-                self.cursor.execute('''
-                    INSERT INTO customers (first_name, last_name, phone, email)
-                    VALUES (?, ?, ?, ?)
-                ''', c)
-        
-        self.conn.commit()
+        """Создание и обновление схемы; тестовые данные — только в базу без версии схемы"""
+        # Проверки пустых таблиц нужны один раз, а не при каждом запуске
+        fresh = self.conn.execute('PRAGMA user_version').fetchone()[0] == 0
+        migrate(self.conn)
+        if fresh:
+            self.repo.add_test_data()
+    
+    def close(self):
+        """Закрытие приложения"""
+        self.worker.close()
+        self.reservations.release()
+        self.conn.close()
+        self.root.destroy()
+        if self.profile_queries:
+            print(STATS.report())
+            STATS.dump(QUERY_STATS_FILE)
+            print(f"Статистика запросов записана в {QUERY_STATS_FILE}")
+        if self.trace_file:
+            print(PROFILER.report())
+            PROFILER.dump(self.trace_file)
+            print(f"Трасса интерфейса записана в {self.trace_file}")
     
+    @traced
     def create_widgets(self):
         """Создание интерфейса"""
         # Заголовок
@@ -236,6 +424,16 @@ class FurnitureShop:
         self.create_categories_tab()
         self.create_orders_tab()
         self.create_new_order_tab()
+        self.create_reports_tab()
+        if self.profile_queries:
+            self.create_debug_tab()
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed, add='+')
+    
+    def on_tab_changed(self, event=None):
+        """Загрузить данные вкладки при первом открытии"""
+        load = self.pending_tabs.pop(self.notebook.index('current'), None)
+        if load is not None:
+            load()
     
     def create_products_tab(self):
         """Вкладка товаров"""
@@ -255,6 +453,7 @@ class FurnitureShop:
             ('➕ Добавить', self.add_product, self.colors['success']),
             ('✏️ Редактировать', self.edit_product, self.colors['secondary']),
             ('🗑️ Удалить', self.delete_product, self.colors['warning']),
+            ('📥 Импорт', lambda: self.import_file('products'), self.colors['secondary']),
             ('🔄 Обновить', self.load_products, self.colors['primary']),
             ('🛒 В заказ', self.add_to_order_from_products, self.colors['gold'])
         ]
@@ -280,6 +479,7 @@ class FurnitureShop:
         self.search_entry = tk.Entry(search_frame, font=('Segoe UI', 10),
                                     width=20, bd=1, relief='solid')
         self.search_entry.pack(side='left', padx=5)
+        self.search_entry.bind('<KeyRelease>', lambda e: self.schedule_search(self.search_products))
         
         tk.Button(search_frame, text="Найти", command=self.search_products,
                  bg=self.colors['secondary'], fg='white', font=('Segoe UI', 10),
@@ -317,9 +517,10 @@ class FurnitureShop:
         # Двойной клик для добавления в заказ
         self.products_tree.bind('<Double-1>', lambda e: self.add_to_order_from_products())
         
-        # Скролл
+        # Скролл с подгрузкой страниц
         scroll = ttk.Scrollbar(table_frame, orient='vertical', command=self.products_tree.yview)
-        self.products_tree.configure(yscrollcommand=scroll.set)
+        self.products_pager = KeysetPager(self.products_tree, scroll, self.cache_product_row,
+                                          self.worker, 'products')
         
         self.products_tree.pack(side='left', fill='both', expand=True)
         scroll.pack(side='right', fill='y')
@@ -342,7 +543,9 @@ class FurnitureShop:
             ('➕ Добавить', self.add_customer, self.colors['success']),
             ('✏️ Редактировать', self.edit_customer, self.colors['secondary']),
             ('🗑️ Удалить', self.delete_customer, self.colors['warning']),
+            ('📥 Импорт', lambda: self.import_file('customers'), self.colors['secondary']),
             ('🔄 Обновить', self.load_customers, self.colors['primary']),
+            ('📇 Карточка', self.view_customer_details, self.colors['secondary']),
             ('📝 Новый заказ', self.create_order_for_customer, self.colors['gold'])
         ]
         
@@ -366,6 +569,7 @@ class FurnitureShop:
         self.customer_search = tk.Entry(search_frame, font=('Segoe UI', 10),
                                        width=20, bd=1, relief='solid')
         self.customer_search.pack(side='left', padx=5)
+        self.customer_search.bind('<KeyRelease>', lambda e: self.schedule_search(self.search_customers))
         
         tk.Button(search_frame, text="Найти", command=self.search_customers,
                  bg=self.colors['secondary'], fg='white', font=('Segoe UI', 10),
@@ -375,7 +579,8 @@ class FurnitureShop:
         table_frame = tk.Frame(frame, bg=self.colors['white'], bd=1, relief='solid')
         table_frame.pack(fill='both', expand=True, padx=10, pady=5)
         
-        columns = ('ID', '👤 Имя', '👤 Фамилия', '📞 Телефон', '✉️ Email')
+        columns = ('ID', '👤 Имя', '👤 Фамилия', '📞 Телефон', '✉️ Email',
+                   '🛒 Заказов', '💰 Сумма покупок', '📅 Последний заказ', '⭐ Любимая категория')
         self.customers_tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=15)
         
         # Заголовки
@@ -387,7 +592,11 @@ class FurnitureShop:
         self.customers_tree.column('👤 Имя', width=150)
         self.customers_tree.column('👤 Фамилия', width=150)
         self.customers_tree.column('📞 Телефон', width=150)
-        self.customers_tree.column('✉️ Email', width=250)
+        self.customers_tree.column('✉️ Email', width=200)
+        self.customers_tree.column('🛒 Заказов', width=80, anchor='center')
+        self.customers_tree.column('💰 Сумма покупок', width=120, anchor='e')
+        self.customers_tree.column('📅 Последний заказ', width=110, anchor='center')
+        self.customers_tree.column('⭐ Любимая категория', width=140)
         
         # Двойной клик для создания заказа
         self.customers_tree.bind('<Double-1>', lambda e: self.create_order_for_customer())
@@ -395,6 +604,7 @@ class FurnitureShop:
         # Скролл
         scroll = ttk.Scrollbar(table_frame, orient='vertical', command=self.customers_tree.yview)
         self.customers_tree.configure(yscrollcommand=scroll.set)
+        self.customers_sync = TreeSync(self.customers_tree)
         
         self.customers_tree.pack(side='left', fill='both', expand=True)
         scroll.pack(side='right', fill='y')
@@ -432,22 +642,27 @@ class FurnitureShop:
         table_frame = tk.Frame(frame, bg=self.colors['white'], bd=1, relief='solid')
         table_frame.pack(fill='both', expand=True, padx=10, pady=5)
         
-        columns = ('ID', '🏷️ Категория', '📦 Товаров')
+        columns = ('ID', '🏷️ Категория', '📦 Товаров', '🏬 На складе', '💰 Стоимость запаса')
         self.categories_tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=15)
         
         # Заголовки
         self.categories_tree.heading('ID', text='ID')
         self.categories_tree.heading('🏷️ Категория', text='Категория')
         self.categories_tree.heading('📦 Товаров', text='Кол-во товаров')
+        self.categories_tree.heading('🏬 На складе', text='На складе')
+        self.categories_tree.heading('💰 Стоимость запаса', text='Стоимость запаса')
         
         # Ширина колонок
         self.categories_tree.column('ID', width=100, anchor='center')
         self.categories_tree.column('🏷️ Категория', width=300)
         self.categories_tree.column('📦 Товаров', width=200, anchor='center')
+        self.categories_tree.column('🏬 На складе', width=150, anchor='center')
+        self.categories_tree.column('💰 Стоимость запаса', width=200, anchor='e')
         
         # Скролл
         scroll = ttk.Scrollbar(table_frame, orient='vertical', command=self.categories_tree.yview)
         self.categories_tree.configure(yscrollcommand=scroll.set)
+        self.categories_sync = TreeSync(self.categories_tree)
         
         self.categories_tree.pack(side='left', fill='both', expand=True)
         scroll.pack(side='right', fill='y')
@@ -489,12 +704,24 @@ class FurnitureShop:
         tk.Label(filter_frame, text="Статус:", 
                 bg=self.colors['white'], font=('Segoe UI', 10)).pack(side='left')
         
-        self.status_filter = ttk.Combobox(filter_frame, values=['Все', 'Новый', 'В обработке', 'Доставлен', 'Отменен'], 
+        self.status_filter = ttk.Combobox(filter_frame, values=['Все'] + ORDER_STATUSES, 
                                          width=12, font=('Segoe UI', 10))
         self.status_filter.set('Все')
         self.status_filter.pack(side='left', padx=5)
         self.status_filter.bind('<<ComboboxSelected>>', self.filter_orders_by_status)
         
+        # Период: пусто — без границы, Enter применяет
+        tk.Label(filter_frame, text="С:", 
+                bg=self.colors['white'], font=('Segoe UI', 10)).pack(side='left', padx=(10, 0))
+        self.orders_start = tk.Entry(filter_frame, font=('Segoe UI', 10), width=11)
+        self.orders_start.pack(side='left', padx=5)
+        tk.Label(filter_frame, text="По:", 
+                bg=self.colors['white'], font=('Segoe UI', 10)).pack(side='left')
+        self.orders_end = tk.Entry(filter_frame, font=('Segoe UI', 10), width=11)
+        self.orders_end.pack(side='left', padx=5)
+        for entry in (self.orders_start, self.orders_end):
+            entry.bind('<Return>', self.filter_orders_by_status)
+        
         # Таблица заказов
         table_frame = tk.Frame(frame, bg=self.colors['white'], bd=1, relief='solid')
         table_frame.pack(fill='both', expand=True, padx=10, pady=5)
@@ -521,9 +748,10 @@ class FurnitureShop:
         # Двойной клик для просмотра деталей
         self.orders_tree.bind('<Double-1>', lambda e: self.view_order_details())
         
-        # Скролл
+        # Скролл с подгрузкой более старых заказов
         scroll = ttk.Scrollbar(table_frame, orient='vertical', command=self.orders_tree.yview)
-        self.orders_tree.configure(yscrollcommand=scroll.set)
+        self.orders_pager = KeysetPager(self.orders_tree, scroll, self.format_order_row,
+                                        self.worker, 'orders')
         
         self.orders_tree.pack(side='left', fill='both', expand=True)
         scroll.pack(side='right', fill='y')
@@ -633,219 +861,480 @@ class FurnitureShop:
                  font=('Segoe UI', 12, 'bold'), padx=30, pady=8,
                  borderwidth=0, cursor='hand2').pack(side='right', padx=20, pady=10)
     
+    def create_reports_tab(self):
+        """Вкладка отчётов о продажах"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text='📊 Отчёты')
+        
+        # Верхняя панель: группировка и период
+        top_frame = tk.Frame(frame, bg=self.colors['white'], height=60)
+        top_frame.pack(fill='x', padx=10, pady=10)
+        top_frame.pack_propagate(False)
+        
+        tk.Label(top_frame, text="Выручка:", bg=self.colors['white'],
+                font=('Segoe UI', 10)).pack(side='left', padx=(10, 0))
+        self.report_period = ttk.Combobox(top_frame, values=list(REPORT_PERIODS), width=12,
+                                          font=('Segoe UI', 10), state='readonly')
+        self.report_period.set('По дням')
+        self.report_period.pack(side='left', padx=5)
+        self.report_period.bind('<<ComboboxSelected>>', lambda e: self.load_reports())
+        
+        tk.Label(top_frame, text="С:", bg=self.colors['white'],
+                font=('Segoe UI', 10)).pack(side='left', padx=(15, 0))
+        self.report_start = tk.Entry(top_frame, font=('Segoe UI', 10), width=12)
+        self.report_start.pack(side='left', padx=5)
+        tk.Label(top_frame, text="По:", bg=self.colors['white'],
+                font=('Segoe UI', 10)).pack(side='left')
+        self.report_end = tk.Entry(top_frame, font=('Segoe UI', 10), width=12)
+        self.report_end.pack(side='left', padx=5)
+        tk.Label(top_frame, text="ГГГГ-ММ-ДД, пусто — за всё время", bg=self.colors['white'],
+                fg=self.colors['border'], font=('Segoe UI', 9)).pack(side='left', padx=5)
+        
+        tk.Button(top_frame, text='🔄 Показать', command=self.load_reports,
+                 bg=self.colors['primary'], fg='white', font=('Segoe UI', 10),
+                 padx=15, pady=5, borderwidth=0, cursor='hand2').pack(side='left', padx=10)
+        
+        # Итог за период
+        self.report_summary = tk.Label(frame, text="", bg=self.colors['bg'], fg=self.colors['primary'],
+                                       font=('Segoe UI', 12, 'bold'), anchor='w')
+        self.report_summary.pack(fill='x', padx=20)
+        
+        # Четыре таблицы сеткой 2×2
+        grid = tk.Frame(frame, bg=self.colors['bg'])
+        grid.pack(fill='both', expand=True, padx=10, pady=5)
+        grid.columnconfigure((0, 1), weight=1, uniform='reports')
+        grid.rowconfigure((0, 1), weight=1, uniform='reports')
+        
+        self.revenue_tree, self.revenue_sync = self.create_report_table(
+            grid, 0, 0, '📈 Выручка', [('Период', 110, 'w'), ('Заказов', 80, 'center'),
+                                      ('Выручка', 130, 'e'), ('Средний чек', 110, 'e')])
+        self.top_products_tree, self.top_products_sync = self.create_report_table(
+            grid, 0, 1, '🏆 Топ товаров', [('ID', 60, 'center'), ('Товар', 220, 'w'),
+                                          ('Продано', 80, 'center'), ('Выручка', 130, 'e')])
+        self.category_mix_tree, self.category_mix_sync = self.create_report_table(
+            grid, 1, 0, '🏷️ Категории', [('Категория', 160, 'w'), ('Продано', 80, 'center'),
+                                        ('Выручка', 130, 'e'), ('Доля', 70, 'e')])
+        self.payment_tree, self.payment_sync = self.create_report_table(
+            grid, 1, 1, '💳 Оплата', [('Способ', 120, 'w'), ('Заказов', 80, 'center'),
+                                     ('Выручка', 130, 'e'), ('Доля', 70, 'e')])
+    
+    def create_report_table(self, parent, row, column, title, columns):
+        """Таблица отчёта в рамке с заголовком: (дерево, TreeSync)"""
+        box = tk.LabelFrame(parent, text=title, bg=self.colors['white'], fg=self.colors['primary'],
+                            font=('Segoe UI', 10, 'bold'))
+        box.grid(row=row, column=column, sticky='nsew', padx=5, pady=5)
+        
+        tree = ttk.Treeview(box, columns=[name for name, width, anchor in columns], show='headings', height=8)
+        for name, width, anchor in columns:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor=anchor)
+        
+        scroll = ttk.Scrollbar(box, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scroll.pack(side='right', fill='y')
+        return tree, TreeSync(tree)
+    
+    def create_debug_tab(self):
+        """Вкладка отладки (только с --profile): статистика запросов к базе"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text='🐞 Запросы')
+        
+        top_frame = tk.Frame(frame, bg=self.colors['white'], height=60)
+        top_frame.pack(fill='x', padx=10, pady=10)
+        top_frame.pack_propagate(False)
+        
+        buttons = [
+            ('🔄 Обновить', self.show_query_stats, self.colors['primary']),
+            ('🧹 Сбросить', lambda: (STATS.reset(), self.show_query_stats()), self.colors['warning']),
+            ('💾 Сохранить JSON', self.save_query_stats, self.colors['secondary'])
+        ]
+        for text, command, color in buttons:
+            tk.Button(top_frame, text=text, command=command, bg=color, fg='white', font=('Segoe UI', 10),
+                     padx=15, pady=5, borderwidth=0, cursor='hand2').pack(side='left', padx=2)
+        
+        text_frame = tk.Frame(frame, bg=self.colors['white'], bd=1, relief='solid')
+        text_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.query_stats_text = tk.Text(text_frame, font=('Consolas', 9), wrap='none')
+        scroll = ttk.Scrollbar(text_frame, orient='vertical', command=self.query_stats_text.yview)
+        self.query_stats_text.configure(yscrollcommand=scroll.set)
+        self.query_stats_text.pack(side='left', fill='both', expand=True)
+        scroll.pack(side='right', fill='y')
+        
+        # Статистика обновляется при каждом открытии вкладки
+        self.notebook.bind('<<NotebookTabChanged>>',
+                           lambda e: self.notebook.select() == str(frame) and self.show_query_stats(), add='+')
+    
+    def show_query_stats(self):
+        """Показать текущую статистику запросов"""
+        self.query_stats_text.delete('1.0', tk.END)
+        self.query_stats_text.insert('1.0', STATS.report(limit=100))
+    
+    def save_query_stats(self):
+        """Сохранить статистику запросов в JSON"""
+        path = filedialog.asksaveasfilename(defaultextension='.json', initialfile=QUERY_STATS_FILE,
+                                            filetypes=[('JSON', '*.json')])
+        if path:
+            STATS.dump(path)
+            messagebox.showinfo("✅ Успех", f"Статистика записана в {path}")
+    
     # ========== МЕТОДЫ ЗАГРУЗКИ ДАННЫХ ==========
     
+    @traced
     def load_data(self):
-        """Загрузка всех данных"""
+        """Загрузка данных: сразу — первая страница товаров, остальные вкладки — при первом открытии"""
         self.load_products()
-        self.load_customers()
-        self.load_categories()
-        self.load_orders()
+        self.pending_tabs = {
+            CUSTOMERS_TAB: self.load_customers,
+            CATEGORIES_TAB: self.load_categories,
+            ORDERS_TAB: self.load_orders,
+            REPORTS_TAB: self.load_reports,
+        }
+        # Открытая вкладка (например, после перезагрузки данных) загружается сразу
+        self.on_tab_changed()
     
+    @traced
     def load_products(self):
         """Загрузка товаров"""
-        for row in self.products_tree.get_children():
-            self.products_tree.delete(row)
-        
-        self.cursor.execute('''
-            SELECT p.id, p.name, p.price, p.stock, c.name, p.material, p.color
-            FROM products p
-            LEFT JOIN categories c ON p.category_id = c.id
-            ORDER BY p.name
-        ''')
-        for row in self.cursor.fetchall():
-            formatted_row = (
-                row[0],
-                row[1],
-                f"{row[2]:,.0f} ₽",
-                f"{row[3]} шт.",
-                row[4],
-                row[5],
-                row[6]
-            )
-            self.products_tree.insert('', 'end', values=formatted_row)
+        self.show_products()
+    
+    def show_products(self, category=None):
+        """Показать товары (при необходимости одной категории), загружая только первую страницу"""
+        self.products_pager.reset(
+            lambda conn, last_row, limit: self.background_repo(conn).list_products(last_row, limit, category))
+    
+    def cache_product_row(self, row):
+        """Запомнить товар из строки запроса в кэше и отформатировать для таблицы"""
+        return self.format_product_row(self.product_cache.put(row))
+    
+    @staticmethod
+    def format_product_row(product):
+        """Форматирование строки товара для таблицы"""
+        return (
+            product.id,
+            product.name,
+            f"{product.price:,.0f} ₽",
+            f"{product.stock} шт.",
+            product.category,
+            product.material,
+            product.color
+        )
+    
+    def refresh_product(self, product_id):
+        """Обновить строку одного товара без перезагрузки таблицы"""
+        sync = self.products_pager.sync
+        if product_id not in sync:
+            self.product_cache.discard(product_id)
+            return
+        
+        product = self.product_cache.refresh(product_id)
+        if product is None:
+            sync.remove(product_id)
+        elif product.name == sync.items[product_id][1]:
+            sync.refresh_row(self.format_product_row(product))
+        else:
+            # Название изменилось — строка могла сместиться в сортировке
+            self.products_pager.reload()
+    
+    def load_in_background(self, sync, key, query, format_row=None):
+        """Выполнить query(repo) в фоновом потоке и сверить с результатом таблицу по частям"""
+        sync.begin()
+        
+        def show_chunk(rows):
+            with PROFILER.span('format'):
+                values = [format_row(row) for row in rows] if format_row else rows
+            with PROFILER.span('insert'):
+                sync.update(values)
+        
+        def show_all():
+            with PROFILER.span('insert'):
+                sync.finish()
+            PROFILER.layout(sync.tree)
+        
+        self.worker.submit(
+            lambda conn: query(self.background_repo(conn)),
+            on_chunk=show_chunk,
+            on_done=show_all,
+            on_error=lambda e: messagebox.showerror("❌ Ошибка", f"Не удалось загрузить данные:\n{str(e)}"),
+            key=key)
+    
+    def background_repo(self, conn):
+        """Репозиторий поверх соединения фонового потока"""
+        return ShopRepository(conn, fts_enabled=self.fts_enabled)
     
+    @lazy_tab(CUSTOMERS_TAB)
+    @traced
     def load_customers(self):
         """Загрузка клиентов"""
-        for row in self.customers_tree.get_children():
-            self.customers_tree.delete(row)
-        
-        self.cursor.execute("SELECT id, first_name, last_name, phone, email FROM customers ORDER BY last_name")
-        for row in self.cursor.fetchall():
-            self.customers_tree.insert('', 'end', values=row)
+        self.load_in_background(self.customers_sync, 'customers', ShopRepository.list_customers,
+                                format_row=self.format_customer_row)
+    
+    @staticmethod
+    def format_customer_row(row):
+        """Форматирование строки клиента для таблицы: пустые поля вместо NULL, сводка покупок"""
+        orders, revenue, last_order, favourite = row[5:]
+        return tuple('' if value is None else value for value in row[:5]) + (
+            orders,
+            f"{revenue:,.0f} ₽",
+            (last_order or '')[:10],
+            favourite or ''
+        )
+    
+    def refresh_customer(self, customer_id):
+        """Обновить сводку покупок в строке клиента после заказа или смены статуса"""
+        if customer_id in self.customers_sync:
+            row = self.repo.get_customer(customer_id)
+            if row is None:
+                self.customers_sync.remove(customer_id)
+            else:
+                self.customers_sync.refresh_row(self.format_customer_row(row))
     
+    @lazy_tab(CATEGORIES_TAB)
+    @traced
     def load_categories(self):
         """Загрузка категорий"""
-        for row in self.categories_tree.get_children():
-            self.categories_tree.delete(row)
-        
-        self.cursor.execute('''
-            SELECT c.id, c.name, COUNT(p.id)
-            FROM categories c
-            LEFT JOIN products p ON c.id = p.category_id
-            GROUP BY c.id
-            ORDER BY c.name
-        ''')
-        for row in self.cursor.fetchall():
-            # Добавляем иконку эмодзи в название категории для красоты
-            icon = ''
-            if 'Диван' in row[1]:
-                icon = '🛋️ '
-            elif 'Кресл' in row[1]:
-                icon = '💺 '
-            elif 'Стол' in row[1]:
-                icon = '🪑 '
-            elif 'Стул' in row[1]:
-                icon = '🪑 '
-            elif 'Шкаф' in row[1]:
-                icon = '🗄️ '
-            elif 'Кроват' in row[1]:
-                icon = '🛏️ '
-            elif 'Матрас' in row[1]:
-                icon = '🛏️ '
-            elif 'Комод' in row[1]:
-                icon = '🗄️ '
-            
-            self.categories_tree.insert('', 'end', values=(row[0], f"{icon}{row[1]}", row[2]))
+        self.load_in_background(self.categories_sync, 'categories', ShopRepository.list_categories,
+                                format_row=self.format_category_row)
+    
+    @staticmethod
+    def format_category_row(row):
+        """Форматирование строки категории для таблицы"""
+        # Добавляем иконку эмодзи в название категории для красоты
+        icon = ''
+        if 'Диван' in row[1]:
+            icon = '🛋️ '
+        elif 'Кресл' in row[1]:
+            icon = '💺 '
+        elif 'Стол' in row[1]:
+            icon = '🪑 '
+        elif 'Стул' in row[1]:
+            icon = '🪑 '
+        elif 'Шкаф' in row[1]:
+            icon = '🗄️ '
+        elif 'Кроват' in row[1]:
+            icon = '🛏️ '
+        elif 'Матрас' in row[1]:
+            icon = '🛏️ '
+        elif 'Комод' in row[1]:
+            icon = '🗄️ '
+        
+        return (row[0], f"{icon}{row[1]}", row[2], f"{row[3]} шт.", f"{row[4]:,.0f} ₽")
     
+    @lazy_tab(ORDERS_TAB)
+    @traced
     def load_orders(self):
-        """Загрузка заказов"""
-        for row in self.orders_tree.get_children():
-            self.orders_tree.delete(row)
-        
-        self.cursor.execute('''
-            SELECT o.id, o.order_date, c.first_name || ' ' || c.last_name,
-                   o.total_amount, o.status, o.payment_method
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.id
-            ORDER BY o.id DESC
-        ''')
-        for row in self.cursor.fetchall():
-            payment = row[5] if row[5] else 'Не указан'
-            formatted_row = (
-                row[0],
-                row[1][:16] if row[1] else '',
-                row[2],
-                f"{row[3]:,.0f} ₽",
-                row[4],
-                payment
-            )
-            self.orders_tree.insert('', 'end', values=formatted_row)
+        """Загрузка последней страницы заказов с фильтрами по статусу и периоду; старые — при прокрутке"""
+        status = self.status_filter.get()
+        status = None if status == 'Все' else status
+        try:
+            start, end = self.entry_dates(self.orders_start, self.orders_end)
+        except ValueError:
+            messagebox.showwarning("⚠️ Внимание", "Даты периода вводятся в формате ГГГГ-ММ-ДД")
+            return
+        self.orders_pager.reset(
+            lambda conn, last_row, limit: self.background_repo(conn).list_orders(status, start, end, last_row, limit))
+    
+    @staticmethod
+    def format_order_row(row):
+        """Форматирование строки заказа для таблицы"""
+        payment = row[5] if row[5] else 'Не указан'
+        return (
+            row[0],
+            row[1][:16] if row[1] else '',
+            row[2],
+            f"{row[3]:,.0f} ₽",
+            row[4],
+            payment
+        )
+    
+    def refresh_order(self, order_id):
+        """Обновить строку одного заказа с учётом фильтров по статусу и периоду"""
+        row = self.repo.get_order(order_id)
+        status = self.status_filter.get()
+        try:
+            start, end = self.entry_dates(self.orders_start, self.orders_end)
+        except ValueError:
+            start = end = None
+        day = row[1][:10] if row is not None and row[1] else ''
+        sync = self.orders_pager.sync
+        if (row is None or (status != 'Все' and row[4] != status)
+                or (start and day < start) or (end and day > end)):
+            sync.remove(order_id)
+        elif order_id in sync:
+            sync.refresh_row(self.format_order_row(row))
+        else:
+            self.orders_pager.reload()
+    
+    def entry_dates(self, *entries):
+        """Даты из полей ввода периода; None — без границы"""
+        dates = []
+        for entry in entries:
+            text = entry.get().strip()
+            if text:
+                # Ошибка формата уходит в ValueError с понятным текстом
+                datetime.strptime(text, '%Y-%m-%d')
+            dates.append(text or None)
+        return dates
+    
+    @lazy_tab(REPORTS_TAB)
+    @traced
+    def load_reports(self):
+        """Пересчитать отчёты в фоновом потоке по сводкам продаж"""
+        try:
+            start, end = self.entry_dates(self.report_start, self.report_end)
+        except ValueError:
+            messagebox.showwarning("⚠️ Внимание", "Даты отчёта вводятся в формате ГГГГ-ММ-ДД")
+            return
+        period = REPORT_PERIODS[self.report_period.get()]
+        reports = {}
+        
+        def build(conn):
+            service = ReportService(conn)
+            reports['summary'] = service.summary(start, end)
+            reports['revenue'] = service.revenue(period, start, end)
+            reports['top_products'] = service.top_products(start, end)
+            reports['category_mix'] = service.category_mix(start, end)
+            reports['payments'] = service.payment_split(start, end)
+            return ()
+        
+        self.worker.submit(
+            build, on_done=lambda: self.show_reports(reports),
+            on_error=lambda e: messagebox.showerror("❌ Ошибка", f"Не удалось построить отчёты:\n{str(e)}"),
+            key='reports')
+    
+    def show_reports(self, reports):
+        """Заполнить вкладку отчётов готовыми результатами"""
+        orders, units, revenue, basket = reports['summary']
+        with PROFILER.span('format'):
+            revenue_rows = [(period, count, f"{amount:,.0f} ₽", f"{average:,.0f} ₽")
+                            for period, count, sold, amount, average in reports['revenue']]
+            top_rows = [(product_id, name, f"{sold} шт.", f"{amount:,.0f} ₽")
+                        for product_id, name, sold, amount in reports['top_products']]
+            category_rows = [(name, f"{sold} шт.", f"{amount:,.0f} ₽", f"{share:.1f}%")
+                             for name, sold, amount, share in reports['category_mix']]
+            payment_rows = [(method or 'Не указан', count, f"{amount:,.0f} ₽", f"{share:.1f}%")
+                            for method, count, amount, share in reports['payments']]
+        with PROFILER.span('insert'):
+            self.report_summary.config(
+                text=f"Заказов: {orders}   •   Продано: {units} шт.   •   "
+                     f"Выручка: {revenue:,.0f} ₽   •   Средний чек: {basket:,.0f} ₽")
+            self.revenue_sync.replace(revenue_rows)
+            self.top_products_sync.replace(top_rows)
+            self.category_mix_sync.replace(category_rows)
+            self.payment_sync.replace(payment_rows)
+        PROFILER.layout(self.revenue_sync.tree)
     
     def load_categories_filter(self):
         """Загрузка категорий для фильтра"""
-        self.cursor.execute("SELECT name FROM categories ORDER BY name")
-        categories = [row[0] for row in self.cursor.fetchall()]
-        self.category_filter['values'] = ['Все категории'] + categories
+        self.category_filter['values'] = ['Все категории'] + self.repo.category_names()
         self.category_filter.set('Все категории')
     
     # ========== МЕТОДЫ ПОИСКА И ФИЛЬТРАЦИИ ==========
     
+    def schedule_search(self, search):
+        """Отложить поиск до паузы в наборе: каждое нажатие переносит его"""
+        job = self.search_jobs.pop(search.__name__, None)
+        if job is not None:
+            self.root.after_cancel(job)
+        self.search_jobs[search.__name__] = self.root.after(SEARCH_DELAY_MS, search)
+    
+    @traced
     def search_products(self):
         """Поиск товаров"""
+        self.search_jobs.pop('search_products', None)
         search_term = self.search_entry.get()
+        index = self.product_index
+        if index is None:
+            self.products_pager.reset(
+                lambda conn, last_row, limit: self.background_repo(conn).search_products(search_term, last_row, limit))
+            return
         
-        for row in self.products_tree.get_children():
-            self.products_tree.delete(row)
-        
-        self.cursor.execute('''
-            SELECT p.id, p.name, p.price, p.stock, c.name, p.material, p.color
-            FROM products p
-            LEFT JOIN categories c ON p.category_id = c.id
-            WHERE p.name LIKE ? OR p.material LIKE ? OR p.color LIKE ? OR p.description LIKE ?
-            ORDER BY p.name
-        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
-        
-        for row in self.cursor.fetchall():
-            formatted_row = (
-                row[0],
-                row[1],
-                f"{row[2]:,.0f} ₽",
-                f"{row[3]} шт.",
-                row[4],
-                row[5],
-                row[6]
-            )
-            self.products_tree.insert('', 'end', values=formatted_row)
+        # По индексу — в порядке названия; ключ страницы (name, id) как у каталога
+        self.products_pager.reset(
+            lambda conn, last_row, limit: self.background_repo(conn).products_by_ids(
+                index.search(search_term, (last_row[1], last_row[0]) if last_row else None, limit)))
     
+    @traced
     def search_customers(self):
         """Поиск клиентов"""
+        self.search_jobs.pop('search_customers', None)
         search_term = self.customer_search.get()
+        if self.customer_index is None:
+            self.load_in_background(self.customers_sync, 'customers',
+                                    lambda repo: repo.search_customers(search_term),
+                                    format_row=self.format_customer_row)
+            return
         
-        for row in self.customers_tree.get_children():
-            self.customers_tree.delete(row)
-        
-        self.cursor.execute('''
-            SELECT id, first_name, last_name, phone, email
-            FROM customers
-            WHERE first_name LIKE ? OR last_name LIKE ? OR phone LIKE ? OR email LIKE ?
-            ORDER BY last_name
-        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
-        
-        for row in self.cursor.fetchall():
-            self.customers_tree.insert('', 'end', values=row)
+        customer_ids = self.customer_index.search(search_term)
+        self.load_in_background(self.customers_sync, 'customers',
+                                lambda repo: repo.customers_by_ids(customer_ids),
+                                format_row=self.format_customer_row)
+    
+    @traced
+    def load_search_indexes(self):
+        """Построить индексы поиска по мере ввода в фоновом потоке"""
+        products, customers = PrefixIndex(), PrefixIndex()
+        
+        def build(conn):
+            repo = ShopRepository(conn)
+            products.load(repo.product_search_fields())
+            customers.load(repo.customer_search_fields())
+            return ()
+        
+        self.worker.submit(build, on_done=lambda: self.search_indexes_loaded(products, customers),
+                           key='search-index')
+    
+    def search_indexes_loaded(self, products, customers):
+        """Индексы готовы: дописать изменения, сделанные во время построения"""
+        self.product_index, self.customer_index = products, customers
+        for product_id in self.stale_products:
+            self.index_product(product_id)
+        for customer_id in self.stale_customers:
+            self.index_customer(customer_id)
+        self.stale_products.clear()
+        self.stale_customers.clear()
+    
+    def index_product(self, product_id):
+        """Обновить товар в индексе поиска после добавления, изменения или удаления"""
+        if self.product_index is None:
+            self.stale_products.add(product_id)
+            return
+        row = self.repo.get_product(product_id)
+        if row is None:
+            self.product_index.remove(product_id)
+        else:
+            self.product_index.add(product_id, row[1], row[1], row[5], row[6])
+    
+    def index_customer(self, customer_id):
+        """Обновить клиента в индексе поиска после добавления, изменения или удаления"""
+        if self.customer_index is None:
+            self.stale_customers.add(customer_id)
+            return
+        row = self.repo.get_customer(customer_id)
+        if row is None:
+            self.customer_index.remove(customer_id)
+        else:
+            self.customer_index.add(customer_id, row[2], row[1], row[2], row[3], row[4])
     
+    @traced
     def filter_by_category(self, event=None):
         """Фильтр по категории"""
         category = self.category_filter.get()
         
-        for row in self.products_tree.get_children():
-            self.products_tree.delete(row)
-        
         if category == 'Все категории':
             self.load_products()
         else:
-            self.cursor.execute('''
-                SELECT p.id, p.name, p.price, p.stock, c.name, p.material, p.color
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                WHERE c.name = ?
-                ORDER BY p.name
-            ''', (category,))
-            for row in self.cursor.fetchall():
-                formatted_row = (
-                    row[0],
-                    row[1],
-                    f"{row[2]:,.0f} ₽",
-                    f"{row[3]} шт.",
-                    row[4],
-                    row[5],
-                    row[6]
-                )
-                self.products_tree.insert('', 'end', values=formatted_row)
+            self.show_products(category)
     
+    @lazy_tab(ORDERS_TAB)
+    @traced
     def filter_orders_by_status(self, event=None):
-        """Фильтр заказов по статусу"""
-        status = self.status_filter.get()
-        
-        for row in self.orders_tree.get_children():
-            self.orders_tree.delete(row)
-        
-        if status == 'Все':
-            self.load_orders()
-        else:
-            self.cursor.execute('''
-                SELECT o.id, o.order_date, c.first_name || ' ' || c.last_name,
-                       o.total_amount, o.status, o.payment_method
-                FROM orders o
-                JOIN customers c ON o.customer_id = c.id
-                WHERE o.status = ?
-                ORDER BY o.id DESC
-            ''', (status,))
-            for row in self.cursor.fetchall():
-                payment = row[5] if row[5] else 'Не указан'
-                formatted_row = (
-                    row[0],
-                    row[1][:16] if row[1] else '',
-                    row[2],
-                    f"{row[3]:,.0f} ₽",
-                    row[4],
-                    payment
-                )
-                self.orders_tree.insert('', 'end', values=formatted_row)
+        """Фильтр заказов по статусу и периоду"""
+        self.load_orders()
     
     # ========== МЕТОДЫ УПРАВЛЕНИЯ ТОВАРАМИ ==========
     
+    @traced_dialog
     def add_product(self):
         """Диалог добавления товара"""
         dialog = tk.Toplevel(self.root)
@@ -874,6 +1363,9 @@ class FurnitureShop:
             ('Описание:', 'text')
         ]
         
+        with PROFILER.span('query'):
+            categories = self.repo.category_names()
+        
         entries = {}
         row = 0
         
@@ -887,8 +1379,6 @@ class FurnitureShop:
                                          bd=1, relief='solid')
                 entries[label].grid(row=row, column=1, padx=10, pady=5)
             elif type_ == 'combo':
-                self.cursor.execute("SELECT name FROM categories")
-                categories = [cat[0] for cat in self.cursor.fetchall()]
                 entries[label] = ttk.Combobox(fields_frame, values=categories, width=37, font=('Segoe UI', 10))
                 entries[label].grid(row=row, column=1, padx=10, pady=5)
             elif type_ == 'text':
@@ -904,26 +1394,18 @@ class FurnitureShop:
         
         def save():
             try:
-                # Получаем ID категории
-                self.cursor.execute("SELECT id FROM categories WHERE name=?", 
-                                   (entries['Категория:'].get(),))
-                category_id = self.cursor.fetchone()[0]
-                
-                self.cursor.execute('''
-                    INSERT INTO products (name, price, stock, category_id, material, color, description)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                product_id = self.repo.add_product(
                     entries['Название товара:'].get(),
                     float(entries['Цена (₽):'].get()),
                     int(entries['Количество на складе:'].get()),
-                    category_id,
+                    entries['Категория:'].get(),
                     entries['Материал:'].get(),
                     entries['Цвет:'].get(),
                     entries['Описание:'].get('1.0', tk.END).strip()
-                ))
-                
-                self.conn.commit()
-                self.load_products()
+                )
+                self.index_product(product_id)
+                self.load_categories()
+                self.products_pager.reload()
                 dialog.destroy()
                 messagebox.showinfo("✅ Успех", "Товар успешно добавлен!")
             except Exception as e:
@@ -936,6 +1418,7 @@ class FurnitureShop:
                  bg=self.colors['warning'], fg='white', font=('Segoe UI', 11, 'bold'),
                  padx=30, pady=8, borderwidth=0, cursor='hand2').pack(side='left', padx=5)
     
+    @traced_dialog
     def edit_product(self):
         """Редактирование товара"""
         selected = self.products_tree.selection()
@@ -943,7 +1426,12 @@ class FurnitureShop:
             messagebox.showwarning("⚠️ Внимание", "Выберите товар для редактирования")
             return
         
-        product = self.products_tree.item(selected[0])['values']
+        with PROFILER.span('query'):
+            product = self.product_cache.get(int(selected[0]))
+        if product is None:
+            messagebox.showerror("❌ Ошибка", "Товар уже удален")
+            self.products_pager.reload()
+            return
         
         dialog = tk.Toplevel(self.root)
         dialog.title("✏️ Редактирование товара")
@@ -960,11 +1448,11 @@ class FurnitureShop:
         fields_frame.pack(padx=30, pady=10)
         
         fields = [
-            ('Название:', product[1]),
-            ('Цена:', str(product[2]).replace(' ₽', '').replace(' ', '')),
-            ('Количество:', str(product[3]).replace(' шт.', '')),
-            ('Материал:', product[5]),
-            ('Цвет:', product[6])
+            ('Название:', product.name),
+            ('Цена:', f"{product.price:.2f}".rstrip('0').rstrip('.')),
+            ('Количество:', product.stock),
+            ('Материал:', product.material or ''),
+            ('Цвет:', product.color or '')
         ]
         
         entries = {}
@@ -983,21 +1471,17 @@ class FurnitureShop:
         
         def save():
             try:
-                self.cursor.execute('''
-                    UPDATE products 
-                    SET name=?, price=?, stock=?, material=?, color=?
-                    WHERE id=?
-                ''', (
+                self.repo.update_product(
+                    product.id,
                     entries['Название:'].get(),
                     float(entries['Цена:'].get()),
                     int(entries['Количество:'].get()),
                     entries['Материал:'].get(),
-                    entries['Цвет:'].get(),
-                    product[0]
-                ))
-                
-                self.conn.commit()
-                self.load_products()
+                    entries['Цвет:'].get()
+                )
+                self.index_product(product.id)
+                self.load_categories()
+                self.refresh_product(product.id)
                 dialog.destroy()
                 messagebox.showinfo("✅ Успех", "Товар обновлен!")
             except Exception as e:
@@ -1021,14 +1505,17 @@ class FurnitureShop:
             return
         
         if messagebox.askyesno("⚠️ Подтверждение", "Вы уверены, что хотите удалить товар?"):
-            product_id = self.products_tree.item(selected[0])['values'][0]
-            self.cursor.execute("DELETE FROM products WHERE id=?", (product_id,))
-            self.conn.commit()
-            self.load_products()
+            product_id = int(selected[0])
+            self.repo.delete_product(product_id)
+            self.product_cache.discard(product_id)
+            self.index_product(product_id)
+            self.load_categories()
+            self.products_pager.sync.remove(product_id)
             messagebox.showinfo("✅ Успех", "Товар удален")
     
     # ========== МЕТОДЫ УПРАВЛЕНИЯ КЛИЕНТАМИ ==========
     
+    @traced_dialog
     def add_customer(self):
         """Диалог добавления клиента"""
         dialog = tk.Toplevel(self.root)
@@ -1059,16 +1546,13 @@ class FurnitureShop:
         
         def save():
             try:
-                self.cursor.execute('''
-                    INSERT INTO customers (first_name, last_name, phone, email)
-                    VALUES (?, ?, ?, ?)
-                ''', (
+                customer_id = self.repo.add_customer(
                     entries['Имя:'].get(),
                     entries['Фамилия:'].get(),
                     entries['Телефон:'].get(),
                     entries['Email:'].get()
-                ))
-                self.conn.commit()
+                )
+                self.index_customer(customer_id)
                 self.load_customers()
                 dialog.destroy()
                 messagebox.showinfo("✅ Успех", "Клиент добавлен!")
@@ -1085,6 +1569,7 @@ class FurnitureShop:
                  bg=self.colors['warning'], fg='white', font=('Segoe UI', 11, 'bold'),
                  padx=30, pady=8, borderwidth=0, cursor='hand2').pack(side='left', padx=5)
     
+    @traced_dialog
     def edit_customer(self):
         """Редактирование клиента"""
         selected = self.customers_tree.selection()
@@ -1123,18 +1608,14 @@ class FurnitureShop:
         
         def save():
             try:
-                self.cursor.execute('''
-                    UPDATE customers 
-                    SET first_name=?, last_name=?, phone=?, email=?
-                    WHERE id=?
-                ''', (
+                self.repo.update_customer(
+                    customer[0],
                     entries['Имя:'].get(),
                     entries['Фамилия:'].get(),
                     entries['Телефон:'].get(),
-                    entries['Email:'].get(),
-                    customer[0]
-                ))
-                self.conn.commit()
+                    entries['Email:'].get()
+                )
+                self.index_customer(customer[0])
                 self.load_customers()
                 dialog.destroy()
                 messagebox.showinfo("✅ Успех", "Данные обновлены!")
@@ -1160,20 +1641,171 @@ class FurnitureShop:
         
         if messagebox.askyesno("⚠️ Подтверждение", "Вы уверены, что хотите удалить клиента?"):
             customer_id = self.customers_tree.item(selected[0])['values'][0]
-            
-            # Проверяем, есть ли заказы у клиента
-            self.cursor.execute("SELECT COUNT(*) FROM orders WHERE customer_id=?", (customer_id,))
-            if self.cursor.fetchone()[0] > 0:
-                messagebox.showerror("❌ Ошибка", "Нельзя удалить клиента с заказами")
+            try:
+                # Клиента с заказами удалить нельзя
+                self.repo.delete_customer(customer_id)
+            except ShopError as e:
+                messagebox.showerror("❌ Ошибка", str(e))
                 return
             
-            self.cursor.execute("DELETE FROM customers WHERE id=?", (customer_id,))
-            self.conn.commit()
+            self.index_customer(customer_id)
             self.load_customers()
             messagebox.showinfo("✅ Успех", "Клиент удален")
     
+    @traced_dialog
+    def view_customer_details(self):
+        """Карточка клиента: сводка покупок, покупки по категориям и последние заказы"""
+        selected = self.customers_tree.selection()
+        if not selected:
+            messagebox.showwarning("⚠️ Внимание", "Выберите клиента")
+            return
+        
+        customer_id = self.customers_tree.item(selected[0])['values'][0]
+        
+        # Сводка уже посчитана в customer_stats — читаем готовые строки
+        with PROFILER.span('query'):
+            customer = self.repo.get_customer(customer_id)
+            categories = self.repo.customer_categories(customer_id).fetchall()
+            orders = self.repo.customer_orders(customer_id).fetchall()
+        if customer is None:
+            messagebox.showerror("❌ Ошибка", "Клиент не найден")
+            return
+        
+        first_name, last_name, phone, email, order_count, revenue, last_order, favourite = customer[1:]
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"📇 Клиент №{customer_id}")
+        dialog.geometry("650x550")
+        dialog.configure(bg=self.colors['white'])
+        dialog.grab_set()
+        
+        # Информация о клиенте
+        info_frame = tk.Frame(dialog, bg=self.colors['white'], bd=1, relief='solid')
+        info_frame.pack(fill='x', padx=10, pady=10)
+        
+        tk.Label(info_frame, text=f"{first_name} {last_name}", 
+                font=('Segoe UI', 14, 'bold'),
+                bg=self.colors['white'],
+                fg=self.colors['primary']).pack(anchor='w', padx=10, pady=5)
+        
+        tk.Label(info_frame, text=f"Телефон: {phone or '—'}   Email: {email or '—'}", 
+                bg=self.colors['white']).pack(anchor='w', padx=10, pady=2)
+        tk.Label(info_frame, text=f"Заказов: {order_count}   Последний: {(last_order or '—')[:16]}", 
+                bg=self.colors['white']).pack(anchor='w', padx=10, pady=2)
+        tk.Label(info_frame, text=f"Любимая категория: {favourite or '—'}", 
+                bg=self.colors['white']).pack(anchor='w', padx=10, pady=2)
+        tk.Label(info_frame, text=f"Сумма покупок: {revenue:,.0f} ₽   "
+                                  f"Средний чек: {revenue / order_count if order_count else 0:,.0f} ₽", 
+                font=('Segoe UI', 11, 'bold'),
+                fg=self.colors['success'],
+                bg=self.colors['white']).pack(anchor='w', padx=10, pady=5)
+        
+        # Покупки по категориям
+        table_frame = tk.Frame(dialog, bg=self.colors['white'], bd=1, relief='solid')
+        table_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        columns = ('🏷️ Категория', '🔢 Единиц', '💵 Сумма')
+        tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=5)
+        
+        tree.heading('🏷️ Категория', text='Категория')
+        tree.heading('🔢 Единиц', text='Единиц')
+        tree.heading('💵 Сумма', text='Сумма')
+        
+        tree.column('🏷️ Категория', width=250)
+        tree.column('🔢 Единиц', width=100, anchor='center')
+        tree.column('💵 Сумма', width=150, anchor='e')
+        
+        for name, units, total in categories:
+            tree.insert('', 'end', values=(name or 'Без категории', units, f"{total:,.0f} ₽"))
+        
+        tree.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        # Последние заказы, включая отменённые
+        orders_frame = tk.Frame(dialog, bg=self.colors['white'], bd=1, relief='solid')
+        orders_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        columns = ('№', '📅 Дата', '💰 Сумма', '📊 Статус', '💳 Оплата')
+        tree = ttk.Treeview(orders_frame, columns=columns, show='headings', height=6)
+        
+        for col in columns:
+            tree.heading(col, text=col)
+        
+        tree.column('№', width=60, anchor='center')
+        tree.column('📅 Дата', width=150, anchor='center')
+        tree.column('💰 Сумма', width=120, anchor='e')
+        tree.column('📊 Статус', width=120, anchor='center')
+        tree.column('💳 Оплата', width=100, anchor='center')
+        
+        for order_id, date, amount, status, payment in orders:
+            tree.insert('', 'end', values=(order_id, (date or '')[:16], f"{amount:,.0f} ₽", status, payment or ''))
+        
+        tree.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        # Кнопка закрытия
+        tk.Button(dialog, text="✖️ Закрыть", command=dialog.destroy,
+                 bg=self.colors['primary'], fg='white',
+                 font=('Segoe UI', 10), padx=30, pady=5,
+                 borderwidth=0, cursor='hand2').pack(pady=10)
+    
+    # ========== МАССОВАЯ ЗАГРУЗКА ==========
+    
+    def import_file(self, kind):
+        """Загрузить товары или клиентов из CSV/Excel: проверка, подтверждение, загрузка в фоне"""
+        path = filedialog.askopenfilename(
+            title="📥 Импорт " + ('товаров' if kind == 'products' else 'клиентов'),
+            filetypes=[('CSV и Excel', '*.csv *.xlsx'), ('Все файлы', '*.*')])
+        if not path:
+            return
+        checked = {}
+        
+        def check(conn):
+            checked.update(BulkImporter(conn, kind, create_categories=True).run(path, dry_run=True))
+            return ()
+        
+        self.worker.submit(check, on_done=lambda: self.confirm_import(kind, path, checked),
+                           on_error=lambda e: messagebox.showerror("❌ Ошибка", f"Не удалось прочитать файл:\n{str(e)}"),
+                           key='import')
+    
+    def confirm_import(self, kind, path, checked):
+        """Показать итог проверки файла и загрузить годные строки после подтверждения"""
+        lines = [f"Годных строк: {checked['rows']}", f"С ошибками: {checked['error_count']}"]
+        lines += [f"  строка {line}: {message}" for line, message in checked['errors'][:10]]
+        if checked['error_count'] > 10:
+            lines.append("  ...")
+        if checked['new_categories']:
+            lines.append(f"Будут созданы категории: {', '.join(checked['new_categories'])}")
+        if checked['rows'] == 0:
+            messagebox.showwarning("⚠️ Внимание", '\n'.join(lines))
+            return
+        if not messagebox.askyesno("📥 Импорт", '\n'.join(lines) + "\n\nЗагрузить годные строки?"):
+            return
+        loaded = {}
+        
+        def load(conn):
+            loaded.update(BulkImporter(conn, kind, create_categories=True).run(path))
+            return ()
+        
+        self.worker.submit(load, on_done=lambda: self.import_finished(kind, loaded),
+                           on_error=lambda e: messagebox.showerror("❌ Ошибка", f"Загрузка отменена:\n{str(e)}"),
+                           key='import')
+    
+    def import_finished(self, kind, result):
+        """Обновить таблицы и индексы поиска после загрузки"""
+        if kind == 'products':
+            self.products_pager.reload()
+            self.load_categories()
+            self.load_categories_filter()
+        else:
+            self.load_customers()
+        # Новых строк может быть много — индексы поиска проще построить заново
+        self.product_index = self.customer_index = None
+        self.load_search_indexes()
+        messagebox.showinfo("✅ Успех", f"Загружено строк: {result['inserted']}, "
+                                       f"пропущено с ошибками: {result['error_count']}")
+    
     # ========== МЕТОДЫ УПРАВЛЕНИЯ КАТЕГОРИЯМИ ==========
     
+    @traced_dialog
     def add_category(self):
         """Добавление категории"""
         dialog = tk.Toplevel(self.root)
@@ -1199,14 +1831,13 @@ class FurnitureShop:
             name = name_entry.get()
             if name:
                 try:
-                    self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
-                    self.conn.commit()
+                    self.repo.add_category(name)
                     self.load_categories()
                     self.load_categories_filter()
                     dialog.destroy()
                     messagebox.showinfo("✅ Успех", "Категория добавлена!")
-                except:
-                    messagebox.showerror("❌ Ошибка", "Такая категория уже существует")
+                except ShopError as e:
+                    messagebox.showerror("❌ Ошибка", str(e))
         
         btn_frame = tk.Frame(dialog, bg=self.colors['white'])
         btn_frame.pack(pady=20)
@@ -1227,21 +1858,24 @@ class FurnitureShop:
         
         category_id = self.categories_tree.item(selected[0])['values'][0]
         
-        # Проверяем, есть ли товары в категории
-        self.cursor.execute("SELECT COUNT(*) FROM products WHERE category_id=?", (category_id,))
-        if self.cursor.fetchone()[0] > 0:
+        # Категорию с товарами удалить нельзя — проверяем до подтверждения
+        if not self.repo.can_delete_category(category_id):
             messagebox.showerror("❌ Ошибка", "Нельзя удалить категорию с товарами")
             return
         
         if messagebox.askyesno("⚠️ Подтверждение", "Удалить категорию?"):
-            self.cursor.execute("DELETE FROM categories WHERE id=?", (category_id,))
-            self.conn.commit()
+            try:
+                self.repo.delete_category(category_id)
+            except ShopError as e:
+                messagebox.showerror("❌ Ошибка", str(e))
+                return
             self.load_categories()
             self.load_categories_filter()
             messagebox.showinfo("✅ Успех", "Категория удалена")
     
     # ========== ИСПРАВЛЕННЫЕ МЕТОДЫ РАБОТЫ С ЗАКАЗАМИ ==========
     
+    @traced_dialog
     def add_to_order_from_products(self):
         """Добавить товар в заказ из каталога (ИСПРАВЛЕНО)"""
         # Проверяем, выбран ли клиент
@@ -1258,29 +1892,20 @@ class FurnitureShop:
             messagebox.showwarning("⚠️ Внимание", "Выберите товар из списка")
             return
         
-        # Получаем данные товара
-        product = self.products_tree.item(selected[0])['values']
-        
-        product_id = product[0]
-        product_name = product[1]
+        # Данные товара — из кэша каталога, доступный остаток — из базы с учётом
+        # резервов других касс (в таблице остаток мог устареть)
+        product_id = int(selected[0])
+        with PROFILER.span('query'):
+            product = self.product_cache.get(product_id)
+            available = self.reservations.available([product_id]).get(product_id)
+        if product is None or available is None:
+            messagebox.showerror("❌ Ошибка", "Товар уже удален")
+            self.products_pager.reload()
+            return
         
-        # ИСПРАВЛЕНО: правильное извлечение цены
-        price_str = str(product[2])
-        # Убираем все символы кроме цифр и точки
-        price_str = ''.join(c for c in price_str if c.isdigit() or c == '.')
-        try:
-            product_price = float(price_str)
-        except:
-            product_price = 0
-        
-        # ИСПРАВЛЕНО: правильное извлечение количества
-        stock_str = str(product[3])
-        # Убираем все символы кроме цифр
-        stock_str = ''.join(c for c in stock_str if c.isdigit())
-        try:
-            available = int(stock_str)
-        except:
-            available = 0
+        product_name = product.name
+        product_price = product.price
+        available = max(0, available)
         
         # Проверяем, есть ли товар в наличии
         if available <= 0:
@@ -1334,6 +1959,15 @@ class FurnitureShop:
         def add_to_cart():
             qty = qty_var.get()
             
+            # Резерв на всё количество товара в корзине: другая касса могла успеть раньше
+            try:
+                self.reservations.hold(product_id, current_qty + qty)
+            except OutOfStockError as e:
+                self.refresh_product(product_id)
+                messagebox.showerror("❌ Ошибка", f"Товар '{product_name}' зарезервирован другими кассами\n"
+                                                 f"(доступно {e.lines[0][2]} шт., в заказе {current_qty} шт.)")
+                return
+            
             # Добавляем или обновляем товар в заказе
             found = False
             for item in self.current_order['items']:
@@ -1397,6 +2031,12 @@ class FurnitureShop:
             return
         
         item_id = self.order_items_tree.item(selected[0])['values'][0]
+        try:
+            self.reservations.hold(item_id, 0)
+        except sqlite3.Error as e:
+            # Резерв не снят (например, база занята другой кассой) — корзина остаётся как была
+            messagebox.showerror("❌ Ошибка", f"Не удалось убрать товар из заказа:\n{str(e)}")
+            return
         self.current_order['items'] = [item for item in self.current_order['items'] if item['id'] != item_id]
         self.current_order['total'] = sum(item['subtotal'] for item in self.current_order['items'])
         self.update_order_display()
@@ -1405,10 +2045,16 @@ class FurnitureShop:
         """Очистить корзину"""
         if self.current_order['items']:
             if messagebox.askyesno("🔄 Очистка", "Очистить корзину?"):
+                try:
+                    self.reservations.release()
+                except sqlite3.Error as e:
+                    messagebox.showerror("❌ Ошибка", f"Не удалось очистить корзину:\n{str(e)}")
+                    return
                 self.current_order['items'] = []
                 self.current_order['total'] = 0
                 self.update_order_display()
     
+    @traced_dialog
     def choose_customer(self):
         """Выбрать клиента для заказа"""
         selected = self.customers_tree.selection()
@@ -1440,6 +2086,7 @@ class FurnitureShop:
         self.notebook.select(4)  # Переключаемся на вкладку нового заказа
         messagebox.showinfo("✅ Клиент выбран", f"Клиент: {self.current_order['customer_name']}\nТеперь добавьте товары в заказ")
     
+    @traced_dialog
     def add_customer_and_order(self):
         """Добавить нового клиента и создать заказ"""
         dialog = tk.Toplevel(self.root)
@@ -1471,18 +2118,13 @@ class FurnitureShop:
         def save_and_order():
             try:
                 # Добавляем клиента
-                self.cursor.execute('''
-                    INSERT INTO customers (first_name, last_name, phone, email)
-                    VALUES (?, ?, ?, ?)
-                ''', (
+                customer_id = self.repo.add_customer(
                     entries['Имя:'].get(),
                     entries['Фамилия:'].get(),
                     entries['Телефон:'].get(),
                     entries['Email:'].get()
-                ))
-                
-                self.conn.commit()
-                customer_id = self.cursor.lastrowid
+                )
+                self.index_customer(customer_id)
                 customer_name = f"{entries['Имя:'].get()} {entries['Фамилия:'].get()}"
                 
                 # Устанавливаем клиента для заказа
@@ -1580,33 +2222,11 @@ class FurnitureShop:
             payment = payment_var.get()
             
             try:
-                # Создаем заказ
-                self.cursor.execute('''
-                    INSERT INTO orders (customer_id, order_date, total_amount, status, payment_method)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    self.current_order['customer_id'],
-                    datetime.now().strftime("%Y-%m-%d %H:%M"),
-                    self.current_order['total'],
-                    'Новый',
-                    payment
-                ))
-                
-                order_id = self.cursor.lastrowid
-                
-                # Добавляем товары в заказ и обновляем склад
-                for item in self.current_order['items']:
-                    self.cursor.execute('''
-                        INSERT INTO order_items (order_id, product_id, quantity, price_per_unit, subtotal)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (order_id, item['id'], item['quantity'], item['price'], item['subtotal']))
-                    
-                    # Уменьшаем количество на складе
-                    self.cursor.execute('''
-                        UPDATE products SET stock = stock - ? WHERE id = ?
-                    ''', (item['quantity'], item['id']))
-                
-                self.conn.commit()
+                # Заказ, строки и списание склада — одной транзакцией
+                customer_id = self.current_order['customer_id']
+                order_id = self.orders.place_order(customer_id, self.current_order['items'], payment,
+                                                   cart=self.reservations.cart)
+                ordered_ids = [item['id'] for item in self.current_order['items']]
                 
                 # Очищаем текущий заказ
                 self.current_order = {
@@ -1619,13 +2239,24 @@ class FurnitureShop:
                 self.customer_label.config(text="Клиент не выбран", fg=self.colors['warning'])
                 
                 # Обновляем данные
-                self.load_products()
-                self.load_orders()
+                for product_id in ordered_ids:
+                    self.refresh_product(product_id)
+                self.refresh_customer(customer_id)
+                self.filter_orders_by_status()
+                self.load_categories()
+                self.load_reports()
                 
                 dialog.destroy()
                 self.notebook.select(3)  # Переключаемся на вкладку заказов
                 messagebox.showinfo("✅ Успех", f"Заказ №{order_id} успешно оформлен!")
                 
+            except OutOfStockError as e:
+                names = {item['id']: item['name'] for item in self.current_order['items']}
+                lines = '\n'.join(f"{names[product_id]}: нужно {need} шт., доступно {available} шт."
+                                  for product_id, need, available in e.lines)
+                for product_id, need, available in e.lines:
+                    self.refresh_product(product_id)
+                messagebox.showerror("❌ Ошибка", f"Недостаточно товара на складе, заказ не оформлен:\n{lines}")
             except Exception as e:
                 messagebox.showerror("❌ Ошибка", f"Не удалось оформить заказ:\n{str(e)}")
         
@@ -1639,6 +2270,7 @@ class FurnitureShop:
                  bg=self.colors['warning'], fg='white', font=('Segoe UI', 11),
                  padx=30, pady=8, borderwidth=0, cursor='hand2').pack(side='left', padx=5)
     
+    @traced_dialog
     def change_order_status(self):
         """Изменить статус заказа"""
         selected = self.orders_tree.selection()
@@ -1669,24 +2301,25 @@ class FurnitureShop:
         
         status_var = tk.StringVar(value=order[4])
         
-        statuses = ['Новый', 'В обработке', 'Доставлен', 'Отменен']
-        
         frame = tk.Frame(dialog, bg=self.colors['white'])
         frame.pack(pady=5)
         
-        for status in statuses:
+        for status in ORDER_STATUSES:
             tk.Radiobutton(frame, text=status, variable=status_var, value=status,
                           bg=self.colors['white']).pack(anchor='w', pady=2)
         
         def update_status():
             new_status = status_var.get()
+            try:
+                self.orders.set_status(order[0], new_status)
+            except (ShopError, sqlite3.Error) as e:
+                # Статус не изменён: окно остаётся открытым, можно повторить
+                messagebox.showerror("❌ Ошибка", f"Не удалось изменить статус заказа:\n{str(e)}")
+                return
             
-            self.cursor.execute('''
-                UPDATE orders SET status = ? WHERE id = ?
-            ''', (new_status, order[0]))
-            self.conn.commit()
-            
-            self.load_orders()
+            self.refresh_order(order[0])
+            self.refresh_customer(self.repo.order_customer_id(order[0]))
+            self.load_reports()
             dialog.destroy()
             messagebox.showinfo("✅ Успех", f"Статус заказа №{order[0]} изменен на '{new_status}'")
         
@@ -1700,6 +2333,7 @@ class FurnitureShop:
                  bg=self.colors['warning'], fg='white', font=('Segoe UI', 11),
                  padx=30, pady=8, borderwidth=0, cursor='hand2').pack(side='left', padx=5)
     
+    @traced_dialog
     def view_order_details(self):
         """Просмотр деталей заказа"""
         selected = self.orders_tree.selection()
@@ -1711,14 +2345,8 @@ class FurnitureShop:
         order_id = order[0]
         
         # Получаем детали заказа
-        self.cursor.execute('''
-            SELECT p.name, oi.quantity, oi.price_per_unit, oi.subtotal
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.id
-            WHERE oi.order_id = ?
-        ''', (order_id,))
-        
-        items = self.cursor.fetchall()
+        with PROFILER.span('query'):
+            items = self.repo.order_items(order_id)
         
         # Создаем окно с деталями
         dialog = tk.Toplevel(self.root)
@@ -1782,6 +2410,26 @@ class FurnitureShop:
 
 # Запуск
 if __name__ == "__main__":
+    if sys.argv[1:2] == ['serve']:
+        # HTTP/JSON API без окна: asyncio и остальное нужны только серверу, поэтому и импорт здесь
+        from server import main as serve
+        serve(sys.argv[2:], prog='app.py serve')
+        sys.exit()
+    
+    parser = argparse.ArgumentParser(description="Мебельный магазин",
+                                     epilog="python app.py serve — HTTP/JSON API без окна (app.py serve --help)")
+    parser.add_argument('--profile', action='store_true',
+                        help='замерять запросы к базе: вкладка «Запросы», журнал медленных запросов')
+    parser.add_argument('--slow-ms', type=float, default=SLOW_MS, help='порог медленного запроса, мс')
+    parser.add_argument('--slow-log', help='файл журнала медленных запросов (по умолчанию stderr)')
+    parser.add_argument('--trace', nargs='?', const=TRACE_FILE, metavar='FILE',
+                        help=f'замерять отрисовку таблиц и диалогов, трасса flamegraph в FILE (по умолчанию {TRACE_FILE})')
+    args = parser.parse_args()
+    if args.profile:
+        STATS.slow_ms = args.slow_ms
+        logging.basicConfig(filename=args.slow_log, level=logging.WARNING,
+                            format='%(asctime)s %(message)s')
+    
     root = tk.Tk()
-    app = FurnitureShop(root)
+    app = FurnitureShop(root, profile_queries=args.profile, trace_file=args.trace)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,108 @@
+# benchmarks/bench_contention.py
+"""Несколько процессов над одним furniture_shop.db: чтения и заказы в секунду по профилям
+
+Запуск: python benchmarks/bench_contention.py [--readers 4] [--writers 2] [--seconds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import CONNECTION_PROFILES, ORDERS_QUERY, connect, migrate
+from services import OrderService
+
+PRODUCTS = 2000
+CUSTOMERS = 500
+ORDERS = 20000
+
+
+def make_db(path):
+    """База с историей заказов, на которой load_orders уже заметен"""
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.executemany("INSERT INTO products (name, price, stock) VALUES (?, ?, ?)",
+                     [(f'Товар {i}', 1000 + i, 10 ** 9) for i in range(PRODUCTS)])
+    conn.executemany("INSERT INTO customers (first_name, last_name, email) VALUES (?, ?, ?)",
+                     [(f'Имя {i}', f'Фамилия {i}', f'c{i}@mail.com') for i in range(CUSTOMERS)])
+    conn.executemany('''
+        INSERT INTO orders (customer_id, order_date, total_amount, status, payment_method)
+        VALUES (?, '2024-01-01 12:00', 1000, 'Новый', 'Карта')
+    ''', [(i % CUSTOMERS + 1,) for i in range(ORDERS)])
+    conn.commit()
+    conn.close()
+
+
+def reader(path, profile, deadline, results):
+    """Процесс, который в цикле выполняет запрос вкладки заказов; отдаёт запросов/с"""
+    conn = connect(path, profile, timeout=30)
+    start, done = time.time(), 0
+    while time.time() < deadline:
+        conn.execute(ORDERS_QUERY + ' ORDER BY o.id DESC').fetchall()
+        done += 1
+    conn.close()
+    results.put(('read', done / (time.time() - start)))
+
+
+def writer(path, profile, deadline, results, seed):
+    """Процесс-касса, который оформляет заказы из трёх строк; отдаёт заказов/с"""
+    conn = connect(path, profile, timeout=30)
+    service = OrderService(conn)
+    start, done = time.time(), 0
+    while time.time() < deadline:
+        cart = [{'id': (seed * 7 + done + i) % PRODUCTS + 1, 'quantity': 1, 'price': 1000.0} for i in range(3)]
+        service.place_order(done % CUSTOMERS + 1, cart, 'Карта')
+        done += 1
+    conn.close()
+    results.put(('write', done / (time.time() - start)))
+
+
+def run_profile(template, profile, readers, writers, seconds):
+    """Прогнать смешанную нагрузку на свежей копии базы"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'shop.db')
+        shutil.copy(template, path)
+        connect(path, profile).close()  # journal_mode сохраняется в файле
+        
+        results = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        processes = [multiprocessing.Process(target=reader, args=(path, profile, deadline, results))
+                     for _ in range(readers)]
+        processes += [multiprocessing.Process(target=writer, args=(path, profile, deadline, results, i))
+                      for i in range(writers)]
+        for process in processes:
+            process.start()
+        totals = {'read': 0, 'write': 0}
+        for _ in processes:
+            kind, rate = results.get()
+            totals[kind] += rate
+        for process in processes:
+            process.join()
+    return totals['read'], totals['write']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profiles', nargs='*', default=list(CONNECTION_PROFILES))
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        make_db(template)
+        print(f"{args.readers} читателей, {args.writers} касс, {args.seconds:g} с на профиль")
+        print(f"{'профиль':<10} | {'чтений/с':>10} | {'заказов/с':>10}")
+        for profile in args.profiles:
+            reads, writes = run_profile(template, profile, args.readers, args.writers, args.seconds)
+            print(f"{profile:<10} | {reads:>10.1f} | {writes:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
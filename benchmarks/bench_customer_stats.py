@@ -0,0 +1,163 @@
+# benchmarks/bench_customer_stats.py
+"""Карточка клиента (customer_stats): готовая сводка покупок против подсчёта по заказам
+
+Запуск: python benchmarks/bench_customer_stats.py [big.db] [--customers 1000000] [--scale 0.2] [--sample 2000]
+Без пути к базе она генерируется во временном каталоге: --customers клиентов,
+товары и заказы — по --scale (generate_data.py).
+1. Чтение: сводка клиента (строка таблицы клиентов) и покупки по категориям —
+   из customer_stats и customer_category_sales и те же числа, посчитанные по
+   orders/order_items; отдельно для случайных покупателей и для 1% самых частых.
+2. Запись: задержка оформления и отмены заказа со сводкой клиентов и без неё.
+В конце сводки сверяются с заказами (check_sales_rollups).
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import database
+from database import CANCELLED_STATUS, CUSTOMER_STATS_TABLES, check_sales_rollups, connect, migrate
+from generate_data import generate
+from services import OrderService, OutOfStockError, ShopRepository
+
+# Те же числа без сводки: заказы клиента по индексу idx_orders_customer
+SCAN_SUMMARY = '''
+    SELECT c.id, c.first_name, c.last_name, c.phone, c.email,
+           COUNT(DISTINCT o.id), COALESCE(SUM(oi.subtotal), 0), MAX(o.order_date)
+    FROM customers c
+    LEFT JOIN orders o ON o.customer_id = c.id AND o.status IS NOT ?
+    LEFT JOIN order_items oi ON oi.order_id = o.id
+    WHERE c.id = ?
+'''
+SCAN_CATEGORIES = '''
+    SELECT k.name, SUM(oi.quantity), SUM(oi.subtotal)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN products p ON p.id = oi.product_id
+    LEFT JOIN categories k ON k.id = p.category_id
+    WHERE o.customer_id = ? AND o.status IS NOT ?
+    GROUP BY p.category_id
+    ORDER BY 3 DESC
+'''
+
+ORDERS = 500   # заказов для замера записи
+
+
+def percentiles_us(fn, ids):
+    """p50 и p99 времени fn(id) в микросекундах, по одному вызову на id"""
+    for customer_id in ids[:50]:
+        fn(customer_id)
+    samples = []
+    for customer_id in ids:
+        started = time.perf_counter()
+        fn(customer_id)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def read_costs(conn, sample):
+    """Таблица замеров чтения для случайных и самых частых покупателей"""
+    repo = ShopRepository(conn)
+    buyers = [row[0] for row in conn.execute("SELECT customer_id FROM customer_stats WHERE orders > 0")]
+    frequent = [row[0] for row in conn.execute(
+        "SELECT customer_id FROM customer_stats ORDER BY orders DESC LIMIT ?", (max(1, len(buyers) // 100),))]
+    rng = random.Random(1)
+    groups = [('случайные', rng.sample(buyers, min(sample, len(buyers)))),
+              ('частые 1%', rng.sample(frequent, min(sample, len(frequent))))]
+    queries = [
+        ('сводка', lambda customer_id: repo.get_customer(customer_id),
+         lambda customer_id: conn.execute(SCAN_SUMMARY, (CANCELLED_STATUS, customer_id)).fetchone()),
+        ('по категориям', lambda customer_id: repo.customer_categories(customer_id).fetchall(),
+         lambda customer_id: conn.execute(SCAN_CATEGORIES, (customer_id, CANCELLED_STATUS)).fetchall()),
+    ]
+    print(f"\n1. Чтение, мкс ({len(buyers):,} покупателей)")
+    print(f"{'клиенты':<12} {'запрос':<15} {'сводка p50':>11} {'p99':>8} {'по заказам p50':>15} {'p99':>8}")
+    for group, ids in groups:
+        for name, stored, scan in queries:
+            fast, fast99 = percentiles_us(stored, ids)
+            slow, slow99 = percentiles_us(scan, ids)
+            print(f"{group:<12} {name:<15} {fast:>11.1f} {fast99:>8.1f} {slow:>15.1f} {slow99:>8.1f}")
+
+
+def write_costs(path, counts):
+    """p50 и p99 оформления и отмены заказа, мс"""
+    conn = connect(path)
+    service = OrderService(conn)
+    rng = random.Random(2)
+    placed, cancelled = [], []
+    while len(placed) < ORDERS:
+        items = [{'id': rng.randint(1, counts['products']), 'quantity': 1, 'price': 1000.0}
+                 for _ in range(rng.randint(1, 3))]
+        started = time.perf_counter()
+        try:
+            order_id = service.place_order(rng.randint(1, counts['customers']), items, 'Карта')
+        except OutOfStockError:
+            continue
+        placed.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        service.set_status(order_id, CANCELLED_STATUS)
+        cancelled.append((time.perf_counter() - started) * 1000)
+    conn.close()
+    result = []
+    for samples in (placed, cancelled):
+        samples.sort()
+        result += [statistics.median(samples), samples[int(len(samples) * 0.99)]]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', help='готовая база (иначе генерируется)')
+    parser.add_argument('--customers', type=int, default=1_000_000, help='клиентов в генерируемой базе')
+    parser.add_argument('--scale', type=float, default=0.2, help='объём товаров и заказов generate_data.py')
+    parser.add_argument('--sample', type=int, default=2000, help='клиентов в замере чтения')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'customers.db')
+        if args.path:
+            shutil.copy(args.path, path)
+        else:
+            generate(path, args.scale, customers=args.customers)
+        conn = connect(path)
+        started = time.perf_counter()
+        migrate(conn)
+        print(f"Миграции: {time.perf_counter() - started:.1f} с")
+        counts = {table: conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+                  for table in ('products', 'customers', 'orders')}
+        print(', '.join(f'{table} {count:,}' for table, count in counts.items()))
+        
+        read_costs(conn, args.sample)
+        conn.close()
+        
+        # Без сводки клиентов — на копии: apply_order_sales берёт список сводок из модуля
+        bare = os.path.join(tmp, 'bare.db')
+        shutil.copy(path, bare)
+        print(f"\n2. Запись, мс ({ORDERS} заказов, каждый сразу отменяется)")
+        print(f"{'':<22} {'заказ p50':>10} {'p99':>8} {'отмена p50':>11} {'p99':>8}")
+        print(f"{'со сводкой клиентов':<22} " + ' '.join(
+            f"{value:>{width}.2f}" for value, width in zip(write_costs(path, counts), (10, 8, 11, 8))))
+        rollups, derived = database.SALES_ROLLUPS, database.CUSTOMER_DERIVED_SQL
+        database.SALES_ROLLUPS = [rollup for rollup in rollups if rollup[0] not in CUSTOMER_STATS_TABLES]
+        database.CUSTOMER_DERIVED_SQL = 'SELECT 1 FROM customer_stats'
+        try:
+            print(f"{'без неё':<22} " + ' '.join(
+                f"{value:>{width}.2f}" for value, width in zip(write_costs(bare, counts), (10, 8, 11, 8))))
+        finally:
+            database.SALES_ROLLUPS, database.CUSTOMER_DERIVED_SQL = rollups, derived
+        
+        conn = connect(path)
+        problems = check_sales_rollups(conn)
+        conn.close()
+        print(f"\nСводки {'✅ сходятся с заказами' if not problems else f'❌ расходятся: {len(problems)}'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_export.py
+"""Скорость выгрузки истории заказов (строк/с) и потребление памяти
+
+Запуск: python benchmarks/bench_export.py [big.db] [--scale 0.2] [--format csv]
+10 миллионов строк заказов — база с --scale 2 (generate_data.py big.db --scale 2).
+Пик памяти — RSS процесса; в него входят и страницы файла базы, отображённые
+через mmap (до 256 МБ в профиле wal), а не только порции выгрузки.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import connect, migrate
+from export import FORMATS, default_format, export_history
+from generate_data import generate
+
+try:
+    import resource
+except ImportError:
+    # Windows: пиковую память не показываем
+    resource = None
+
+NEW_ORDERS_SHARE = 0.01   # доля заказов, «добавленных» перед инкрементальной выгрузкой
+
+
+def peak_memory_mb():
+    """Пиковый RSS процесса в МБ (Linux отдаёт КБ)"""
+    if resource is None:
+        return float('nan')
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(label, result):
+    """Строка результата: строк, секунд, строк/с и пик памяти"""
+    rows = sum(result['rows'].values())
+    print(f"{label:<20} {rows:>12,} {result['seconds']:>8.1f} {rows / max(result['seconds'], 1e-9):>12,.0f}"
+          f" {peak_memory_mb():>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', help='база от generate_data.py')
+    parser.add_argument('--scale', type=float, default=0.2, help='объём генерируемой базы без path')
+    parser.add_argument('--format', choices=FORMATS, default=default_format())
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, 'export.db')
+            generate(path, args.scale)
+        conn = connect(path)
+        migrate(conn)
+        out = os.path.join(tmp, 'export')
+        
+        print(f"\n{'выгрузка':<20} {'строк':>12} {'с':>8} {'строк/с':>12} {'пик, МБ':>10}")
+        report(f'полная ({args.format})', export_history(conn, out, args.format, full=True))
+        
+        # Инкрементальная: делаем вид, что последние заказы ещё не выгружены
+        last = conn.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+        with open(os.path.join(out, 'export_state.json'), 'w', encoding='utf-8') as f:
+            f.write(f'{{"last_order_id": {int(last * (1 - NEW_ORDERS_SHARE))}}}')
+        report(f'+{NEW_ORDERS_SHARE:.0%} заказов', export_history(conn, out, args.format))
+        report('без новых заказов', export_history(conn, out, args.format))
+        
+        size = sum(os.path.getsize(os.path.join(out, name)) for name in os.listdir(out))
+        print(f"\nРазмер выгрузки: {size / 2 ** 20:,.0f} МБ")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_federation.py
+"""Сводные запросы по салонам (federation.py): задержка в зависимости от числа салонов
+
+Запуск: python benchmarks/bench_federation.py [--scale 0.01] [--branches 1 2 4 8] [--repeat 20]
+Базы салонов — копии одной базы generate_data.py. Каждый запрос замеряется
+при последовательном обходе салонов (пул из одного потока) и параллельном
+(поток на салон); в таблице — медиана и p95 в миллисекундах. Выигрыш пула
+ограничен числом ядер: SQLite отпускает GIL на время выполнения запроса,
+но разбор строк в Python идёт по очереди.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from federation import BranchFederation
+from generate_data import generate
+
+QUERIES = [
+    ('каталог, страница', lambda federation: federation.products(limit=50)),
+    ('остатки по названию', lambda federation: federation.stock('Диван', limit=50)),
+    ('последние заказы', lambda federation: federation.orders(limit=50)),
+    ('итоги продаж', lambda federation: federation.summary()),
+    ('топ товаров', lambda federation: federation.top_products()),
+]
+
+
+def timings(federation, query, repeat):
+    """Медиана и p95 в мс; первый вызов прогревает кэш страниц"""
+    query(federation)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query(federation)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.01, help='объём базы каждого салона')
+    parser.add_argument('--branches', type=int, nargs='*', default=[1, 2, 4, 8], help='числа салонов')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'branch.db')
+        counts = generate(template, args.scale)
+        paths = {}
+        for number in range(max(args.branches)):
+            paths[f'салон {number + 1}'] = path = os.path.join(tmp, f'branch{number + 1}.db')
+            shutil.copy(template, path)
+        
+        print(f"\nСалон: {', '.join(f'{name} {count:,}' for name, count in counts.items())}; "
+              f"{os.cpu_count()} ядер, {args.repeat} повторов")
+        print(f"{'запрос':<22} {'салонов':>8} {'по очереди, мс':>22} {'параллельно, мс':>22} {'ускорение':>10}")
+        print(f"{'':<22} {'':>8} {'p50':>10} {'p95':>11} {'p50':>10} {'p95':>11}")
+        for name, query in QUERIES:
+            for count in args.branches:
+                branches = dict(list(paths.items())[:count])
+                results = []
+                for workers in (1, count):
+                    federation = BranchFederation(branches, workers=workers)
+                    try:
+                        results.append(timings(federation, query, args.repeat))
+                    finally:
+                        federation.close()
+                (serial, serial95), (parallel, parallel95) = results
+                print(f"{name:<22} {count:>8} {serial:>10.2f} {serial95:>11.2f} {parallel:>10.2f} {parallel95:>11.2f} "
+                      f"{serial / parallel:>9.2f}×")
+
+
+if __name__ == '__main__':
+    main()
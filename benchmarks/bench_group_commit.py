@@ -0,0 +1,148 @@
+# benchmarks/bench_group_commit.py
+"""Заказов в секунду: фиксация каждого заказа против группового писателя (writer.py)
+
+Запуск: python benchmarks/bench_group_commit.py [--cashiers 16] [--seconds 5] [--profiles wal default]
+Кассы — потоки, каждая оформляет заказы из 1–3 строк подряд. Остатки малы,
+поэтому часть заказов отклоняется; после прогона проверяется, что остаток
+нигде не ушёл в минус и списано ровно столько, сколько продано.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import connect, migrate
+from services import OrderService, OutOfStockError
+from writer import GroupCommitWriter
+
+PRODUCTS = 2000
+CUSTOMERS = 500
+MAX_STOCK = 40
+
+
+def make_db(path):
+    """Каталог с небольшими остатками и клиенты"""
+    rng = random.Random(1)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.executemany("INSERT INTO products (name, price, stock) VALUES (?, ?, ?)",
+                     [(f'Товар {i}', 1000 + i, rng.randint(0, MAX_STOCK)) for i in range(PRODUCTS)])
+    conn.executemany("INSERT INTO customers (first_name, last_name, email) VALUES (?, ?, ?)",
+                     [(f'Имя {i}', f'Фамилия {i}', f'c{i}@mail.com') for i in range(CUSTOMERS)])
+    conn.commit()
+    conn.close()
+
+
+def cart(rng):
+    return [{'id': rng.randint(1, PRODUCTS), 'quantity': rng.randint(1, 3), 'price': 1000.0}
+            for _ in range(rng.randint(1, 3))]
+
+
+def per_order(path, profile, cashiers, seconds):
+    """Каждая касса со своим соединением фиксирует каждый заказ (как save_order)"""
+    def cashier(seed, deadline, results):
+        rng = random.Random(seed)
+        service = OrderService(connect(path, profile, timeout=30))
+        placed = rejected = 0
+        while time.perf_counter() < deadline:
+            try:
+                service.place_order(rng.randint(1, CUSTOMERS), cart(rng), 'Карта')
+                placed += 1
+            except OutOfStockError:
+                rejected += 1
+        service.conn.close()
+        results.append((placed, rejected))
+    
+    return run_cashiers(cashier, cashiers, seconds, lambda: None)
+
+
+def grouped(path, profile, cashiers, seconds, window_ms):
+    """Кассы ставят заказы в GroupCommitWriter и ждут их номер"""
+    writer = GroupCommitWriter(path, profile, window_ms=window_ms)
+    
+    def cashier(seed, deadline, results):
+        rng = random.Random(seed)
+        placed = rejected = 0
+        while time.perf_counter() < deadline:
+            try:
+                writer.place_order(rng.randint(1, CUSTOMERS), cart(rng), 'Карта').result()
+                placed += 1
+            except OutOfStockError:
+                rejected += 1
+        results.append((placed, rejected))
+    
+    return run_cashiers(cashier, cashiers, seconds, writer.close, writer)
+
+
+def run_cashiers(cashier, count, seconds, finish, writer=None):
+    """Запустить кассы до истечения времени; вернуть (заказов/с, отказов/с, средняя пачка)"""
+    results = []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    threads = [threading.Thread(target=cashier, args=(seed, deadline, results)) for seed in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    finish()
+    placed = sum(p for p, r in results)
+    rejected = sum(r for p, r in results)
+    batch = writer.committed / writer.batches if writer is not None and writer.batches else 1
+    return placed / elapsed, rejected / elapsed, batch
+
+
+def check(path, initial_stock):
+    """Остатки не отрицательны и уменьшились ровно на проданное"""
+    conn = sqlite3.connect(path)
+    negative = conn.execute("SELECT COUNT(*) FROM products WHERE stock < 0").fetchone()[0]
+    stock = conn.execute("SELECT SUM(stock) FROM products").fetchone()[0]
+    sold = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM order_items").fetchone()[0]
+    conn.close()
+    return negative == 0 and initial_stock - stock == sold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cashiers', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profiles', nargs='*', default=['wal', 'default'])
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        make_db(template)
+        conn = sqlite3.connect(template)
+        initial_stock = conn.execute("SELECT SUM(stock) FROM products").fetchone()[0]
+        conn.close()
+        
+        variants = [
+            ('фиксация каждого заказа', lambda db, profile: per_order(db, profile, args.cashiers, args.seconds)),
+            ('групповая, без ожидания', lambda db, profile: grouped(db, profile, args.cashiers, args.seconds, 0)),
+            ('групповая, окно 2 мс', lambda db, profile: grouped(db, profile, args.cashiers, args.seconds, 2)),
+        ]
+        print(f"\n{args.cashiers} касс, {args.seconds:g} с на замер")
+        print(f"{'профиль':<8} {'способ':<26} {'заказов/с':>10} {'отказов/с':>10} {'пачка':>7}  остатки")
+        for profile in args.profiles:
+            for name, run in variants:
+                db = os.path.join(tmp, 'shop.db')
+                shutil.copy(template, db)
+                connect(db, profile).close()  # journal_mode сохраняется в файле
+                placed, rejected, batch = run(db, profile)
+                ok = check(db, initial_stock)
+                print(f"{profile:<8} {name:<26} {placed:>10,.0f} {rejected:>10,.0f} {batch:>7.1f}  "
+                      f"{'✅' if ok else '❌ нарушены'}")
+                for suffix in ('', '-wal', '-shm', '-journal'):
+                    if os.path.exists(db + suffix):
+                        os.remove(db + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+# benchmarks/bench_hot_paths.py
+"""Время горячих путей магазина на большой базе со сравнением с сохранённым эталоном
+
+Запуск:
+    python benchmarks/generate_data.py big.db              # один раз, ~2 мин
+    python benchmarks/bench_hot_paths.py big.db --save     # записать эталон
+    python benchmarks/bench_hot_paths.py big.db            # сравнить с эталоном
+
+Без пути к базе она генерируется во временном каталоге с --scale.
+Заказы, оформленные замером complete_order, после запуска удаляются.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import apply_order_sales, connect, migrate
+from generate_data import generate
+from services import OrderService, ReportService, ShopRepository
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'hot_paths.json')
+CART_SIZE = 5
+MIN_SECONDS = 0.5    # каждый путь повторяется не меньше этого времени
+MIN_DELTA_MS = 1.0   # замедление меньше этого считается шумом
+
+
+def sample(conn):
+    """Параметры запросов, которые точно есть в базе"""
+    middle = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] // 2
+    # Ключ страницы из середины каталога: (id, name), как последняя строка предыдущей
+    page_key = conn.execute("SELECT id, name FROM products ORDER BY name, id LIMIT 1 OFFSET ?",
+                            (middle,)).fetchone()
+    # Одни и те же заказы и товары при каждом запуске — равномерно по диапазону id
+    last_order = conn.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+    last_product = conn.execute("SELECT MAX(id) FROM products").fetchone()[0]
+    orders = sorted({last_order * k // 100 + 1 for k in range(100)})
+    cart = sorted({last_product * k // CART_SIZE + 1 for k in range(CART_SIZE)})
+    customer = conn.execute("SELECT id FROM customers LIMIT 1").fetchone()[0]
+    # Месяц посередине истории заказов — для фильтра по периоду
+    month = conn.execute("SELECT substr(order_date, 1, 7) FROM orders WHERE id = ?",
+                         (orders[len(orders) // 2],)).fetchone()[0]
+    category = conn.execute('''
+        SELECT c.name FROM categories c JOIN products p ON p.category_id = c.id LIMIT 1
+    ''').fetchone()[0]
+    return {
+        'page_key': page_key,
+        'last_order': last_order,
+        'orders': orders,
+        'cart': cart,
+        'customer': customer,
+        'category': category,
+        'month': (month + '-01', month + '-31'),
+    }
+
+
+def hot_paths(conn, params):
+    """(название, функция) — то же, что делают обработчики окна"""
+    repo = ShopRepository(conn)
+    service = OrderService(conn)
+    reports = ReportService(conn)
+    order_ids = itertools.cycle(params['orders'])
+    cart = [{'id': product_id, 'quantity': 1, 'price': 1000.0} for product_id in params['cart']]
+    return [
+        ('load_products', lambda: repo.list_products().fetchall()),
+        ('load_products (next page)', lambda: repo.list_products(params['page_key']).fetchall()),
+        ('search_products', lambda: repo.search_products('диван комфорт').fetchall()),
+        ('filter_by_category', lambda: repo.list_products(category=params['category']).fetchall()),
+        ('load_categories', lambda: repo.list_categories().fetchall()),
+        ('load_customers', lambda: repo.list_customers().fetchall()),
+        ('search_customers', lambda: repo.search_customers('петров').fetchall()),
+        ('load_orders', lambda: repo.list_orders().fetchall()),
+        ('load_orders (next page)', lambda: repo.list_orders(after=(params['orders'][50],)).fetchall()),
+        ('filter_orders_by_status', lambda: repo.list_orders('Доставлен').fetchall()),
+        ('filter_orders (month)', lambda: repo.list_orders(None, *params['month']).fetchall()),
+        ('filter_orders (status and month)', lambda: repo.list_orders('Доставлен', *params['month']).fetchall()),
+        ('view_order_details', lambda: repo.order_items(next(order_ids))),
+        ('complete_order', lambda: [service.place_order(params['customer'], cart, 'Карта')]),
+        ('report_revenue (month)', lambda: reports.revenue('month')),
+        ('report_top_products', lambda: reports.top_products()),
+        ('report_category_mix', lambda: reports.category_mix()),
+        ('report_payment_split', lambda: reports.payment_split()),
+    ]
+
+
+def cleanup(conn, params, stock):
+    """Удалить заказы, оформленные замером, вычесть их из сводок и вернуть остатки товаров корзины"""
+    cursor = conn.cursor()
+    for (order_id,) in conn.execute("SELECT id FROM orders WHERE id > ?", (params['last_order'],)).fetchall():
+        apply_order_sales(cursor, order_id, -1)
+    conn.execute('''
+        DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE id > ?)
+    ''', (params['last_order'],))
+    conn.execute("DELETE FROM orders WHERE id > ?", (params['last_order'],))
+    conn.executemany("UPDATE products SET stock = ? WHERE id = ?", [(v, k) for k, v in stock.items()])
+    conn.commit()
+
+
+def measure(fn, repeat):
+    """Прогрев и не меньше repeat замеров за MIN_SECONDS: (времена в мс, число строк)"""
+    rows = len(fn())
+    times = []
+    deadline = time.perf_counter() + MIN_SECONDS
+    while len(times) < repeat or time.perf_counter() < deadline and len(times) < 10000:
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times, rows
+
+
+def run(path, repeat):
+    """Замерить все горячие пути на базе path"""
+    conn = connect(path)
+    migrate(conn)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ('products', 'customers', 'orders', 'order_items')}
+    params = sample(conn)
+    stock = dict(conn.execute(f"SELECT id, stock FROM products WHERE id IN ({','.join('?' * len(params['cart']))})",
+                              params['cart']).fetchall())
+    # Остаток под многократное оформление одной и той же корзины
+    conn.executemany("UPDATE products SET stock = 1000000000 WHERE id = ?", [(i,) for i in params['cart']])
+    conn.commit()
+    
+    results = {}
+    try:
+        for name, fn in hot_paths(conn, params):
+            times, rows = measure(fn, repeat)
+            results[name] = {
+                'median_ms': round(statistics.median(times), 3),
+                'min_ms': round(min(times), 3),
+                'max_ms': round(max(times), 3),
+                'runs': len(times),
+                'rows': rows,
+            }
+            print(f"{name:<28} {results[name]['median_ms']:>10.2f} мс  ({rows} строк)")
+    finally:
+        cleanup(conn, params, stock)
+        conn.close()
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'repeat': repeat,
+            'counts': counts,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Пути, ставшие медленнее эталона более чем в tolerance раз"""
+    if baseline['meta']['counts'] != report['meta']['counts']:
+        print("⚠️ Объём данных отличается от эталонного — сравнение приблизительное")
+    regressions = []
+    print(f"\n{'путь':<28} {'эталон, мс':>11} {'сейчас, мс':>11} {'×':>6}")
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['median_ms'] / max(base['median_ms'], 0.001)
+        slower = ratio > tolerance and result['median_ms'] - base['median_ms'] > MIN_DELTA_MS
+        mark = ' ❌' if slower else ''
+        print(f"{name:<28} {base['median_ms']:>11.2f} {result['median_ms']:>11.2f} {ratio:>6.2f}{mark}")
+        if slower:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', help='база от generate_data.py')
+    parser.add_argument('--scale', type=float, default=0.1, help='объём генерируемой базы без path')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE, help='файл эталона (JSON)')
+    parser.add_argument('--save', action='store_true', help='записать результат как новый эталон')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='допустимое замедление, раз')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, 'bench.db')
+            generate(path, args.scale)
+        report = run(path, args.repeat)
+    
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Эталон записан: {args.baseline}")
+        return
+    
+    if not os.path.exists(args.baseline):
+        print("Эталона нет — запустите с --save")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ Замедлились: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
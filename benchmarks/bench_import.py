@@ -0,0 +1,93 @@
+# benchmarks/bench_import.py
+"""Массовая загрузка каталога: по одному товару против BulkImporter с индексами и без
+
+Запуск: python benchmarks/bench_import.py [--rows 50000] [--scale 0.05]
+Каждый способ загружает один и тот же CSV в свою копию базы generate_data.py.
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import connect
+from generate_data import CATEGORIES, generate, product_rows
+from importer import BulkImporter
+from services import ShopRepository
+
+ONE_BY_ONE_ROWS = 2000   # по одному с фиксацией каждой строки — долго, берём начало файла
+
+
+def write_catalog(path, count, seed=2):
+    """CSV поставщика: заголовки как в окне товара, категории по названию"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Название товара', 'Цена (₽)', 'Количество на складе', 'Категория',
+                         'Материал', 'Цвет', 'Описание'])
+        for name, price, stock, category_id, material, color, description in product_rows(
+                random.Random(seed), count):
+            writer.writerow([f'Поставщик {name}', price, stock, CATEGORIES[category_id - 1],
+                             material, color, description])
+
+
+def one_by_one(db, catalog):
+    """Как диалог «Добавить товар»: поиск категории и фиксация на каждую строку"""
+    conn = connect(db)
+    repo = ShopRepository(conn)
+    with open(catalog, newline='', encoding='utf-8') as f:
+        rows = csv.reader(f, delimiter=';')
+        next(rows)
+        start = time.perf_counter()
+        count = 0
+        for name, price, stock, category, material, color, description in rows:
+            repo.add_product(name, float(price), int(stock), category, material, color, description)
+            count += 1
+            if count == ONE_BY_ONE_ROWS:
+                break
+    conn.close()
+    return count, time.perf_counter() - start
+
+
+def bulk(db, catalog, rebuild):
+    """BulkImporter с заданным режимом перестройки индексов"""
+    conn = connect(db)
+    start = time.perf_counter()
+    result = BulkImporter(conn, 'products', rebuild=rebuild).run(catalog)
+    conn.close()
+    return result['inserted'], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50_000, help='строк в загружаемом каталоге')
+    parser.add_argument('--scale', type=float, default=0.05, help='объём базы, в которую идёт загрузка')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'base.db')
+        counts = generate(base, args.scale)
+        catalog = os.path.join(tmp, 'catalog.csv')
+        write_catalog(catalog, args.rows)
+        
+        print(f"\nЗагрузка {args.rows:,} товаров в базу с {counts['products']:,} товарами")
+        print(f"{'способ':<32} {'строк':>9} {'с':>8} {'строк/с':>10}")
+        variants = [
+            ('по одному (add_product)', lambda db: one_by_one(db, catalog)),
+            ('executemany, индексы на месте', lambda db: bulk(db, catalog, False)),
+            ('executemany, индексы заново', lambda db: bulk(db, catalog, True)),
+        ]
+        for name, load in variants:
+            db = os.path.join(tmp, 'import.db')
+            shutil.copy(base, db)
+            rows, seconds = load(db)
+            print(f"{name:<32} {rows:>9,} {seconds:>8.2f} {rows / seconds:>10,.0f}")
+            os.remove(db)
+
+
+if __name__ == '__main__':
+    main()
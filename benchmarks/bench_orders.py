@@ -0,0 +1,131 @@
+# benchmarks/bench_orders.py
+"""Пропускная способность оформления заказа: построчные запросы против одной транзакции
+
+Запуск: python benchmarks/bench_orders.py [--sizes 1 10 100 1000] [--lines 20000] [--cashiers 8]
+Заказы по одному оформляются прежним построчным способом и через
+OrderService.place_order. Перед замером --cashiers касс одновременно
+раскупают один товар: продано должно быть ровно столько, сколько было.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import migrate
+from services import OrderService, OutOfStockError
+
+PRODUCTS = 5000
+CART_SIZES = (1, 10, 100, 1000)
+LINES_PER_RUN = 20_000  # строк корзины на каждый размер корзины
+
+
+def make_db(path):
+    """База с товарами, у которых заведомо хватает остатка"""
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("INSERT INTO customers (first_name, last_name) VALUES ('Тест', 'Тестов')")
+    conn.executemany("INSERT INTO products (name, price, stock) VALUES (?, ?, ?)",
+                     [(f'Товар {i}', 1000 + i, 10 ** 9) for i in range(PRODUCTS)])
+    conn.commit()
+    return conn
+
+
+def legacy_place_order(conn, customer_id, items, payment):
+    """Прежний save_order: по одному INSERT и UPDATE на строку без проверки остатка"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO orders (customer_id, order_date, total_amount, status, payment_method)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (customer_id, datetime.now().strftime("%Y-%m-%d %H:%M"),
+          sum(item['subtotal'] for item in items), 'Новый', payment))
+    order_id = cursor.lastrowid
+    for item in items:
+        cursor.execute('''
+            INSERT INTO order_items (order_id, product_id, quantity, price_per_unit, subtotal)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (order_id, item['id'], item['quantity'], item['price'], item['subtotal']))
+        cursor.execute('UPDATE products SET stock = stock - ? WHERE id = ?', (item['quantity'], item['id']))
+    conn.commit()
+    return order_id
+
+
+def make_cart(size, offset):
+    """Корзина из size разных товаров"""
+    return [{'id': (offset + i) % PRODUCTS + 1, 'quantity': 1, 'price': 1000.0, 'subtotal': 1000.0}
+            for i in range(size)]
+
+
+def run(name, place_order, conn, size, lines=LINES_PER_RUN):
+    """Оформить заказы с корзиной size и вернуть (заказов/с, строк/с)"""
+    orders = max(5, min(2000, lines // size))
+    carts = [make_cart(size, i * size) for i in range(orders)]
+    start = time.perf_counter()
+    for cart in carts:
+        place_order(conn, 1, cart, 'Карта')
+    elapsed = time.perf_counter() - start
+    return orders / elapsed, orders * size / elapsed
+
+
+def check_no_oversell(path, cashiers=8, stock=50):
+    """Несколько касс одновременно раскупают один товар: (продано, осталось)"""
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE products SET stock = ? WHERE id = 1", (stock,))
+    conn.commit()
+    sold = []
+    
+    def cashier():
+        own = sqlite3.connect(path, timeout=30)
+        service = OrderService(own)
+        while True:
+            try:
+                service.place_order(1, [{'id': 1, 'quantity': 1, 'price': 1000.0}], 'Наличные')
+                sold.append(1)
+            except OutOfStockError:
+                break
+        own.close()
+    
+    threads = [threading.Thread(target=cashier) for _ in range(cashiers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    left = conn.execute("SELECT stock FROM products WHERE id = 1").fetchone()[0]
+    conn.close()
+    return len(sold), left
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=CART_SIZES, help='размеры корзины')
+    parser.add_argument('--lines', type=int, default=LINES_PER_RUN, help='строк корзины на каждый размер')
+    parser.add_argument('--cashiers', type=int, default=8, help='касс в проверке перепродажи')
+    parser.add_argument('--stock', type=int, default=50, help='остаток товара в проверке перепродажи')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'contention.db')
+        make_db(path).close()
+        sold, left = check_no_oversell(path, args.cashiers, args.stock)
+        print(f"{args.cashiers} касс, остаток {args.stock}: продано {sold}, осталось {left} "
+              f"{'✅' if sold == args.stock and left == 0 else '❌ перепродажа'}\n")
+        
+        print(f"{'корзина':>8} | {'способ':<12} | {'заказов/с':>10} | {'строк/с':>10}")
+        for size in args.sizes:
+            for name, place_order in [
+                ('построчно', legacy_place_order),
+                ('транзакция', lambda conn, *params: OrderService(conn).place_order(*params)),
+            ]:
+                conn = make_db(os.path.join(tmp, f'{name}-{size}.db'))
+                orders_per_sec, lines_per_sec = run(name, place_order, conn, size, args.lines)
+                conn.close()
+                print(f"{size:>8} | {name:<12} | {orders_per_sec:>10.0f} | {lines_per_sec:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/bench_replication.py
+"""Репликация по журналу изменений (replicate.py): скорость применения, задержка и цена журнала
+
+Запуск: python benchmarks/bench_replication.py [--scale 0.01] [--orders 2000] [--rate 100] [--seconds 10]
+1. Цена журнала: заказов в секунду в источнике с триггерами changes и без них.
+2. Применение: накопленные изменения переносятся в реплику пачками разного размера.
+3. Задержка: касса оформляет --rate заказов в секунду, репликатор следит за
+   журналом в соседнем потоке; задержка — возраст самого старого
+   неприменённого изменения перед каждой проверкой.
+После каждого прогона таблицы реплики сверяются с источником.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import CHANGE_TABLES, CUSTOMER_STATS_TABLES, SALES_TABLES, connect
+from generate_data import generate
+from replicate import Replicator
+from services import ORDER_STATUSES, OrderService, OutOfStockError
+
+def churn(conn, counts, orders, rng):
+    """Заказы и смена статусов примерно в пропорции 4:1"""
+    service = OrderService(conn)
+    placed = 0
+    while placed < orders:
+        if placed and rng.random() < 0.2:
+            service.set_status(rng.randint(1, counts['orders']), rng.choice(ORDER_STATUSES))
+            continue
+        items = [{'id': rng.randint(1, counts['products']), 'quantity': 1, 'price': 1000.0}
+                 for _ in range(rng.randint(1, 3))]
+        try:
+            service.place_order(rng.randint(1, counts['customers']), items, 'Карта')
+        except OutOfStockError:
+            continue
+        placed += 1
+
+
+def same_data(source_path, target_path):
+    """Таблицы журнала, сводки продаж и покупок клиентов реплики совпадают с источником"""
+    def dump(path):
+        conn = sqlite3.connect(path)
+        tables = {}
+        for table in list(CHANGE_TABLES) + list(SALES_TABLES + CUSTOMER_STATS_TABLES):
+            rows = conn.execute(f"SELECT * FROM {table}").fetchall()
+            # Нулевые строки сводок остаются после отмены заказа и ничего не значат
+            tables[table] = sorted(tuple(round(value, 2) if isinstance(value, float) else value for value in row)
+                                   for row in rows if table in CHANGE_TABLES or any(row[-2:]))
+        conn.close()
+        return tables
+    return dump(source_path) == dump(target_path)
+
+
+def capture_cost(template, tmp, counts, orders):
+    """Заказов в секунду без журнала и с журналом изменений"""
+    results = []
+    for logged in (False, True):
+        path = os.path.join(tmp, 'cost.db')
+        shutil.copy(template, path)
+        conn = connect(path)
+        if not logged:
+            for table in CHANGE_TABLES:
+                for suffix in ('ai', 'au', 'ad'):
+                    conn.execute(f"DROP TRIGGER {table}_changes_{suffix}")
+        started = time.perf_counter()
+        churn(conn, counts, orders, random.Random(1))
+        results.append(orders / (time.perf_counter() - started))
+        conn.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return results
+
+
+def follow(source, target, interval, stop, lags, batch):
+    """Поток репликатора: замер задержки, затем перенос всего накопившегося"""
+    replicator = Replicator(source, target, batch=batch)
+    while not stop.is_set():
+        lags.append(replicator.lag())
+        replicator.sync()
+        stop.wait(interval)
+    replicator.sync()
+    replicator.close()
+
+
+def cashier(source, counts, rate, seconds):
+    """Оформлять rate заказов в секунду равномерно; вернуть число оформленных"""
+    conn = connect(source)
+    rng = random.Random(2)
+    started = time.perf_counter()
+    placed = 0
+    while time.perf_counter() - started < seconds:
+        churn(conn, counts, 1, rng)
+        placed += 1
+        delay = started + placed / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    conn.close()
+    return placed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.01, help='объём базы generate_data.py')
+    parser.add_argument('--orders', type=int, default=2000, help='заказов для замеров 1 и 2')
+    parser.add_argument('--batches', type=int, nargs='*', default=[100, 1000, 10000], help='размеры пачек')
+    parser.add_argument('--rate', type=float, default=100, help='заказов в секунду при замере задержки')
+    parser.add_argument('--seconds', type=float, default=10, help='длительность замера задержки')
+    parser.add_argument('--interval', type=float, nargs='*', default=[0.05, 0.5], help='пауза репликатора, с')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        counts = generate(template, args.scale)
+        
+        without, logged = capture_cost(template, tmp, counts, args.orders)
+        print(f"\n1. Заказов в секунду: без журнала {without:,.0f}, с журналом {logged:,.0f} "
+              f"({(without / logged - 1) * 100:+.0f}% времени на заказ)")
+        
+        source = os.path.join(tmp, 'source.db')
+        shutil.copy(template, source)
+        replica = os.path.join(tmp, 'replica.db')
+        Replicator(source, replica).close()
+        conn = connect(source)
+        churn(conn, counts, args.orders, random.Random(1))
+        changes = conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+        conn.close()
+        
+        print(f"\n2. Применение {changes:,} изменений ({args.orders:,} заказов и смены статусов)")
+        print(f"{'пачка':>8} {'изменений/с':>12} {'всего, с':>9}  реплика")
+        for batch in args.batches:
+            target = os.path.join(tmp, f'replica{batch}.db')
+            shutil.copy(replica, target)
+            replicator = Replicator(source, target, batch=batch)
+            started = time.perf_counter()
+            applied = replicator.sync()
+            elapsed = time.perf_counter() - started
+            replicator.close()
+            print(f"{batch:>8,} {applied / elapsed:>12,.0f} {elapsed:>9.2f}  "
+                  f"{'✅ совпадает' if same_data(source, target) else '❌ расходится'}")
+        
+        print(f"\n3. Задержка реплики при {args.rate:g} заказах в секунду, {args.seconds:g} с")
+        print(f"{'пауза, с':>9} {'p50, мс':>9} {'p95, мс':>9} {'макс, мс':>9}  реплика")
+        for interval in args.interval:
+            live = os.path.join(tmp, f'live{interval}.db')
+            shutil.copy(source, live)
+            target = os.path.join(tmp, f'follow{interval}.db')
+            Replicator(live, target).close()
+            stop, lags = threading.Event(), []
+            thread = threading.Thread(target=follow, args=(live, target, interval, stop, lags, 1000))
+            thread.start()
+            cashier(live, counts, args.rate, args.seconds)
+            stop.set()
+            thread.join()
+            lags.sort()
+            print(f"{interval:>9g} {statistics.median(lags) * 1000:>9.0f} "
+                  f"{lags[int(len(lags) * 0.95)] * 1000:>9.0f} {lags[-1] * 1000:>9.0f}  "
+                  f"{'✅ совпадает' if same_data(live, target) else '❌ расходится'}")
+
+
+if __name__ == '__main__':
+    main()
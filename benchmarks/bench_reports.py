@@ -0,0 +1,118 @@
+# benchmarks/bench_reports.py
+"""Отчёты о продажах: сводки sales_* против агрегирования всех заказов
+
+Запуск: python benchmarks/bench_reports.py [big.db] [--scale 0.1]
+Без пути к базе она генерируется во временном каталоге с --scale.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import CANCELLED_STATUS, connect, migrate
+from generate_data import generate
+from services import ReportService
+
+REPEAT = 5
+
+# Те же отчёты запросами по orders/order_items — как без сводок
+SCAN_QUERIES = {
+    'revenue (day)': '''
+        SELECT substr(o.order_date, 1, 10), COUNT(DISTINCT o.id), SUM(oi.subtotal)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status != ? GROUP BY 1 ORDER BY 1
+    ''',
+    'revenue (month)': '''
+        SELECT substr(o.order_date, 1, 7), COUNT(DISTINCT o.id), SUM(oi.subtotal)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status != ? GROUP BY 1 ORDER BY 1
+    ''',
+    'top_products': '''
+        SELECT oi.product_id, SUM(oi.quantity), SUM(oi.subtotal)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status != ? GROUP BY 1 ORDER BY 3 DESC LIMIT 10
+    ''',
+    'category_mix': '''
+        SELECT p.category_id, SUM(oi.quantity), SUM(oi.subtotal)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id JOIN products p ON p.id = oi.product_id
+        WHERE o.status != ? GROUP BY 1
+    ''',
+    'payment_split': '''
+        SELECT o.payment_method, COUNT(DISTINCT o.id), SUM(oi.subtotal)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status != ? GROUP BY 1
+    ''',
+    'summary': '''
+        SELECT COUNT(DISTINCT o.id), SUM(oi.subtotal)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status != ?
+    ''',
+}
+
+
+def median_ms(fn, repeat):
+    """Медиана времени вызова fn в мс после прогрева"""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run(path):
+    """Сравнить отчёты по сводкам с полным пересчётом на базе path"""
+    conn = connect(path)
+    migrate(conn)
+    orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    last_day = conn.execute("SELECT MAX(substr(order_date, 1, 10)) FROM orders").fetchone()[0]
+    month_start = last_day[:8] + '01'
+    reports = ReportService(conn)
+    rollups = {
+        'revenue (day)': lambda: reports.revenue('day'),
+        'revenue (month)': lambda: reports.revenue('month'),
+        'top_products': lambda: reports.top_products(),
+        'category_mix': lambda: reports.category_mix(),
+        'payment_split': lambda: reports.payment_split(),
+        'summary': lambda: reports.summary(),
+    }
+    print(f"Заказов: {orders:,}\n")
+    print(f"{'отчёт':<28} {'сводки, мс':>11} {'заказы, мс':>11} {'×':>8}")
+    for name, report in rollups.items():
+        fast = median_ms(report, REPEAT)
+        sql = SCAN_QUERIES[name]
+        slow = median_ms(lambda: conn.execute(sql, (CANCELLED_STATUS,)).fetchall(), 1)
+        print(f"{name:<28} {fast:>11.2f} {slow:>11.0f} {slow / max(fast, 0.001):>8.0f}")
+    
+    # Отчёты за последний месяц: топ товаров сводится по месяцам
+    print()
+    for name, report in [
+        ('revenue (day), месяц', lambda: reports.revenue('day', month_start, last_day)),
+        ('top_products, месяц', lambda: reports.top_products(month_start, last_day)),
+        ('category_mix, месяц', lambda: reports.category_mix(month_start, last_day)),
+    ]:
+        print(f"{name:<28} {median_ms(report, REPEAT):>11.2f}")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', help='база от generate_data.py')
+    parser.add_argument('--scale', type=float, default=0.1, help='объём генерируемой базы без path')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, 'reports.db')
+            generate(path, args.scale)
+        run(path)
+
+
+if __name__ == '__main__':
+    main()
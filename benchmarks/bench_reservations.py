@@ -0,0 +1,184 @@
+# benchmarks/bench_reservations.py
+"""Резервы товаров в корзинах (ReservationService): одновременные кассы и последние единицы
+
+Запуск: python benchmarks/bench_reservations.py [--cashiers 4] [--seconds 5] [--products 50] [--stock 10]
+Кассы — отдельные процессы над одной базой с небольшим остатком товаров.
+Каждая собирает корзину из 1–3 товаров, пока покупатель думает (--think),
+и оформляет заказ; часть корзин бросается (резервы истекают через --ttl)
+или очищается.
+- без резервов: остаток проверяется при добавлении в корзину, как раньше,
+  и к оформлению товар может уже уйти другой кассе;
+- с резервами: добавление в корзину резервирует товар, поэтому отказать
+  может только добавление, а оформление проходит.
+После прогона сверяется, что остатки не ушли в минус и продано не больше,
+чем было. Затем замеряется запрос доступного остатка при множестве резервов.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import connect, migrate
+from services import OrderService, OutOfStockError, ReservationService
+
+CUSTOMERS = 100
+
+# Резервов для замера запроса доступного остатка
+RESERVATIONS = 100_000
+CATALOG = 10_000
+
+
+def make_db(path, products, stock):
+    conn = connect(path)
+    migrate(conn)
+    conn.executemany("INSERT INTO products (name, price, stock) VALUES (?, ?, ?)",
+                     [(f'Товар {i}', 1000, stock) for i in range(products)])
+    conn.executemany("INSERT INTO customers (first_name, last_name, email) VALUES (?, ?, ?)",
+                     [(f'Имя {i}', f'Фамилия {i}', f'c{i}@mail.com') for i in range(CUSTOMERS)])
+    conn.commit()
+    conn.close()
+
+
+def cashier(path, holds, seed, deadline, args, results):
+    """Процесс-касса: корзины до deadline; отдаёт счётчики исходов"""
+    conn = connect(path, timeout=30)
+    orders = OrderService(conn)
+    rng = random.Random(seed)
+    stats = Counter()
+    basket = 0
+    while time.time() < deadline:
+        # У каждой корзины свой идентификатор: резервы брошенной живут до истечения
+        basket += 1
+        reservations = ReservationService(conn, f'касса {seed}, корзина {basket}', args.ttl)
+        cart = {}
+        for _ in range(rng.randint(1, 3)):
+            product_id = rng.randint(1, args.products)
+            quantity = cart.get(product_id, 0) + 1
+            if holds:
+                try:
+                    reservations.hold(product_id, quantity)
+                except OutOfStockError:
+                    stats['refused'] += 1
+                    continue
+            elif conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()[0] < quantity:
+                stats['refused'] += 1
+                continue
+            cart[product_id] = quantity
+        time.sleep(args.think)
+        if not cart:
+            continue
+        
+        outcome = rng.random()
+        if outcome < args.abandon:
+            stats['abandoned'] += 1
+            continue
+        if outcome < args.abandon + args.clear:
+            reservations.release()
+            stats['cleared'] += 1
+            continue
+        items = [{'id': product_id, 'quantity': quantity, 'price': 1000.0} for product_id, quantity in cart.items()]
+        try:
+            orders.place_order(rng.randint(1, CUSTOMERS), items, 'Карта', cart=reservations.cart if holds else None)
+        except OutOfStockError:
+            reservations.release()
+            stats['failed'] += 1
+            continue
+        stats['orders'] += 1
+        stats['units'] += sum(cart.values())
+    conn.close()
+    results.put(stats)
+
+
+def run(args, holds):
+    """Прогон касс на свежей базе: (счётчики, проблемы сверки)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'shop.db')
+        make_db(path, args.products, args.stock)
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.seconds
+        processes = [multiprocessing.Process(target=cashier, args=(path, holds, seed, deadline, args, results))
+                     for seed in range(args.cashiers)]
+        for process in processes:
+            process.start()
+        stats = Counter()
+        for _ in processes:
+            stats.update(results.get())
+        for process in processes:
+            process.join()
+        
+        conn = connect(path)
+        problems = [f'товар {product_id}: остаток {stock}, продано {sold}' for product_id, stock, sold in conn.execute('''
+            SELECT p.id, p.stock, COALESCE(SUM(oi.quantity), 0)
+            FROM products p
+            LEFT JOIN order_items oi ON oi.product_id = p.id
+            GROUP BY p.id
+            HAVING p.stock < 0 OR p.stock + COALESCE(SUM(oi.quantity), 0) != ?
+        ''', (args.stock,))]
+        if stats['units'] > args.products * args.stock:
+            problems.append(f"продано {stats['units']} из {args.products * args.stock}")
+        conn.close()
+    return stats, problems
+
+
+def available_cost(repeat=2000):
+    """p50 запроса доступного остатка (мкс) без резервов и при RESERVATIONS резервов"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'atp.db')
+        make_db(path, CATALOG, 10 ** 6)
+        conn = connect(path)
+        reservations = ReservationService(conn, 'замер')
+        rng = random.Random(3)
+        costs = []
+        for count in (0, RESERVATIONS):
+            # Половина резервов уже истекла и ещё не удалена
+            now = time.time()
+            conn.executemany("INSERT INTO reservations (cart, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)",
+                             [(f'корзина {i}', rng.randint(1, CATALOG), 1, now + (600 if i % 2 else -600))
+                              for i in range(count)])
+            conn.commit()
+            samples = []
+            for _ in range(repeat):
+                product_ids = [rng.randint(1, CATALOG) for _ in range(3)]
+                started = time.perf_counter()
+                reservations.available(product_ids)
+                samples.append((time.perf_counter() - started) * 1e6)
+            costs.append(statistics.median(samples))
+        conn.close()
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cashiers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--products', type=int, default=50, help='товаров в базе')
+    parser.add_argument('--stock', type=int, default=10, help='начальный остаток каждого товара')
+    parser.add_argument('--think', type=float, default=0.05, help='сбор корзины, с')
+    parser.add_argument('--ttl', type=float, default=1.0, help='срок резерва, с')
+    parser.add_argument('--abandon', type=float, default=0.1, help='доля брошенных корзин')
+    parser.add_argument('--clear', type=float, default=0.1, help='доля очищенных корзин')
+    args = parser.parse_args()
+    
+    print(f"{args.cashiers} касс, {args.seconds:g} с, {args.products} товаров по {args.stock} шт.")
+    print(f"{'режим':<14} {'заказов':>8} {'продано':>8} {'отказ в корзину':>16} "
+          f"{'отказ при оформлении':>21} {'брошено':>8}  сверка")
+    for holds in (False, True):
+        stats, problems = run(args, holds)
+        print(f"{'с резервами' if holds else 'без резервов':<14} {stats['orders']:>8} {stats['units']:>8} "
+              f"{stats['refused']:>16} {stats['failed']:>21} {stats['abandoned']:>8}  "
+              f"{'✅' if not problems else '❌ ' + '; '.join(problems[:3])}")
+    
+    empty, loaded = available_cost()
+    print(f"\nДоступный остаток 3 товаров из {CATALOG:,}: {empty:.1f} мкс без резервов, "
+          f"{loaded:.1f} мкс при {RESERVATIONS:,} резервах (p50)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_search.py
+"""Поиск по мере ввода: задержка одного нажатия для индекса в памяти, FTS5 и LIKE
+
+Запуск: python benchmarks/bench_search.py [--scale 0.1]
+Каждый префикс набираемой строки — отдельный запрос первой страницы (200 строк).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import connect
+from generate_data import generate
+from search_index import PrefixIndex
+from services import PAGE_SIZE, ShopRepository
+
+TYPED = ['диван комфорт', 'стол дуб', 'кресло ткань серый', 'шкаф-купе белый', 'матрас', 'ёлка']
+
+
+def keystrokes(text):
+    """Строка поиска после каждого нажатия"""
+    return [text[:i] for i in range(1, len(text) + 1)]
+
+
+def timed(search, texts):
+    """Время каждого запроса в мс"""
+    times = []
+    for text in texts:
+        start = time.perf_counter()
+        search(text)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.1, help='объём базы (0.1 = 100 000 товаров)')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'search.db')
+        counts = generate(path, args.scale)
+        conn = connect(path)
+        repo = ShopRepository(conn)
+        like = ShopRepository(conn, fts_enabled=False)
+        
+        start = time.perf_counter()
+        index = PrefixIndex()
+        index.load(repo.product_search_fields())
+        print(f"Индекс {counts['products']:,} товаров построен за {time.perf_counter() - start:.2f} с")
+        
+        start = time.perf_counter()
+        for i in range(1000):
+            index.add(10 ** 9 + i, f'Товар {i}', f'Товар {i}', 'Дерево', 'Белый')
+        for i in range(1000):
+            index.remove(10 ** 9 + i)
+        print(f"Добавление и удаление записи: {(time.perf_counter() - start) / 2:.3f} мс\n")
+        
+        texts = [text for typed in TYPED for text in keystrokes(typed)]
+        variants = [
+            ('индекс', lambda text: index.search(text, limit=PAGE_SIZE)),
+            ('индекс + строки', lambda text: list(repo.products_by_ids(index.search(text, limit=PAGE_SIZE)))),
+            ('FTS5', lambda text: repo.search_products(text, limit=PAGE_SIZE).fetchall()),
+            ('LIKE', lambda text: like.search_products(text, limit=PAGE_SIZE).fetchall()),
+        ]
+        print(f"{'способ':<16} {'медиана, мс':>12} {'p95, мс':>9} {'макс, мс':>9}")
+        for name, search in variants:
+            times = sorted(timed(search, texts))
+            p95 = times[int(len(times) * 0.95)]
+            print(f"{name:<16} {statistics.median(times):>12.2f} {p95:>9.2f} {times[-1]:>9.2f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
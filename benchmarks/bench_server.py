@@ -0,0 +1,171 @@
+# benchmarks/bench_server.py
+"""Нагрузка на HTTP API (server.py): запросов в секунду при многих одновременных кассах
+
+Запуск: python benchmarks/bench_server.py [--clients 50] [--seconds 10] [--scale 0.01] [--readers 4]
+Сервер запускается отдельным процессом на копии базы generate_data.py; каждый
+клиент держит своё keep-alive соединение и шлёт смесь запросов каталога,
+поиска, просмотра и оформления заказов. В конце проверяется, что остатки не
+ушли в минус и число заказов в базе сходится с успешными ответами.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generate_data import generate
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Доля запросов каждого вида
+MIX = [
+    ('catalog page', 40),
+    ('product', 20),
+    ('customer search', 15),
+    ('order details', 10),
+    ('place order', 15),
+]
+
+SEARCH_WORDS = ['Иван', 'Петр', 'Смирн', 'Анна', 'Козл', 'Ольг']
+
+
+def start_server(db, readers):
+    """Процесс сервера на свободном порту; вернуть (процесс, порт)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'server.py'), '--db', db, '--port', '0', '--readers', str(readers)],
+        stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    match = re.search(r':(\d+)/', line)
+    if match is None:
+        process.kill()
+        raise RuntimeError(f"Сервер не запустился: {line!r}")
+    return process, int(match.group(1))
+
+
+async def request(reader, writer, method, path, body=None):
+    """Запрос по открытому соединению; вернуть (код, объект JSON)"""
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+class Client:
+    """Касса: выбирает запросы по MIX, пока не выйдет время"""
+    
+    def __init__(self, port, seed, counts, stats):
+        self.port = port
+        self.rng = random.Random(seed)
+        self.counts = counts
+        self.stats = stats
+        self.order_ids = []
+    
+    def next_request(self):
+        rng, counts = self.rng, self.counts
+        kind = rng.choices([name for name, weight in MIX], [weight for name, weight in MIX])[0]
+        if kind == 'catalog page':
+            return kind, 'GET', '/api/products?limit=50', None
+        if kind == 'product':
+            return kind, 'GET', f"/api/products/{rng.randint(1, counts['products'])}", None
+        if kind == 'customer search':
+            return kind, 'GET', f"/api/customers?q={rng.choice(SEARCH_WORDS)}&limit=20", None
+        if kind == 'order details':
+            order_id = rng.choice(self.order_ids) if self.order_ids else rng.randint(1, counts['orders'])
+            return kind, 'GET', f"/api/orders/{order_id}", None
+        items = [{'product_id': rng.randint(1, counts['products']), 'quantity': rng.randint(1, 2)}
+                 for _ in range(rng.randint(1, 3))]
+        return kind, 'POST', '/api/orders', {'customer_id': rng.randint(1, counts['customers']),
+                                             'payment_method': rng.choice(['Наличные', 'Карта']),
+                                             'items': items}
+    
+    async def run(self, deadline):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        while time.perf_counter() < deadline:
+            kind, method, path, body = self.next_request()
+            started = time.perf_counter()
+            status, payload = await request(reader, writer, method, path, body)
+            self.stats.setdefault(kind, []).append((time.perf_counter() - started, status))
+            if kind == 'place order' and status == 201:
+                self.order_ids.append(payload['id'])
+        writer.close()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def load(port, clients, seconds, counts):
+    stats = {}
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(Client(port, seed, counts, stats).run(deadline) for seed in range(clients)))
+    return stats, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50, help='одновременных соединений')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--scale', type=float, default=0.01, help='объём базы generate_data.py')
+    parser.add_argument('--readers', type=int, default=4, help='соединений для чтения у сервера')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'shop.db')
+        counts = generate(db, args.scale)
+        conn = sqlite3.connect(db)
+        orders_before = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        counts['orders'] = orders_before
+        
+        process, port = start_server(db, args.readers)
+        try:
+            stats, elapsed = asyncio.run(load(port, args.clients, args.seconds, counts))
+        finally:
+            process.terminate()
+            process.wait()
+        
+        total = sum(len(samples) for samples in stats.values())
+        print(f"\n{args.clients} клиентов, {args.readers} читающих соединений, {elapsed:.1f} с: "
+              f"{total:,} запросов, {total / elapsed:,.0f} запросов/с")
+        print(f"{'запрос':<16} {'штук':>8} {'в с':>8} {'p50, мс':>8} {'p95, мс':>8}  коды ответов")
+        for kind, weight in MIX:
+            samples = stats.get(kind, [])
+            if not samples:
+                continue
+            times = [seconds for seconds, status in samples]
+            codes = {}
+            for seconds, status in samples:
+                codes[status] = codes.get(status, 0) + 1
+            print(f"{kind:<16} {len(samples):>8,} {len(samples) / elapsed:>8,.0f} "
+                  f"{percentile(times, 0.5) * 1000:>8.1f} {percentile(times, 0.95) * 1000:>8.1f}  "
+                  + ', '.join(f"{code}: {count}" for code, count in sorted(codes.items())))
+        
+        placed = sum(1 for seconds, status in stats.get('place order', []) if status == 201)
+        orders_after = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        negative = conn.execute("SELECT COUNT(*) FROM products WHERE stock < 0").fetchone()[0]
+        conn.close()
+        print(f"\nЗаказов оформлено: {placed:,}, в базе прибавилось: {orders_after - orders_before:,}; "
+              f"товаров с отрицательным остатком: {negative}")
+        if negative or placed != orders_after - orders_before:
+            sys.exit("❌ Нарушена целостность данных")
+
+
+if __name__ == '__main__':
+    main()
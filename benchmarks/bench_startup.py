@@ -0,0 +1,100 @@
+# benchmarks/bench_startup.py
+"""Холодный старт: импорт app.py и данные, нужные до показа окна, — прежний порядок против ленивого
+
+Запуск: python benchmarks/bench_startup.py [--scale 0.1] [--runs 7]
+Каждый замер — новый процесс Python с новым соединением, как при запуске
+приложения. «Всё сразу» повторяет прежний старт: проверки пустых таблиц,
+первая страница товаров, все клиенты, категории, все заказы и отчёты.
+«Лениво» — проверка версии схемы и первая страница товаров; остальные
+вкладки загружаются при первом открытии. Построение виджетов Tk не входит
+в замер: оно одинаково в обоих случаях и требует дисплея.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def startup(db, mode):
+    """Выполнить в этом процессе то, что нужно до показа окна; вернуть секунды"""
+    started = time.perf_counter()
+    import app  # импорт модуля — часть старта
+    from database import DEFAULT_PROFILE, ORDERS_QUERY, connect, migrate
+    from services import PAGE_SIZE, ReportService, ShopRepository
+    imported = time.perf_counter()
+    
+    conn = connect(db, DEFAULT_PROFILE)
+    repo = ShopRepository(conn)
+    if mode == 'eager':
+        migrate(conn)
+        repo.add_test_data()
+        list(repo.list_products(None, PAGE_SIZE))
+        list(repo.list_customers())
+        list(repo.list_categories())
+        conn.execute(ORDERS_QUERY + ' ORDER BY o.id DESC').fetchall()   # прежняя загрузка всех заказов
+        reports = ReportService(conn)
+        reports.summary()
+        reports.revenue('day')
+        reports.top_products()
+        reports.category_mix()
+        reports.payment_split()
+    else:
+        fresh = conn.execute('PRAGMA user_version').fetchone()[0] == 0
+        migrate(conn)
+        if fresh:
+            repo.add_test_data()
+        list(repo.list_products(None, PAGE_SIZE))
+    conn.close()
+    finished = time.perf_counter()
+    return imported - started, finished - imported
+
+
+def measure(db, mode, runs):
+    """Медианы (импорт, данные) по runs новым процессам"""
+    imports, data = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode, db],
+            cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        imports.append(float(output[0]))
+        data.append(float(output[1]))
+    return statistics.median(imports), statistics.median(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.1, help='объём базы generate_data.py')
+    parser.add_argument('--runs', type=int, default=7, help='запусков на вариант')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        mode, db = args.child
+        print(*startup(db, mode))
+        return
+    
+    from generate_data import generate
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'shop.db')
+        counts = generate(db, args.scale)
+        print(f"\nБаза: {', '.join(f'{name} {count:,}' for name, count in counts.items())}; "
+              f"медиана {args.runs} запусков")
+        print(f"{'старт':<12} {'импорт, мс':>11} {'данные, мс':>11} {'всего, мс':>10}")
+        results = {}
+        for mode, name in (('eager', 'всё сразу'), ('lazy', 'лениво')):
+            imported, data = results[mode] = measure(db, mode, args.runs)
+            print(f"{name:<12} {imported * 1000:>11.1f} {data * 1000:>11.1f} {(imported + data) * 1000:>10.1f}")
+        eager, lazy = sum(results['eager']), sum(results['lazy'])
+        print(f"\nУскорение холодного старта: {eager / lazy:.1f}×")
+
+
+if __name__ == '__main__':
+    main()
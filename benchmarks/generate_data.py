@@ -0,0 +1,178 @@
+# benchmarks/generate_data.py
+"""Синтетическая база в формате furniture_shop.db для нагрузочных замеров
+
+Запуск: python benchmarks/generate_data.py big.db [--scale 0.1] [--seed 1] [--customers N]
+По умолчанию (scale 1): 1 000 000 товаров, 100 000 клиентов, 5 000 000 строк заказов.
+--customers задаёт число клиентов отдельно от --scale.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import MIGRATIONS, migrate
+from services import ORDER_STATUSES
+
+PRODUCTS = 1_000_000
+CUSTOMERS = 100_000
+ORDER_ITEMS = 5_000_000
+ITEMS_PER_ORDER = 5       # в среднем строк в заказе
+BATCH = 50_000            # строк на один executemany
+
+CATEGORIES = ['Диваны', 'Кресла', 'Столы', 'Стулья', 'Шкафы', 'Кровати', 'Матрасы', 'Комоды',
+              'Тумбы', 'Полки', 'Пуфы', 'Банкетки', 'Стеллажи', 'Вешалки', 'Зеркала', 'Светильники']
+KINDS = {
+    'Диваны': ['Диван', 'Диван угловой', 'Диван-кровать'],
+    'Кресла': ['Кресло', 'Кресло-качалка', 'Кресло офисное'],
+    'Столы': ['Стол обеденный', 'Стол компьютерный', 'Стол журнальный'],
+    'Стулья': ['Стул', 'Стул барный', 'Табурет'],
+    'Шкафы': ['Шкаф-купе', 'Шкаф для одежды', 'Шкаф книжный'],
+    'Кровати': ['Кровать двуспальная', 'Кровать односпальная', 'Кровать детская'],
+    'Матрасы': ['Матрас ортопедический', 'Матрас пружинный', 'Наматрасник'],
+    'Комоды': ['Комод', 'Комод узкий', 'Комод с зеркалом'],
+}
+MODELS = ['Комфорт', 'Престиж', 'Релакс', 'Уют', 'Классика', 'Модерн', 'Лофт', 'Сканди',
+          'Прованс', 'Ёлка', 'Байкал', 'Волна', 'Орион', 'Нордик', 'Милан', 'Верона']
+MATERIALS = ['Дерево', 'ЛДСП', 'МДФ', 'Металл', 'Ткань, дерево', 'Кожа, дерево', 'Ткань, металл',
+             'Пена', 'Пружины', 'Ротанг', 'Стекло, металл']
+COLORS = ['Белый', 'Серый', 'Бежевый', 'Коричневый', 'Венге', 'Дуб', 'Натуральный', 'Синий',
+          'Зелёный', 'Чёрный', 'Орех', 'Графит']
+FIRST_NAMES = ['Иван', 'Мария', 'Пётр', 'Анна', 'Сергей', 'Елена', 'Алексей', 'Ольга',
+               'Дмитрий', 'Наталья', 'Андрей', 'Татьяна', 'Михаил', 'Ирина', 'Юрий', 'Светлана']
+LAST_NAMES = ['Петров', 'Иванов', 'Сидоров', 'Козлов', 'Смирнов', 'Попов', 'Фёдоров', 'Морозов',
+              'Волков', 'Соколов', 'Лебедев', 'Новиков', 'Егоров', 'Орлов', 'Ершов', 'Зайцев']
+PAYMENTS = ['Наличные', 'Карта']
+
+
+def batches(rows, size=BATCH):
+    """Разбить генератор строк на списки по size"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def product_rows(rng, count):
+    """Товары: название из вида и модели, цена, остаток, категория, материал, цвет"""
+    for i in range(1, count + 1):
+        category_id = rng.randrange(len(CATEGORIES)) + 1
+        kinds = KINDS.get(CATEGORIES[category_id - 1], [CATEGORIES[category_id - 1]])
+        name = f'{rng.choice(kinds)} "{rng.choice(MODELS)}" {i}'
+        yield (name, rng.randrange(20, 2000) * 100, rng.randrange(0, 50), category_id,
+               rng.choice(MATERIALS), rng.choice(COLORS), f'Артикул {i:07d}')
+
+
+def customer_rows(rng, count):
+    """Клиенты с уникальными телефоном и email"""
+    for i in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        phone = f'+7 (999) {i // 10000 % 1000:03d}-{i // 100 % 100:02d}-{i % 100:02d}'
+        yield (first, last, phone, f'client{i}@mail.com')
+
+
+def order_rows(rng, count, customers, start):
+    """Заказы за последние два года; сумма пересчитывается после вставки строк"""
+    for i in range(count):
+        date = start + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60))
+        yield (rng.randrange(customers) + 1, date.strftime('%Y-%m-%d %H:%M'), 0,
+               rng.choice(ORDER_STATUSES), rng.choice(PAYMENTS))
+
+
+def order_item_rows(rng, count, orders, products):
+    """Строки заказов: каждому заказу хотя бы одна строка, остальные — случайно"""
+    for i in range(count):
+        order_id = i + 1 if i < orders else rng.randrange(orders) + 1
+        quantity = rng.randrange(1, 4)
+        price = rng.randrange(20, 2000) * 100
+        yield (order_id, rng.randrange(products) + 1, quantity, price, quantity * price)
+
+
+def insert(conn, sql, rows, label, total):
+    """Вставить строки пачками с выводом прогресса"""
+    done = 0
+    for batch in batches(rows):
+        conn.executemany(sql, batch)
+        done += len(batch)
+        print(f'\r{label}: {done:,}/{total:,}', end='', flush=True)
+    print()
+
+
+def generate(path, scale=1.0, seed=1, customers=None):
+    """Создать базу path с объёмом данных PRODUCTS/CUSTOMERS/ORDER_ITEMS × scale (клиентов — customers, если задано)"""
+    products = max(1, int(PRODUCTS * scale))
+    customers = customers or max(1, int(CUSTOMERS * scale))
+    items = max(1, int(ORDER_ITEMS * scale))
+    orders = max(1, items // ITEMS_PER_ORDER)
+    rng = random.Random(seed)
+    
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    # Заливка без журнала: при сбое базу проще создать заново
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    
+    # Только базовая схема: поисковый индекс и остальные индексы строятся
+    # одним проходом после заливки — так в разы быстрее, чем триггерами
+    description, apply = MIGRATIONS[0]
+    apply(conn.cursor())
+    conn.execute('PRAGMA user_version = 1')
+    
+    started = time.perf_counter()
+    conn.executemany("INSERT INTO categories (name) VALUES (?)", [(name,) for name in CATEGORIES])
+    insert(conn, '''
+        INSERT INTO products (name, price, stock, category_id, material, color, description)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', product_rows(rng, products), 'Товары', products)
+    insert(conn, "INSERT INTO customers (first_name, last_name, phone, email) VALUES (?, ?, ?, ?)",
+           customer_rows(rng, customers), 'Клиенты', customers)
+    insert(conn, '''
+        INSERT INTO orders (customer_id, order_date, total_amount, status, payment_method)
+        VALUES (?, ?, ?, ?, ?)
+    ''', order_rows(rng, orders, customers, datetime.now() - timedelta(days=2 * 365)), 'Заказы', orders)
+    insert(conn, '''
+        INSERT INTO order_items (order_id, product_id, quantity, price_per_unit, subtotal)
+        VALUES (?, ?, ?, ?, ?)
+    ''', order_item_rows(rng, items, orders, products), 'Строки заказов', items)
+    print('Суммы заказов...')
+    # Индекса по order_id ещё нет: суммы считаются одним проходом во временную
+    # таблицу с ключом, иначе подзапрос читал бы все строки для каждого заказа
+    conn.execute("CREATE TEMP TABLE order_totals (order_id INTEGER PRIMARY KEY, total REAL)")
+    conn.execute("INSERT INTO order_totals SELECT order_id, SUM(subtotal) FROM order_items GROUP BY order_id")
+    conn.execute('''
+        UPDATE orders SET total_amount = (
+            SELECT total FROM order_totals WHERE order_id = orders.id
+        )
+    ''')
+    conn.execute("DROP TABLE order_totals")
+    conn.commit()
+    
+    # До миграций: иначе пересчёт сумм прошёл бы через триггеры журнала изменений
+    print('Индексы и полнотекстовый поиск...')
+    migrate(conn)
+    conn.close()
+    print(f'Готово за {time.perf_counter() - started:.0f} с: {path}')
+    return {'products': products, 'customers': customers, 'orders': orders, 'order_items': items}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='файл создаваемой базы (перезаписывается)')
+    parser.add_argument('--scale', type=float, default=1.0, help='доля от полного объёма данных')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--customers', type=int, help='число клиентов (по умолчанию по --scale)')
+    args = parser.parse_args()
+    generate(args.path, args.scale, args.seed, args.customers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,719 @@
+# database.py
+"""Схема базы данных магазина, версионные миграции и проверка планов запросов"""
+import os
+import re
+import sqlite3
+import sys
+
+DB_PATH = 'furniture_shop.db'
+
+# Профили настройки соединения. Порядок важен: busy_timeout ставится первым,
+# чтобы смена journal_mode дождалась блокировок других процессов.
+# WAL требует общей памяти, поэтому годится для нескольких копий программы
+# на одном компьютере; если база лежит на сетевом диске, нужен профиль network.
+CONNECTION_PROFILES = {
+    # Настройки SQLite по умолчанию: журнал отката, полная синхронизация
+    'default': {},
+    # Читатели не ждут писателей; fsync только на контрольных точках WAL
+    'wal': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -20000,       # ~20 МБ страничного кэша
+        'mmap_size': 268435456,     # 256 МБ отображения файла в память
+        'temp_store': 'MEMORY',
+    },
+    # Общий файл на сетевом диске: классический журнал и долгое ожидание блокировки
+    'network': {
+        'busy_timeout': 15000,
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -20000,
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Профиль можно выбрать переменной окружения FURNITURE_SHOP_DB_PROFILE
+DEFAULT_PROFILE = os.environ.get('FURNITURE_SHOP_DB_PROFILE', 'wal')
+
+
+def apply_profile(conn, profile=DEFAULT_PROFILE):
+    """Применить к соединению профиль (имя из CONNECTION_PROFILES или словарь PRAGMA)"""
+    pragmas = CONNECTION_PROFILES[profile] if isinstance(profile, str) else profile
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}').fetchall()
+
+
+def connect(path=DB_PATH, profile=DEFAULT_PROFILE, **kwargs):
+    """Открыть базу и настроить соединение по профилю"""
+    conn = sqlite3.connect(path, **kwargs)
+    apply_profile(conn, profile)
+    return conn
+
+SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL
+    );
+    
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        stock INTEGER DEFAULT 0,
+        category_id INTEGER,
+        material TEXT,
+        color TEXT,
+        description TEXT,
+        FOREIGN KEY (category_id) REFERENCES categories (id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        phone TEXT,
+        email TEXT UNIQUE
+    );
+    
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER,
+        order_date TEXT,
+        total_amount REAL,
+        status TEXT DEFAULT 'Новый',
+        payment_method TEXT,
+        FOREIGN KEY (customer_id) REFERENCES customers (id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        product_id INTEGER,
+        quantity INTEGER,
+        price_per_unit REAL,
+        subtotal REAL,
+        FOREIGN KEY (order_id) REFERENCES orders (id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    );
+'''
+
+# Индексы под внешние ключи и сортировки, которые используют вкладки
+INDEXES_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id);
+    CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders (customer_id);
+    CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+    CREATE INDEX IF NOT EXISTS idx_products_category_name ON products (category_id, name);
+    CREATE INDEX IF NOT EXISTS idx_products_name ON products (name);
+    CREATE INDEX IF NOT EXISTS idx_customers_last_name ON customers (last_name);
+'''
+
+# Фильтры истории заказов по периоду: со статусом и без. Индекс (status) остаётся —
+# он отдаёт заказы одного статуса сразу в порядке id
+ORDER_DATE_INDEXES_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_orders_status_date ON orders (status, order_date);
+    CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (order_date);
+'''
+
+# Резервы товаров в корзинах касс (cart — идентификатор корзины): пока резерв не
+# истёк, его количество недоступно другим корзинам. expires_at — время UNIX, с.
+# Доступно к продаже = остаток − действующие резервы других корзин; сумма
+# резервов товара читается из индекса (product_id, expires_at, quantity), а
+# cart в нём есть как часть первичного ключа таблицы WITHOUT ROWID.
+RESERVATIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS reservations (
+        cart TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL CHECK (quantity > 0),
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (cart, product_id)
+    ) WITHOUT ROWID;
+    
+    CREATE INDEX IF NOT EXISTS idx_reservations_product ON reservations (product_id, expires_at, quantity);
+    CREATE INDEX IF NOT EXISTS idx_reservations_expires ON reservations (expires_at);
+'''
+
+# Поля полнотекстового поиска по таблицам
+SEARCH_INDEXES = {
+    'products': ('name', 'material', 'color', 'description'),
+    'customers': ('first_name', 'last_name', 'phone', 'email'),
+}
+
+
+def yo_to_e(expr):
+    """SQL-выражение, заменяющее «ё» на «е» (unicode61 не сводит их сам)"""
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def search_index_sql(table, columns):
+    """Схема полнотекстового индекса FTS5 для таблицы и триггеры синхронизации"""
+    cols = ', '.join(columns)
+    view_cols = ', '.join(f'{yo_to_e(col)} AS {col}' for col in columns)
+    new_vals = ', '.join(yo_to_e(f'new.{col}') for col in columns)
+    old_vals = ', '.join(yo_to_e(f'old.{col}') for col in columns)
+    return f'''
+        CREATE VIEW IF NOT EXISTS {table}_search AS
+            SELECT id, {view_cols} FROM {table};
+        
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+            {cols},
+            content='{table}_search', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2", prefix='2 3'
+        );
+        
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+        END;
+    '''
+
+
+def create_search_indexes(cursor):
+    """Полнотекстовые индексы с заполнением по уже существующим данным"""
+    for table, columns in SEARCH_INDEXES.items():
+        try:
+            cursor.executescript(search_index_sql(table, columns))
+        except sqlite3.OperationalError:
+            # SQLite собран без FTS5 — остаётся поиск через LIKE
+            return
+        cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def has_search_index(cursor):
+    """Есть ли в базе полнотекстовые индексы"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+    return cursor.fetchone() is not None
+
+
+# Сводка по категориям: число товаров, остаток и стоимость запаса.
+# Триггеры поддерживают её при любых изменениях товаров, поэтому вкладка
+# категорий и проверка перед удалением не пересчитывают таблицу товаров.
+CATEGORY_STATS_SQL = '''
+    CREATE TABLE IF NOT EXISTS category_stats (
+        category_id INTEGER PRIMARY KEY REFERENCES categories (id),
+        product_count INTEGER NOT NULL DEFAULT 0,
+        total_stock INTEGER NOT NULL DEFAULT 0,
+        stock_value REAL NOT NULL DEFAULT 0
+    );
+    
+    CREATE TRIGGER IF NOT EXISTS category_stats_category_ai AFTER INSERT ON categories BEGIN
+        INSERT OR IGNORE INTO category_stats (category_id) VALUES (new.id);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS category_stats_category_ad AFTER DELETE ON categories BEGIN
+        DELETE FROM category_stats WHERE category_id = old.id;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS category_stats_product_ai AFTER INSERT ON products BEGIN
+        UPDATE category_stats
+        SET product_count = product_count + 1,
+            total_stock = total_stock + COALESCE(new.stock, 0),
+            stock_value = stock_value + COALESCE(new.stock, 0) * new.price
+        WHERE category_id = new.category_id;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS category_stats_product_ad AFTER DELETE ON products BEGIN
+        UPDATE category_stats
+        SET product_count = product_count - 1,
+            total_stock = total_stock - COALESCE(old.stock, 0),
+            stock_value = stock_value - COALESCE(old.stock, 0) * old.price
+        WHERE category_id = old.category_id;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS category_stats_product_au
+    AFTER UPDATE OF category_id, stock, price ON products BEGIN
+        UPDATE category_stats
+        SET product_count = product_count - 1,
+            total_stock = total_stock - COALESCE(old.stock, 0),
+            stock_value = stock_value - COALESCE(old.stock, 0) * old.price
+        WHERE category_id = old.category_id;
+        UPDATE category_stats
+        SET product_count = product_count + 1,
+            total_stock = total_stock + COALESCE(new.stock, 0),
+            stock_value = stock_value + COALESCE(new.stock, 0) * new.price
+        WHERE category_id = new.category_id;
+    END;
+'''
+
+# Сводка, посчитанная заново по таблице товаров
+CATEGORY_STATS_ACTUAL = '''
+    SELECT c.id, COUNT(p.id), COALESCE(SUM(p.stock), 0), COALESCE(SUM(p.stock * p.price), 0)
+    FROM categories c
+    LEFT JOIN products p ON c.id = p.category_id
+    GROUP BY c.id
+'''
+
+
+def rebuild_category_stats(cursor):
+    """Пересчитать сводку по категориям с нуля"""
+    cursor.execute("DELETE FROM category_stats")
+    cursor.execute("INSERT INTO category_stats (category_id, product_count, total_stock, stock_value) "
+                   + CATEGORY_STATS_ACTUAL)
+
+
+def create_category_stats(cursor):
+    """Таблица сводки по категориям с триггерами и заполнением по текущим товарам"""
+    cursor.executescript(CATEGORY_STATS_SQL)
+    rebuild_category_stats(cursor)
+
+
+def check_category_stats(conn):
+    """Расхождения сводки с товарами: [(category_id, сохранено, на самом деле)]"""
+    stored = {row[0]: row[1:] for row in conn.execute(
+        "SELECT category_id, product_count, total_stock, stock_value FROM category_stats")}
+    problems = []
+    for category_id, *actual in conn.execute(CATEGORY_STATS_ACTUAL):
+        saved = stored.pop(category_id, None)
+        # Стоимость накапливается в REAL, поэтому сравниваем с допуском
+        if saved is None or saved[:2] != tuple(actual[:2]) or abs(saved[2] - actual[2]) > 0.01:
+            problems.append((category_id, saved, tuple(actual)))
+    problems += [(category_id, saved, None) for category_id, saved in stored.items()]
+    return problems
+
+
+# Продажи по дням: сводки для отчётов, чтобы не пересчитывать все заказы.
+# Отменённые заказы в сводки не входят. OrderService добавляет заказ при
+# оформлении и вычитает (или возвращает) при смене статуса на «Отменен» и обратно.
+CANCELLED_STATUS = 'Отменен'
+
+SALES_ROLLUPS_SQL = '''
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        orders INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, payment_method)
+    ) WITHOUT ROWID;
+    
+    CREATE TABLE IF NOT EXISTS sales_daily_category (
+        day TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category_id)
+    ) WITHOUT ROWID;
+    
+    CREATE TABLE IF NOT EXISTS sales_monthly_product (
+        month TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, product_id)
+    ) WITHOUT ROWID;
+    
+    CREATE TABLE IF NOT EXISTS sales_product (
+        product_id INTEGER PRIMARY KEY,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    );
+    
+    CREATE INDEX IF NOT EXISTS idx_sales_product_revenue ON sales_product (revenue);
+'''
+
+# (таблица, ключевые колонки, накапливаемые колонки, запрос по заказам с условием {where},
+# колонки которого названы как в таблице).
+# Товары сводятся по месяцам: по дням их строк было бы почти столько же, сколько строк заказов;
+# для топа за всё время есть итог по товару с индексом по выручке.
+SALES_ROLLUPS = [
+    ('sales_daily', ('day', 'payment_method'), ('orders', 'units', 'revenue'), '''
+        SELECT substr(o.order_date, 1, 10) AS day, COALESCE(o.payment_method, '') AS payment_method,
+               COUNT(DISTINCT o.id) AS orders, SUM(oi.quantity) AS units, SUM(oi.subtotal) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE {where}
+        GROUP BY 1, 2
+    '''),
+    ('sales_daily_category', ('day', 'category_id'), ('units', 'revenue'), '''
+        SELECT substr(o.order_date, 1, 10) AS day, COALESCE(p.category_id, 0) AS category_id,
+               SUM(oi.quantity) AS units, SUM(oi.subtotal) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        LEFT JOIN products p ON p.id = oi.product_id
+        WHERE {where}
+        GROUP BY 1, 2
+    '''),
+    ('sales_monthly_product', ('month', 'product_id'), ('units', 'revenue'), '''
+        SELECT substr(o.order_date, 1, 7) AS month, oi.product_id AS product_id,
+               SUM(oi.quantity) AS units, SUM(oi.subtotal) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE {where}
+        GROUP BY 1, 2
+    '''),
+    ('sales_product', ('product_id',), ('units', 'revenue'), '''
+        SELECT oi.product_id AS product_id, SUM(oi.quantity) AS units, SUM(oi.subtotal) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE {where}
+        GROUP BY 1
+    '''),
+    # Покупки клиентов (CUSTOMER_STATS_SQL)
+    ('customer_stats', ('customer_id',), ('orders', 'revenue'), '''
+        SELECT o.customer_id AS customer_id, COUNT(DISTINCT o.id) AS orders, SUM(oi.subtotal) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE {where} AND o.customer_id IS NOT NULL
+        GROUP BY 1
+    '''),
+    ('customer_category_sales', ('customer_id', 'category_id'), ('units', 'revenue'), '''
+        SELECT o.customer_id AS customer_id, COALESCE(p.category_id, 0) AS category_id,
+               SUM(oi.quantity) AS units, SUM(oi.subtotal) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        LEFT JOIN products p ON p.id = oi.product_id
+        WHERE {where} AND o.customer_id IS NOT NULL
+        GROUP BY 1, 2
+    '''),
+]
+
+SALES_COUNTED = "o.status IS NOT '" + CANCELLED_STATUS + "'"
+
+SALES_TABLES = ('sales_daily', 'sales_daily_category', 'sales_monthly_product', 'sales_product')
+
+# Покупки клиента: число заказов и сумма — сводка как у продаж, дата последнего
+# заказа и любимая категория (по выручке) пересчитываются для его строки при
+# каждом изменении сводки. Отменённые заказы, как и в отчётах, не учитываются.
+CUSTOMER_STATS_SQL = '''
+    CREATE TABLE IF NOT EXISTS customer_stats (
+        customer_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        last_order TEXT,
+        favourite_category_id INTEGER
+    );
+    
+    CREATE TABLE IF NOT EXISTS customer_category_sales (
+        customer_id INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (customer_id, category_id)
+    ) WITHOUT ROWID;
+'''
+
+CUSTOMER_STATS_TABLES = ('customer_stats', 'customer_category_sales')
+
+# Дата последнего заказа и любимая категория клиента строки customer_stats
+CUSTOMER_LAST_ORDER = f'''
+    SELECT MAX(o.order_date) FROM orders o
+    WHERE o.customer_id = customer_stats.customer_id AND {SALES_COUNTED}
+'''
+CUSTOMER_FAVOURITE = '''
+    SELECT s.category_id FROM customer_category_sales s
+    WHERE s.customer_id = customer_stats.customer_id AND s.units > 0
+    ORDER BY s.revenue DESC, s.category_id
+    LIMIT 1
+'''
+CUSTOMER_DERIVED_SQL = f'''
+    UPDATE customer_stats
+    SET last_order = ({CUSTOMER_LAST_ORDER}), favourite_category_id = ({CUSTOMER_FAVOURITE})
+'''
+
+
+def rebuild_sales_rollups(cursor, tables=None):
+    """Пересчитать сводки продаж (все или только tables) по всем неотменённым заказам"""
+    for table, keys, values, select in SALES_ROLLUPS:
+        if tables is not None and table not in tables:
+            continue
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} ({', '.join(keys + values)}) "
+                       + select.format(where=SALES_COUNTED))
+    if tables is None or 'customer_stats' in tables:
+        cursor.execute(CUSTOMER_DERIVED_SQL)
+
+
+def create_sales_rollups(cursor):
+    """Таблицы сводок продаж с заполнением по существующим заказам"""
+    cursor.executescript(SALES_ROLLUPS_SQL)
+    rebuild_sales_rollups(cursor, SALES_TABLES)
+
+
+def create_customer_stats(cursor):
+    """Сводки покупок клиентов с заполнением по существующим заказам"""
+    cursor.executescript(CUSTOMER_STATS_SQL)
+    rebuild_sales_rollups(cursor, CUSTOMER_STATS_TABLES)
+
+
+def apply_order_sales(cursor, order_id, sign=1):
+    """Добавить заказ в сводки продаж (sign=-1 — вычесть) в текущей транзакции"""
+    for table, keys, values, select in SALES_ROLLUPS:
+        columns = ', '.join(keys + values)
+        signed = ', '.join(keys + tuple(f'{int(sign)} * {value}' for value in values))
+        updates = ', '.join(f'{value} = {value} + excluded.{value}' for value in values)
+        # WHERE true нужен SQLite, чтобы отличить ON CONFLICT от условия соединения
+        cursor.execute(f'''
+            INSERT INTO {table} ({columns})
+            SELECT {signed} FROM ({select.format(where='o.id = ?')}) WHERE true
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}
+        ''', (order_id,))
+    cursor.execute(CUSTOMER_DERIVED_SQL + ' WHERE customer_id = (SELECT customer_id FROM orders WHERE id = ?)',
+                   (order_id,))
+
+
+def check_sales_rollups(conn):
+    """Расхождения сводок продаж с заказами: [(таблица, ключ, сохранено, на самом деле)]"""
+    problems = []
+    for table, keys, values, select in SALES_ROLLUPS:
+        stored = {tuple(row[:len(keys)]): row[len(keys):] for row in conn.execute(
+            f"SELECT {', '.join(keys + values)} FROM {table}")}
+        for row in conn.execute(select.format(where=SALES_COUNTED)):
+            key, actual = tuple(row[:len(keys)]), tuple(row[len(keys):])
+            saved = stored.pop(key, None)
+            # Выручка накапливается в REAL, поэтому сравниваем с допуском
+            if saved is None or saved[:-1] != actual[:-1] or abs(saved[-1] - actual[-1]) > 0.01:
+                problems.append((table, key, saved, actual))
+        # После отмены заказа в сводке могут остаться нулевые строки — это не ошибка
+        problems += [(table, key, saved, None) for key, saved in stored.items() if any(saved)]
+    for customer_id, *saved_actual in conn.execute(f'''
+        SELECT customer_id, last_order, favourite_category_id, last, favourite FROM (
+            SELECT customer_id, last_order, favourite_category_id,
+                   ({CUSTOMER_LAST_ORDER}) AS last, ({CUSTOMER_FAVOURITE}) AS favourite
+            FROM customer_stats
+        )
+        WHERE last_order IS NOT last OR favourite_category_id IS NOT favourite
+    '''):
+        problems.append(('customer_stats', (customer_id,), tuple(saved_actual[:2]), tuple(saved_actual[2:])))
+    return problems
+
+
+# Журнал изменений (change data capture): триггеры записывают в changes каждую
+# вставку, изменение и удаление строк этих таблиц — полный образ строки в JSON
+# (для удаления — последний). seq растёт строго монотонно и не переиспользуется:
+# писатель у SQLite один, поэтому порядок seq совпадает с порядком фиксации.
+# Категории и строки заказов нужны реплике, чтобы товары и заказы были полными.
+CHANGE_TABLES = {
+    'categories': ('name',),
+    'products': ('name', 'price', 'stock', 'category_id', 'material', 'color', 'description'),
+    'customers': ('first_name', 'last_name', 'phone', 'email'),
+    'orders': ('customer_id', 'order_date', 'total_amount', 'status', 'payment_method'),
+    'order_items': ('order_id', 'product_id', 'quantity', 'price_per_unit', 'subtotal'),
+}
+
+CHANGE_LOG_SQL = '''
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+        data TEXT NOT NULL,
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    );
+    
+    -- До какого seq реплика применила изменения каждого источника
+    CREATE TABLE IF NOT EXISTS replication_state (
+        source TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL,
+        applied_at TEXT
+    );
+'''
+
+
+def change_log_sql(table, columns):
+    """Триггеры журнала изменений таблицы"""
+    def image(row):
+        return 'json_object(' + ', '.join(f"'{col}', {row}.{col}" for col in ('id',) + columns) + ')'
+    
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO changes (table_name, row_id, op, data) VALUES ('{table}', new.id, 'I', {image('new')});
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_au AFTER UPDATE ON {table} BEGIN
+            INSERT INTO changes (table_name, row_id, op, data) VALUES ('{table}', new.id, 'U', {image('new')});
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO changes (table_name, row_id, op, data) VALUES ('{table}', old.id, 'D', {image('old')});
+        END;
+    '''
+
+
+def create_change_log(cursor):
+    """Таблица журнала изменений и триггеры; уже существующие строки в журнал не попадают"""
+    cursor.executescript(CHANGE_LOG_SQL)
+    for table, columns in CHANGE_TABLES.items():
+        cursor.executescript(change_log_sql(table, columns))
+
+
+# Миграции схемы: номер версии — позиция в списке (PRAGMA user_version).
+# Каждая миграция идемпотентна, чтобы прерванный запуск можно было повторить.
+MIGRATIONS = [
+    ('Базовая схема', lambda cursor: cursor.executescript(SCHEMA_SQL)),
+    ('Полнотекстовый поиск', create_search_indexes),
+    ('Индексы внешних ключей и сортировки', lambda cursor: cursor.executescript(INDEXES_SQL)),
+    ('Сводка по категориям', create_category_stats),
+    ('Сводки продаж для отчётов', create_sales_rollups),
+    ('Журнал изменений для репликации', create_change_log),
+    ('Индексы заказов по дате', lambda cursor: cursor.executescript(ORDER_DATE_INDEXES_SQL)),
+    ('Сводки покупок клиентов', create_customer_stats),
+    ('Резервы товаров в корзинах', lambda cursor: cursor.executescript(RESERVATIONS_SQL)),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """Применить недостающие миграции, вернуть номер версии схемы"""
+    cursor = conn.cursor()
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        description, apply = MIGRATIONS[number - 1]
+        apply(cursor)
+        cursor.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+    return max(version, SCHEMA_VERSION)
+
+
+# ========== ЗАПРОСЫ ==========
+
+PRODUCTS_QUERY = '''
+    SELECT p.id, p.name, p.price, p.stock, c.name, p.material, p.color
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+'''
+
+CUSTOMERS_QUERY = '''
+    SELECT c.id, c.first_name, c.last_name, c.phone, c.email,
+           COALESCE(s.orders, 0), COALESCE(s.revenue, 0), s.last_order, k.name
+    FROM customers c
+    LEFT JOIN customer_stats s ON s.customer_id = c.id
+    LEFT JOIN categories k ON k.id = s.favourite_category_id
+'''
+
+ORDERS_QUERY = '''
+    SELECT o.id, o.order_date, c.first_name || ' ' || c.last_name,
+           o.total_amount, o.status, o.payment_method
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+'''
+
+# Горячие запросы приложения: (название, SQL, параметры, таблицы, которые
+# допустимо читать целиком). Остальные таблицы должны читаться по индексу.
+HOT_QUERIES = [
+    # Первая страница идёт по индексу idx_products_name и останавливается на LIMIT
+    ('load_products', PRODUCTS_QUERY + ' ORDER BY p.name, p.id LIMIT ?', (200,), ('p',)),
+    ('load_products (next page)',
+     PRODUCTS_QUERY + ' WHERE (p.name, p.id) > (?, ?) ORDER BY p.name, p.id LIMIT ?', ('', 0, 200), ()),
+    ('filter_by_category',
+     PRODUCTS_QUERY + ' WHERE (c.name = ?) ORDER BY p.name, p.id LIMIT ?', ('', 200), ()),
+    # Список клиентов показывается целиком, в порядке индекса idx_customers_last_name
+    ('load_customers', CUSTOMERS_QUERY + ' ORDER BY c.last_name', (), ('c',)),
+    ('view_customer_details', '''
+        SELECT k.name, s.units, s.revenue FROM customer_category_sales s
+        LEFT JOIN categories k ON k.id = s.category_id
+        WHERE s.customer_id = ? AND s.units > 0
+        ORDER BY s.revenue DESC
+    ''', (0,), ()),
+    ('view_customer_details (orders)', '''
+        SELECT id, order_date, total_amount, status, payment_method FROM orders
+        WHERE customer_id = ? ORDER BY id DESC LIMIT ?
+    ''', (0, 20), ()),
+    ('load_categories', '''
+        SELECT c.id, c.name, s.product_count, s.total_stock, s.stock_value
+        FROM categories c
+        JOIN category_stats s ON s.category_id = c.id
+        ORDER BY c.name
+    ''', (), ('c',)),
+    ('load_orders', ORDERS_QUERY + ' ORDER BY o.id DESC LIMIT ?', (200,), ('o',)),
+    ('load_orders (next page)', ORDERS_QUERY + ' WHERE o.id < ? ORDER BY o.id DESC LIMIT ?', (0, 200), ()),
+    ('filter_orders_by_status',
+     ORDERS_QUERY + ' WHERE o.status = ? AND o.id < ? ORDER BY o.id DESC LIMIT ?', ('', 0, 200), ()),
+    ('filter_orders (period)', ORDERS_QUERY + '''
+        WHERE o.order_date >= ? AND o.order_date < date(?, '+1 day') ORDER BY o.id DESC LIMIT ?
+    ''', ('', '', 200), ()),
+    ('filter_orders (status and period)', ORDERS_QUERY + '''
+        WHERE o.status = ? AND o.order_date >= ? AND o.order_date < date(?, '+1 day') ORDER BY o.id DESC LIMIT ?
+    ''', ('', '', '', 200), ()),
+    ('view_order_details', '''
+        SELECT p.name, oi.quantity, oi.price_per_unit, oi.subtotal
+        FROM order_items oi
+        JOIN products p ON oi.product_id = p.id
+        WHERE oi.order_id = ?
+    ''', (0,), ()),
+    ('add_to_order (available)', '''
+        SELECT p.id, p.stock - COALESCE((
+            SELECT SUM(r.quantity) FROM reservations r
+            WHERE r.product_id = p.id AND r.expires_at > ? AND r.cart IS NOT ?
+        ), 0)
+        FROM products p
+        WHERE p.id IN (?)
+    ''', (0, '', 0), ()),
+    ('delete_customer', 'SELECT EXISTS (SELECT 1 FROM orders WHERE customer_id = ?)', (0,), ()),
+    ('delete_category', 'SELECT product_count FROM category_stats WHERE category_id=?', (0,), ()),
+    ('report_revenue', '''
+        SELECT day, SUM(orders), SUM(revenue) FROM sales_daily
+        WHERE day >= ? AND day <= ? GROUP BY day ORDER BY day
+    ''', ('', ''), ()),
+    ('report_category_mix', '''
+        SELECT s.category_id, SUM(s.revenue) FROM sales_daily_category s
+        WHERE s.day >= ? AND s.day <= ? GROUP BY s.category_id
+    ''', ('', ''), ()),
+    ('report_top_products', '''
+        SELECT s.product_id, SUM(s.revenue) FROM sales_monthly_product s
+        WHERE s.month >= ? AND s.month <= ? GROUP BY s.product_id ORDER BY SUM(s.revenue) DESC LIMIT ?
+    ''', ('', '', 10), ()),
+    ('report_top_products (all time)',
+     'SELECT product_id, revenue FROM sales_product ORDER BY revenue DESC LIMIT ?', (10,), ()),
+]
+
+
+def find_full_scans(conn, queries=HOT_QUERIES):
+    """Горячие запросы, план которых содержит полный просмотр таблицы"""
+    problems = []
+    for name, sql, params, allowed in queries:
+        for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params):
+            # Любой SCAN таблицы, кроме чтения одного покрывающего индекса:
+            # и «SCAN x USING INDEX» проходит всю таблицу, переходя к каждой строке
+            match = re.match(r'SCAN (?:TABLE )?(\w+)(.*)', row[3])
+            if (match and match.group(1) not in allowed and row[3] != 'SCAN CONSTANT ROW'
+                    and not match.group(2).startswith((' USING COVERING INDEX', ' VIRTUAL TABLE'))):
+                problems.append((name, row[3]))
+    return problems
+
+
+if __name__ == '__main__':
+    # python database.py [путь к базе] [--fix] — обновить схему, проверить планы
+    # запросов и сводки по категориям и продажам (--fix пересчитывает разошедшиеся)
+    args = [arg for arg in sys.argv[1:] if arg != '--fix']
+    conn = connect(args[0] if args else DB_PATH)
+    print(f"Версия схемы: {migrate(conn)}")
+    problems = find_full_scans(conn)
+    for name, detail in problems:
+        print(f"❌ {name}: {detail}")
+    if not problems:
+        print("✅ Все горячие запросы используют индексы")
+    
+    mismatches = check_category_stats(conn)
+    for category_id, saved, actual in mismatches:
+        print(f"❌ category_stats, категория {category_id}: сохранено {saved}, на самом деле {actual}")
+    if mismatches and '--fix' in sys.argv:
+        rebuild_category_stats(conn.cursor())
+        conn.commit()
+        print("✅ Сводка по категориям пересчитана")
+        mismatches = []
+    elif not mismatches:
+        print("✅ Сводка по категориям сходится с товарами")
+    
+    sales_mismatches = check_sales_rollups(conn)
+    for table, key, saved, actual in sales_mismatches[:20]:
+        print(f"❌ {table} {key}: сохранено {saved}, на самом деле {actual}")
+    if sales_mismatches and '--fix' in sys.argv:
+        rebuild_sales_rollups(conn.cursor())
+        conn.commit()
+        print("✅ Сводки продаж пересчитаны")
+        sales_mismatches = []
+    elif not sales_mismatches:
+        print("✅ Сводки продаж сходятся с заказами")
+    
+    if problems or mismatches or sales_mismatches:
+        sys.exit(1)
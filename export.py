@@ -0,0 +1,238 @@
+# export.py
+"""Потоковая выгрузка истории заказов в Parquet/Arrow (или CSV без pyarrow) для аналитики
+
+Запуск: python export.py [путь к базе] [--out export] [--format parquet|arrow|csv] [--full]
+Каждый запуск дописывает заказы после последнего выгруженного orders.id
+(он хранится в export_state.json в каталоге выгрузки) и заново снимает товары.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from database import DB_PATH, DEFAULT_PROFILE, connect
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # pyarrow не установлен — доступна только выгрузка в CSV
+    pa = pq = None
+
+# Строк в одной порции: столько держится в памяти одновременно
+EXPORT_CHUNK = 50_000
+
+STATE_FILE = 'export_state.json'
+
+FORMATS = ('parquet', 'arrow', 'csv')
+
+# Таблица -> (колонки с типами Arrow, запрос; заказы отбираются по диапазону orders.id).
+# {order_key} — order_id или +order_id: выгрузка с начала быстрее идёт сплошным чтением
+# таблицы, чем по индексу с переходом к каждой строке.
+EXPORT_TABLES = {
+    'orders': (
+        [('id', 'int64'), ('customer_id', 'int64'), ('order_date', 'string'),
+         ('total_amount', 'float64'), ('status', 'string'), ('payment_method', 'string')],
+        '''
+        SELECT id, customer_id, order_date, total_amount, status, payment_method
+        FROM orders
+        WHERE id > ? AND id <= ?
+        ORDER BY id
+        '''),
+    'order_items': (
+        [('id', 'int64'), ('order_id', 'int64'), ('product_id', 'int64'), ('quantity', 'int64'),
+         ('price_per_unit', 'float64'), ('subtotal', 'float64')],
+        '''
+        SELECT id, order_id, product_id, quantity, price_per_unit, subtotal
+        FROM order_items
+        WHERE {order_key} > ? AND {order_key} <= ?
+        '''),
+    'products': (
+        [('id', 'int64'), ('name', 'string'), ('price', 'float64'), ('stock', 'int64'),
+         ('category', 'string'), ('material', 'string'), ('color', 'string')],
+        '''
+        SELECT p.id, p.name, p.price, p.stock, c.name, p.material, p.color
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        ORDER BY p.id
+        '''),
+}
+
+
+def default_format():
+    """Parquet, если установлен pyarrow, иначе CSV"""
+    return 'parquet' if pa is not None else 'csv'
+
+
+class CsvWriter:
+    """CSV в UTF-8 с заголовком"""
+    
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, kind in columns])
+    
+    def write(self, rows):
+        self.writer.writerows(rows)
+    
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter:
+    """Parquet или файл Arrow IPC: каждая порция — отдельная группа строк (record batch)"""
+    
+    def __init__(self, path, columns, fmt):
+        self.schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in columns])
+        if fmt == 'parquet':
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+    
+    def write(self, rows):
+        columns = list(zip(*rows))
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema)
+        self.writer.write_batch(batch)
+    
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, columns, fmt):
+    """Писатель файла выгрузки в формате fmt"""
+    if fmt == 'csv':
+        return CsvWriter(path, columns)
+    if pa is None:
+        raise RuntimeError(f"Для формата {fmt} нужен пакет pyarrow (pip install pyarrow)")
+    return ArrowWriter(path, columns, fmt)
+
+
+def export_table(conn, path, table, params, fmt, chunk_size, scan=False):
+    """Выгрузить одну таблицу порциями через временный файл; вернуть число строк"""
+    columns, sql = EXPORT_TABLES[table]
+    sql = sql.format(order_key='+order_id' if scan else 'order_id')
+    part = path + '.part'
+    writer = open_writer(part, columns, fmt)
+    count = 0
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        writer.close()
+    # Файл появляется под своим именем только целиком
+    os.replace(part, path)
+    return count
+
+
+def load_state(out_dir):
+    """Состояние прошлых выгрузок: {'last_order_id': ...}"""
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {'last_order_id': 0}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(out_dir, state):
+    """Записать состояние атомарно"""
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.part', path)
+
+
+def export_history(conn, out_dir, fmt=None, full=False, chunk_size=EXPORT_CHUNK):
+    """Выгрузить новые заказы и их строки и снимок товаров в out_dir.
+    
+    Заказы берутся после last_order_id из прошлой выгрузки (full=True — все
+    заново) и пишутся в файлы orders_<от>_<до>, order_items_<от>_<до>;
+    товары каждый раз перезаписываются целиком. Все таблицы читаются из
+    одного снимка базы. Изменения статуса уже выгруженных заказов этим
+    способом не попадают в выгрузку. Возвращает сводку с числом строк.
+    """
+    fmt = fmt or default_format()
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    os.makedirs(out_dir, exist_ok=True)
+    state = {'last_order_id': 0} if full else load_state(out_dir)
+    since = state['last_order_id']
+    started = time.perf_counter()
+    # Файлы пишутся во временный каталог и переносятся в out_dir, только когда
+    # готовы все таблицы: прерванный запуск не оставляет порций, которых нет
+    # в состоянии. Прежние порции полной выгрузки удаляются после сохранения состояния.
+    work_dir = tempfile.mkdtemp(prefix='.export-', dir=out_dir)
+    try:
+        # Одна читающая транзакция: заказы, строки и товары согласованы между собой
+        conn.execute('BEGIN')
+        try:
+            until = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+            counts = {}
+            if until > since:
+                for table in ('orders', 'order_items'):
+                    path = os.path.join(work_dir, f'{table}_{since + 1:09d}_{until:09d}.{fmt}')
+                    counts[table] = export_table(conn, path, table, (since, until), fmt, chunk_size,
+                                                 scan=since == 0)
+            counts['products'] = export_table(conn, os.path.join(work_dir, f'products.{fmt}'),
+                                              'products', (), fmt, chunk_size)
+        finally:
+            conn.rollback()
+        
+        old = {path for table in ('orders', 'order_items')
+               for path in glob.glob(os.path.join(out_dir, f'{table}_*_*.*'))} if full else set()
+        new = set()
+        for name in os.listdir(work_dir):
+            os.replace(os.path.join(work_dir, name), os.path.join(out_dir, name))
+            new.add(os.path.join(out_dir, name))
+        
+        state = {'last_order_id': max(until, since), 'format': fmt,
+                 'exported_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        save_state(out_dir, state)
+        # Прежние порции заменены одной полной выгрузкой
+        for path in old - new:
+            os.remove(path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {'since': since, 'until': state['last_order_id'], 'rows': counts,
+            'seconds': time.perf_counter() - started, 'format': fmt}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', default=DB_PATH, help='файл базы')
+    parser.add_argument('--out', default='export', help='каталог выгрузки')
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help='формат файлов (по умолчанию parquet, без pyarrow — csv)')
+    parser.add_argument('--full', action='store_true', help='выгрузить все заказы заново')
+    parser.add_argument('--chunk', type=int, default=EXPORT_CHUNK, help='строк в одной порции')
+    args = parser.parse_args()
+    
+    conn = connect(args.path, DEFAULT_PROFILE)
+    try:
+        result = export_history(conn, args.out, args.format, args.full, args.chunk)
+    except RuntimeError as e:
+        parser.exit(1, f"❌ {e}\n")
+    finally:
+        conn.close()
+    
+    rows = sum(result['rows'].values())
+    if result['until'] > result['since']:
+        print(f"Заказы {result['since'] + 1}..{result['until']} ({result['format']}): "
+              + ', '.join(f"{table} {count:,}" for table, count in result['rows'].items()))
+    else:
+        print(f"Новых заказов нет, товаров выгружено {result['rows']['products']:,}")
+    print(f"✅ {rows:,} строк за {result['seconds']:.1f} с ({rows / max(result['seconds'], 1e-9):,.0f} строк/с)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+# federation.py
+"""Сводные запросы по базам нескольких салонов: каталог, остатки, заказы и продажи
+
+Запуск: python federation.py центр=shop1.db юг=shop2.db [--stock ТЕКСТ] [--orders 20] [--workers 4]
+У каждого салона своя база furniture_shop.db. Каждая открывается отдельным
+соединением только для чтения (а не через ATTACH к одному соединению, которое
+выполняет запросы строго по очереди), и запрос к салонам выполняется
+параллельно в пуле потоков; результаты сливаются в порядке общей сортировки.
+Номера товаров, клиентов и заказов у салонов свои, поэтому в каждой строке
+первым столбцом идёт салон, а один и тот же товар сводится по названию.
+"""
+import argparse
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DEFAULT_PROFILE, ORDERS_QUERY, connect
+from services import PAGE_SIZE, ReportService, ShopError, ShopRepository
+
+# Потоков пула по умолчанию: не больше, чем салонов
+FEDERATION_WORKERS = 8
+
+# Наибольший id SQLite: ключ «после всех строк с этим названием»
+MAX_ROWID = 2 ** 63 - 1
+
+
+class Branch:
+    """База одного салона: соединение используется одним потоком пула за раз"""
+    
+    def __init__(self, name, path, profile):
+        if not os.path.exists(path):
+            # sqlite3.connect создал бы пустую базу вместо ошибки
+            raise ShopError(f"Нет базы салона «{name}»: {path}")
+        self.name = name
+        self.path = path
+        self.conn = connect(path, profile, check_same_thread=False)
+        self.conn.execute('PRAGMA query_only = ON')
+        self.lock = threading.Lock()
+    
+    def run(self, task):
+        with self.lock:
+            return task(self.conn)
+
+
+class BranchFederation:
+    """Чтение из баз всех салонов сразу; branches — {название салона: путь к базе}"""
+    
+    def __init__(self, branches, profile=DEFAULT_PROFILE, workers=FEDERATION_WORKERS):
+        self.branches = []
+        try:
+            for name, path in branches.items():
+                self.branches.append(Branch(name, path, profile))
+        except Exception:
+            self.close()
+            raise
+        self.executor = ThreadPoolExecutor(max(1, min(workers, len(self.branches))),
+                                           thread_name_prefix='branch')
+    
+    def map(self, task):
+        """Выполнить task(conn) в каждом салоне параллельно; [(салон, результат)] в порядке салонов"""
+        return self.map_branches(lambda name: task)
+    
+    def map_branches(self, make_task):
+        """Как map, но задача для каждого салона своя: make_task(салон) -> task(conn)"""
+        futures = [(branch.name, self.executor.submit(branch.run, make_task(branch.name)))
+                   for branch in self.branches]
+        return [(name, future.result()) for name, future in futures]
+    
+    # ========== КАТАЛОГ И ОСТАТКИ ==========
+    
+    def products(self, after=None, limit=PAGE_SIZE, category=None):
+        """Страница общего каталога по (название, салон, id): строки (салон, id, название, цена, остаток, ...).
+        
+        after — последняя строка предыдущей страницы. Каждый салон отдаёт не
+        больше limit строк после ключа, и первые limit из слияния — страница.
+        """
+        def page(branch):
+            if after is None:
+                key = None
+            elif branch < after[0]:
+                key = (MAX_ROWID, after[2])   # тем же названием в этом салоне уже показаны все
+            elif branch == after[0]:
+                key = (after[1], after[2])
+            else:
+                key = (0, after[2])           # а в этом — ещё ни одного
+            return lambda conn: ShopRepository(conn).list_products(key, limit, category).fetchall()
+        
+        shards = [[(branch,) + tuple(row) for row in rows] for branch, rows in self.map_branches(page)]
+        merged = heapq.merge(*shards, key=lambda row: (row[2], row[0], row[1]))
+        return list(itertools.islice(merged, limit))
+    
+    def stock(self, text, limit=PAGE_SIZE):
+        """Остатки товаров с text в названии: (название, всего, {салон: остаток}) по названию"""
+        def query(conn):
+            return conn.execute('''
+                SELECT name, SUM(stock) FROM products
+                WHERE name LIKE ?
+                GROUP BY name
+                ORDER BY name
+                LIMIT ?
+            ''', (f'%{text}%', limit)).fetchall()
+        
+        levels = {}
+        for branch, rows in self.map(query):
+            for name, stock in rows:
+                levels.setdefault(name, {})[branch] = stock
+        return [(name, sum(by_branch.values()), by_branch)
+                for name, by_branch in sorted(levels.items())[:limit]]
+    
+    # ========== ЗАКАЗЫ И ПРОДАЖИ ==========
+    
+    def orders(self, status=None, limit=PAGE_SIZE):
+        """Последние заказы всех салонов: (салон, id, дата, клиент, сумма, статус, оплата), новые первыми"""
+        # Слияние по дате требует той же сортировки в каждом салоне
+        sql, params = ORDERS_QUERY, []
+        if status:
+            sql += ' WHERE o.status = ?'
+            params.append(status)
+        sql += ' ORDER BY o.order_date DESC, o.id DESC LIMIT ?'
+        params.append(limit)
+        
+        def query(conn):
+            return conn.execute(sql, params).fetchall()
+        
+        shards = [[(branch,) + tuple(row) for row in rows] for branch, rows in self.map(query)]
+        merged = heapq.merge(*shards, key=lambda row: (row[2] or '', row[1]), reverse=True)
+        return list(itertools.islice(merged, limit))
+    
+    def summary(self, start=None, end=None):
+        """Итоги продаж за период: ({салон: (заказов, единиц, выручка, средний чек)}, итог по сети)"""
+        by_branch = dict(self.map(lambda conn: ReportService(conn).summary(start, end)))
+        orders = sum(row[0] for row in by_branch.values())
+        units = sum(row[1] for row in by_branch.values())
+        revenue = sum(row[2] for row in by_branch.values())
+        return by_branch, (orders, units, revenue, revenue / orders if orders else 0)
+    
+    def top_products(self, start=None, end=None, limit=10):
+        """Самые продаваемые по выручке товары сети, сведённые по названию: (название, единиц, выручка)"""
+        totals = {}
+        # Запас по каждому салону: товар может не войти в топ салона, но войти в общий
+        for branch, rows in self.map(lambda conn: ReportService(conn).top_products(start, end, limit * 3)):
+            for product_id, name, units, revenue in rows:
+                total = totals.setdefault(name, [0, 0.0])
+                total[0] += units
+                total[1] += revenue
+        rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [(name, units, revenue) for name, (units, revenue) in rows]
+    
+    def close(self):
+        if hasattr(self, 'executor'):
+            self.executor.shutdown()
+        for branch in self.branches:
+            branch.conn.close()
+
+
+def parse_branches(specs):
+    """['центр=shop1.db', 'shop2.db'] -> {'центр': 'shop1.db', 'shop2': 'shop2.db'}"""
+    branches = {}
+    for spec in specs:
+        name, sep, path = spec.partition('=')
+        if not sep:
+            path, name = spec, os.path.splitext(os.path.basename(spec))[0]
+        if name in branches:
+            raise ShopError(f"Салон «{name}» указан дважды")
+        branches[name] = path
+    return branches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('branches', nargs='+', metavar='САЛОН=БАЗА', help='базы салонов')
+    parser.add_argument('--stock', metavar='ТЕКСТ', help='остатки товаров с этим текстом в названии')
+    parser.add_argument('--orders', type=int, default=10, metavar='N', help='последних заказов сети')
+    parser.add_argument('--start', help='начало периода продаж, ГГГГ-ММ-ДД')
+    parser.add_argument('--end', help='конец периода продаж, ГГГГ-ММ-ДД')
+    parser.add_argument('--workers', type=int, default=FEDERATION_WORKERS, help='потоков пула')
+    parser.add_argument('--db-profile', default=DEFAULT_PROFILE, help='профиль соединений с базами салонов')
+    args = parser.parse_args()
+    
+    try:
+        federation = BranchFederation(parse_branches(args.branches), args.db_profile, args.workers)
+    except ShopError as e:
+        parser.exit(1, f"❌ {e}\n")
+    try:
+        by_branch, total = federation.summary(args.start, args.end)
+        print(f"{'салон':<16} {'заказов':>9} {'единиц':>9} {'выручка':>16} {'средний чек':>12}")
+        for name, (orders, units, revenue, basket) in list(by_branch.items()) + [('Вся сеть', total)]:
+            print(f"{name:<16} {orders:>9,} {units:>9,} {revenue:>16,.0f} {basket:>12,.0f}")
+        
+        if args.stock:
+            print(f"\nОстатки «{args.stock}»:")
+            for name, stock, levels in federation.stock(args.stock, limit=20):
+                print(f"  {name}: {stock} шт. ({', '.join(f'{branch} {count}' for branch, count in levels.items())})")
+        
+        if args.orders:
+            print("\nПоследние заказы:")
+            for branch, order_id, date, customer, amount, status, payment in federation.orders(limit=args.orders):
+                print(f"  {branch} №{order_id}  {(date or '')[:16]}  {customer}  {amount:,.0f} ₽  {status}")
+    finally:
+        federation.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+# importer.py
+"""Массовая загрузка товаров и клиентов из CSV или Excel
+
+Запуск: python importer.py products каталог.csv [путь к базе] [--dry-run] [--create-categories]
+        python importer.py customers клиенты.xlsx [путь к базе] [--dry-run]
+Первая строка файла — заголовки колонок (русские, как в окнах программы, или
+английские, как в базе). Строки с ошибками пропускаются и перечисляются в отчёте.
+"""
+import argparse
+import csv
+import re
+import time
+from operator import itemgetter
+
+from database import DB_PATH, DEFAULT_PROFILE, connect, has_search_index, migrate, rebuild_category_stats
+from services import ShopError, customer_email
+
+try:
+    import openpyxl
+except ImportError:
+    # openpyxl не установлен — загружаются только CSV
+    openpyxl = None
+
+# Строк в одном executemany
+IMPORT_BATCH = 10_000
+
+# Индексы и триггеры таблицы снимаются на время загрузки и строятся заново,
+# если добавляется не меньше этой доли от уже имеющихся строк
+REBUILD_SHARE = 0.2
+
+# Сколько ошибок хранить в отчёте (считаются все)
+MAX_ERRORS = 1000
+
+# Поле -> заголовки колонок, под которыми оно может прийти (нижний регистр, «ё» -> «е»)
+FIELDS = {
+    'products': {
+        'name': ('name', 'название', 'название товара', 'наименование', 'товар'),
+        'price': ('price', 'цена'),
+        'stock': ('stock', 'количество', 'количество на складе', 'остаток'),
+        'category': ('category', 'категория'),
+        'material': ('material', 'материал'),
+        'color': ('color', 'цвет'),
+        'description': ('description', 'описание'),
+    },
+    'customers': {
+        'first_name': ('first_name', 'имя'),
+        'last_name': ('last_name', 'фамилия'),
+        'phone': ('phone', 'телефон'),
+        'email': ('email', 'e-mail', 'почта'),
+    },
+}
+
+REQUIRED = {
+    'products': ('name', 'price', 'category'),
+    'customers': ('first_name', 'last_name'),
+}
+
+INSERT_SQL = {
+    'products': '''
+        INSERT INTO products (name, price, stock, category_id, material, color, description)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'customers': "INSERT INTO customers (first_name, last_name, phone, email) VALUES (?, ?, ?, ?)",
+}
+
+
+def read_table(path):
+    """Строки файла списками строк: CSV (разделитель «,», «;» или табуляция) или Excel .xlsx"""
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        if openpyxl is None:
+            raise ShopError("Для загрузки Excel нужен пакет openpyxl (pip install openpyxl) "
+                            "или сохраните файл как CSV")
+        # read_only читает лист потоком, не загружая его целиком
+        book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in book.active.iter_rows(values_only=True):
+                yield ['' if value is None else str(value) for value in row]
+        finally:
+            book.close()
+        return
+    
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def header_name(text):
+    """Заголовок колонки без пояснений в скобках и двоеточия"""
+    return re.sub(r'\(.*?\)', '', text).strip().rstrip(':').strip().lower().replace('ё', 'е')
+
+
+def parse_number(text, label):
+    """Неотрицательное число; допускаются пробелы, запятая и знак ₽"""
+    try:
+        value = float(text)
+    except ValueError:
+        try:
+            value = float(re.sub(r'[\s₽]', '', text).replace(',', '.'))
+        except ValueError:
+            raise ValueError(f"{label}: не число '{text}'")
+    if value < 0:
+        raise ValueError(f"{label}: отрицательное значение")
+    return value
+
+
+def parse_count(text, label):
+    """Неотрицательное целое (Excel может отдать 5.0)"""
+    value = parse_number(text, label)
+    if not value.is_integer():
+        raise ValueError(f"{label}: не целое число '{text}'")
+    return int(value)
+
+
+class BulkImporter:
+    """Проверка и загрузка строк файла в products или customers.
+    
+    Файл читается дважды потоком: первый проход проверяет строки и считает
+    их, второй вставляет пачками через executemany в одной транзакции.
+    Категории ищутся по словарю, загруженному один раз; при большой загрузке
+    индексы и триггеры таблицы (кроме журнала изменений) снимаются и создаются
+    заново после вставки, а полнотекстовый индекс и сводка по категориям
+    пересчитываются.
+    """
+    
+    def __init__(self, conn, kind, create_categories=False, rebuild=None,
+                 batch_size=IMPORT_BATCH, progress=None):
+        if kind not in FIELDS:
+            raise ShopError(f"Неизвестный вид загрузки: {kind}")
+        self.conn = conn
+        self.kind = kind
+        self.create_categories = create_categories
+        self.rebuild = rebuild          # None — решить по REBUILD_SHARE
+        self.batch_size = batch_size
+        self.progress = progress        # progress(загружено, всего)
+        self.categories = {}
+        self.emails = set()
+        self.new_categories = set()
+        self.errors = []
+        self.error_count = 0
+    
+    def reset(self):
+        """Справочники из базы и пустой список ошибок перед проходом по файлу"""
+        if self.kind == 'products':
+            self.categories = dict(self.conn.execute("SELECT name, id FROM categories"))
+        else:
+            self.emails = {email.lower() for (email,) in self.conn.execute(
+                "SELECT email FROM customers WHERE email IS NOT NULL AND email != ''")}
+        self.new_categories = set()
+        self.errors = []
+        self.error_count = 0
+    
+    def error(self, line, message):
+        """Запомнить ошибку в строке файла"""
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+    
+    def scan(self, path):
+        """Проверенные строки файла: (номер строки, значения для вставки)"""
+        rows = read_table(path)
+        header = next(rows, None)
+        if header is None:
+            raise ShopError("Файл пуст")
+        names = [header_name(text) for text in header]
+        columns = {}
+        for field, aliases in FIELDS[self.kind].items():
+            for i, name in enumerate(names):
+                if name in aliases:
+                    columns[field] = i
+                    break
+        missing = [field for field in REQUIRED[self.kind] if field not in columns]
+        if missing:
+            raise ShopError(f"В файле нет колонок: {', '.join(missing)}")
+        
+        # Поля в порядке FIELDS; отсутствующей колонке соответствует пустая строка в конце
+        width = len(names)
+        pick = itemgetter(*(columns.get(field, width) for field in FIELDS[self.kind]))
+        parse = self.product_values if self.kind == 'products' else self.customer_values
+        for line, values in enumerate(rows, start=2):
+            if len(values) < width:
+                values += [''] * (width - len(values))
+            values.append('')
+            fields = [value.strip() for value in pick(values)]
+            if not any(fields):
+                continue
+            try:
+                yield line, parse(*fields)
+            except ValueError as e:
+                self.error(line, str(e))
+    
+    def product_values(self, name, price, stock, category, material, color, description):
+        """Строка товара: (название, цена, остаток, категория, материал, цвет, описание)"""
+        if not name:
+            raise ValueError("пустое название")
+        price = parse_number(price, 'цена')
+        stock = parse_count(stock or '0', 'количество')
+        if not category:
+            raise ValueError("не указана категория")
+        if category not in self.categories:
+            if not self.create_categories:
+                raise ValueError(f"категория '{category}' не найдена")
+            self.new_categories.add(category)
+        return (name, price, stock, category, material, color, description)
+    
+    def customer_values(self, first_name, last_name, phone, email):
+        """Строка клиента: (имя, фамилия, телефон, email)"""
+        if not first_name or not last_name:
+            raise ValueError("не указаны имя или фамилия")
+        if email:
+            if '@' not in email:
+                raise ValueError(f"неверный email '{email}'")
+            if email.lower() in self.emails:
+                raise ValueError(f"email '{email}' уже есть")
+            self.emails.add(email.lower())
+        return (first_name, last_name, phone, customer_email(email))
+    
+    def check(self, path):
+        """Проверить файл без записи: число годных строк"""
+        self.reset()
+        return sum(1 for row in self.scan(path))
+    
+    def run(self, path, dry_run=False):
+        """Проверить и (если не dry_run) загрузить файл; вернуть сводку"""
+        started = time.perf_counter()
+        total = self.check(path)
+        result = {
+            'rows': total,
+            'inserted': 0,
+            'errors': list(self.errors),
+            'error_count': self.error_count,
+            'new_categories': sorted(self.new_categories),
+            'rebuilt': False,
+            'dry_run': dry_run,
+        }
+        if dry_run or total == 0:
+            result['seconds'] = time.perf_counter() - started
+            return result
+        
+        existing = self.conn.execute(f"SELECT COUNT(*) FROM {self.kind}").fetchone()[0]
+        rebuild = self.rebuild if self.rebuild is not None else total >= existing * REBUILD_SHARE
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if result['new_categories']:
+                cursor.executemany("INSERT INTO categories (name) VALUES (?)",
+                                   [(name,) for name in result['new_categories']])
+            deferred = self.drop_deferred(cursor) if rebuild else []
+            
+            # Второй проход: справочники уже содержат новые категории
+            self.reset()
+            batch, done = [], 0
+            for line, values in self.scan(path):
+                if self.kind == 'products':
+                    values = values[:3] + (self.categories[values[3]],) + values[4:]
+                batch.append(values)
+                if len(batch) >= self.batch_size:
+                    done = self.insert(cursor, batch, done, total)
+                    batch = []
+            if batch:
+                done = self.insert(cursor, batch, done, total)
+            
+            if rebuild:
+                self.restore_deferred(cursor, deferred)
+            self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        result['inserted'] = done
+        result['rebuilt'] = rebuild
+        result['seconds'] = time.perf_counter() - started
+        return result
+    
+    def insert(self, cursor, batch, done, total):
+        """Вставить пачку строк, сообщить о ходе загрузки; вернуть число загруженных"""
+        cursor.executemany(INSERT_SQL[self.kind], batch)
+        done += len(batch)
+        if self.progress is not None:
+            self.progress(done, total)
+        return done
+    
+    def drop_deferred(self, cursor):
+        """Снять индексы и триггеры таблицы, вернуть их определения"""
+        # Триггеры журнала изменений остаются: без них загруженные строки не дошли бы до реплик
+        deferred = cursor.execute('''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+              AND name NOT IN (?, ?, ?)
+        ''', (self.kind,) + tuple(f'{self.kind}_changes_{suffix}' for suffix in ('ai', 'au', 'ad'))).fetchall()
+        for kind, name, sql in deferred:
+            cursor.execute(f'DROP {kind} "{name}"')
+        return deferred
+    
+    def restore_deferred(self, cursor, deferred):
+        """Вернуть индексы и триггеры и пересчитать то, что они поддерживали"""
+        for kind, name, sql in deferred:
+            cursor.execute(sql)
+        if has_search_index(cursor):
+            cursor.execute(f"INSERT INTO {self.kind}_fts({self.kind}_fts) VALUES ('rebuild')")
+        if self.kind == 'products':
+            rebuild_category_stats(cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('kind', choices=sorted(FIELDS), help='что загружать')
+    parser.add_argument('file', help='CSV или .xlsx с заголовками в первой строке')
+    parser.add_argument('path', nargs='?', default=DB_PATH, help='файл базы')
+    parser.add_argument('--dry-run', action='store_true', help='только проверить файл')
+    parser.add_argument('--create-categories', action='store_true',
+                        help='создавать категории, которых нет в базе')
+    parser.add_argument('--rebuild', choices=('auto', 'always', 'never'), default='auto',
+                        help='снимать индексы на время загрузки (auto — для больших загрузок)')
+    args = parser.parse_args()
+    
+    conn = connect(args.path, DEFAULT_PROFILE)
+    migrate(conn)
+    importer = BulkImporter(
+        conn, args.kind, args.create_categories, {'auto': None, 'always': True, 'never': False}[args.rebuild],
+        progress=lambda done, total: print(f'\rЗагружено: {done:,}/{total:,}', end='', flush=True))
+    try:
+        result = importer.run(args.file, args.dry_run)
+    except (ShopError, OSError) as e:
+        parser.exit(1, f"❌ {e}\n")
+    finally:
+        conn.close()
+    
+    if result['inserted']:
+        print()
+    for line, message in result['errors'][:50]:
+        print(f"⚠️ строка {line}: {message}")
+    if result['error_count'] > 50:
+        print(f"... и ещё {result['error_count'] - 50} ошибок")
+    if result['new_categories']:
+        print(f"Новые категории: {', '.join(result['new_categories'])}")
+    if result['dry_run']:
+        print(f"Проверка: годных строк {result['rows']:,}, с ошибками {result['error_count']:,}")
+    else:
+        mode = ', индексы перестроены' if result['rebuilt'] else ''
+        print(f"✅ Загружено {result['inserted']:,} строк за {result['seconds']:.1f} с{mode}; "
+              f"пропущено с ошибками {result['error_count']:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+# query_log.py
+"""Замер запросов к базе: гистограммы времени, число строк, места вызова, журнал медленных запросов
+
+Включается соединением с factory=InstrumentedConnection (app.py --profile).
+Время запроса — это execute и все выборки строк из курсора до его исчерпания.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import chain
+
+# Верхние границы корзин гистограммы, мс; последняя корзина — всё, что дольше
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# Запросы не быстрее этого попадают в журнал вместе с планом
+SLOW_MS = float(os.environ.get('FURNITURE_SHOP_SLOW_MS', 100))
+
+# Для каких команд в журнал пишется EXPLAIN QUERY PLAN
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+logger = logging.getLogger('furniture_shop.sql')
+
+
+def normalize(sql):
+    """Текст запроса в одну строку — ключ статистики"""
+    return ' '.join(sql.split())
+
+
+def call_site(depth=2):
+    """Первые depth кадров стека вне этого модуля: 'файл:строка функция ← ...'"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    sites = []
+    while frame is not None and len(sites) < depth:
+        code = frame.f_code
+        sites.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    return ' ← '.join(sites)
+
+
+class StatementStats:
+    """Накопленная статистика одного текста запроса"""
+    __slots__ = ('sql', 'count', 'total_ms', 'max_ms', 'rows', 'errors', 'histogram', 'sites')
+    
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.sites = Counter()
+    
+    def add(self, elapsed_ms, rows, site, failed):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        self.errors += failed
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and elapsed_ms > BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+        self.sites[site] += 1
+    
+    def percentile(self, share):
+        """Верхняя граница корзины, в которую попадает доля share вызовов, мс"""
+        wanted = self.count * share
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + (self.max_ms,), self.histogram):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max_ms)
+        return self.max_ms
+    
+    def as_dict(self):
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+            'errors': self.errors,
+            'histogram': dict(zip([f'<={bound}' for bound in BUCKETS_MS] + ['>1000'], self.histogram)),
+            'sites': dict(self.sites.most_common(5)),
+        }
+
+
+class QueryStats:
+    """Статистика по всем соединениям процесса; методы можно вызывать из разных потоков"""
+    
+    def __init__(self, slow_ms=SLOW_MS):
+        self.slow_ms = slow_ms
+        self.statements = {}
+        self.slow = 0
+        self.lock = threading.Lock()
+    
+    def record(self, sql, elapsed_ms, rows, site, failed=False):
+        key = normalize(sql)
+        with self.lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats(key)
+            stats.add(elapsed_ms, rows, site, failed)
+            if elapsed_ms >= self.slow_ms:
+                self.slow += 1
+    
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+            self.slow = 0
+    
+    def snapshot(self):
+        """Статистика запросов словарями, самые затратные по суммарному времени первыми"""
+        with self.lock:
+            rows = [stats.as_dict() for stats in self.statements.values()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+    
+    def report(self, limit=30):
+        """Текстовая таблица для вкладки отладки и вывода при выходе"""
+        rows = self.snapshot()
+        lines = [f"Запросов: {sum(row['count'] for row in rows)}, различных: {len(rows)}, "
+                 f"медленных (≥ {self.slow_ms:g} мс): {self.slow}",
+                 '',
+                 f"{'вызовов':>8} {'всего, мс':>10} {'средн.':>8} {'p95 ≤':>7} {'макс.':>8} {'строк':>9}  запрос"]
+        for row in rows[:limit]:
+            lines.append(f"{row['count']:>8} {row['total_ms']:>10.1f} {row['mean_ms']:>8.2f} {row['p95_ms']:>7.1f} "
+                         f"{row['max_ms']:>8.1f} {row['rows']:>9}  {row['sql'][:100]}")
+            for site, count in list(row['sites'].items())[:2]:
+                lines.append(f"{'':>55}↳ {site} ×{count}")
+        return '\n'.join(lines)
+    
+    def dump(self, path):
+        """Записать статистику в JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'slow_ms': self.slow_ms, 'slow': self.slow, 'statements': self.snapshot()},
+                      f, ensure_ascii=False, indent=2)
+
+
+STATS = QueryStats()
+
+
+def log_slow(conn, sql, parameters, elapsed_ms, rows, site):
+    """Записать медленный запрос в журнал вместе с его планом"""
+    plan = []
+    if sql.lstrip()[:7].upper().startswith(EXPLAINABLE):
+        try:
+            # Обычный курсор: план не должен попасть в статистику
+            plan = [row[3] for row in sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters)]
+        except sqlite3.Error as e:
+            plan = [f'план недоступен: {e}']
+    logger.warning("медленный запрос %.1f мс, строк %d, %s\n    %s\n    план:\n%s",
+                   elapsed_ms, rows, site, normalize(sql),
+                   '\n'.join(f'      {line}' for line in plan) or '      —')
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, засекающий время запроса вместе с выборкой его строк"""
+    
+    stats = STATS
+    pending = None
+    
+    def start(self, sql, parameters, run):
+        """Выполнить run(), закрыв замер предыдущего запроса этого курсора"""
+        self.finish()
+        site = call_site()
+        started = time.perf_counter()
+        try:
+            run()
+        except BaseException:
+            self.stats.record(sql, (time.perf_counter() - started) * 1000, 0, site, failed=True)
+            raise
+        self.pending = [sql, parameters, (time.perf_counter() - started) * 1000, 0, site]
+        if self.description is None:
+            # Не SELECT: строк для выборки нет, замер закончен
+            self.pending[3] = self.rowcount
+            self.finish()
+        return self
+    
+    def execute(self, sql, parameters=()):
+        return self.start(sql, parameters, lambda: super(InstrumentedCursor, self).execute(sql, parameters))
+    
+    def executemany(self, sql, seq_of_parameters):
+        # Первый набор параметров нужен для плана медленного запроса
+        seq = iter(seq_of_parameters)
+        first = next(seq, None)
+        params = [] if first is None else chain([first], seq)
+        return self.start(sql, first or (), lambda: super(InstrumentedCursor, self).executemany(sql, params))
+    
+    def timed(self, fetch):
+        """Выполнить выборку, добавив её время к текущему замеру"""
+        started = time.perf_counter()
+        try:
+            return fetch()
+        finally:
+            pending = self.pending
+            if pending is not None:
+                pending[2] += (time.perf_counter() - started) * 1000
+    
+    def fetchone(self):
+        row = self.timed(super().fetchone)
+        if row is None:
+            self.finish()
+        else:
+            self.count_rows(1)
+        return row
+    
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self.timed(lambda: super(InstrumentedCursor, self).fetchmany(size))
+        self.count_rows(len(rows))
+        if len(rows) < size:
+            self.finish()
+        return rows
+    
+    def fetchall(self):
+        rows = self.timed(super().fetchall)
+        self.count_rows(len(rows))
+        self.finish()
+        return rows
+    
+    def __next__(self):
+        # Построчный обход — самый частый путь, поэтому без timed() и count_rows()
+        started = time.perf_counter()
+        try:
+            row = sqlite3.Cursor.__next__(self)
+        except StopIteration:
+            self.finish()
+            raise
+        pending = self.pending
+        if pending is not None:
+            pending[2] += (time.perf_counter() - started) * 1000
+            pending[3] += 1
+        return row
+    
+    def count_rows(self, count):
+        pending = self.pending
+        if pending is not None:
+            pending[3] += count
+    
+    def finish(self):
+        """Записать замер текущего запроса, если он ещё не записан"""
+        pending = self.pending
+        if pending is None:
+            return
+        self.pending = None
+        sql, parameters, elapsed_ms, rows, site = pending
+        self.stats.record(sql, elapsed_ms, rows, site)
+        if elapsed_ms >= self.stats.slow_ms:
+            log_slow(self.connection, sql, parameters, elapsed_ms, rows, site)
+    
+    def close(self):
+        self.finish()
+        super().close()
+    
+    def __del__(self):
+        # Курсор бросили, не дочитав (например, отменённая задача фонового потока)
+        self.finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, все запросы которого идут через InstrumentedCursor"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def executescript(self, script):
+        site = call_site()
+        started = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            InstrumentedCursor.stats.record(script, (time.perf_counter() - started) * 1000, 0, site)
@@ -0,0 +1,158 @@
+# render_profile.py
+"""Профилирование интерфейса: время загрузки таблиц и построения диалогов по фазам
+
+Включается app.py --trace. Замеры складываются в стеки вида
+'MainThread;load_customers;insert' и записываются в формате свёрнутых стеков
+(flamegraph.pl, speedscope, inferno): 'стек время_в_мкс' на строку.
+Фазы: query — запрос и выборка строк в фоновом потоке, format — подготовка
+строк, insert — вставка и перестановка строк Treeview, layout — отложенная
+перерисовка Tk. Собственное время диалога — создание его виджетов.
+"""
+import functools
+import threading
+import time
+from collections import Counter
+
+# Куда app.py --trace пишет трассу по умолчанию
+TRACE_FILE = 'render_trace.folded'
+
+
+class Span:
+    """Замер одного участка: вложенные участки вычитаются из собственного времени"""
+    __slots__ = ('profiler', 'names')
+    
+    def __init__(self, profiler, names):
+        self.profiler = profiler
+        self.names = names
+    
+    def __enter__(self):
+        stack = self.profiler.thread_stack()
+        path = (stack[-1][0] if stack else (threading.current_thread().name,)) + self.names
+        stack.append([path, time.perf_counter(), 0.0])
+        return self
+    
+    def __exit__(self, *exc):
+        stack = self.profiler.thread_stack()
+        path, started, children = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += elapsed
+        self.profiler.record(path, elapsed - children)
+        return False
+
+
+class NullSpan:
+    """Участок при выключенном профилировании"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class RenderProfiler:
+    """Собственное время и число вызовов по стекам участков; пишут все потоки"""
+    
+    def __init__(self):
+        self.enabled = False
+        self.self_time = Counter()   # стек -> секунды без вложенных участков
+        self.calls = Counter()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+    
+    def thread_stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+    
+    def span(self, *names):
+        """Контекст замера участка names внутри текущего"""
+        return Span(self, names) if self.enabled else NULL_SPAN
+    
+    def stack(self):
+        """Имена открытых участков текущего потока — чтобы продолжить их в колбэке"""
+        if not self.enabled:
+            return ()
+        stack = self.thread_stack()
+        return stack[-1][0][1:] if stack else ()
+    
+    def layout(self, widget):
+        """При профилировании сразу выполнить отложенную разметку и перерисовку Tk"""
+        if self.enabled:
+            with self.span('layout'):
+                widget.update_idletasks()
+    
+    def record(self, path, seconds):
+        with self.lock:
+            self.self_time[path] += seconds
+            self.calls[path] += 1
+    
+    def reset(self):
+        with self.lock:
+            self.self_time.clear()
+            self.calls.clear()
+    
+    def totals(self):
+        """{стек: (вызовов, всего с, собственное с)}"""
+        with self.lock:
+            self_time, calls = dict(self.self_time), dict(self.calls)
+        total = Counter()
+        for path, seconds in self_time.items():
+            for depth in range(1, len(path) + 1):
+                total[path[:depth]] += seconds
+        return {path: (calls.get(path, 0), seconds, self_time.get(path, 0.0))
+                for path, seconds in total.items()}
+    
+    def report(self, limit=40):
+        """Текстовая таблица участков, самые долгие первыми"""
+        rows = sorted(self.totals().items(), key=lambda item: item[1][1], reverse=True)
+        lines = [f"{'вызовов':>8} {'всего, мс':>10} {'своё, мс':>10}  участок"]
+        for path, (calls, total, own) in rows[:limit]:
+            lines.append(f"{calls:>8} {total * 1000:>10.1f} {own * 1000:>10.1f}  {';'.join(path)}")
+        return '\n'.join(lines)
+    
+    def dump(self, path):
+        """Записать свёрнутые стеки с собственным временем в микросекундах"""
+        with self.lock:
+            items = sorted(self.self_time.items())
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, seconds in items:
+                micros = round(seconds * 1_000_000)
+                if micros > 0:
+                    f.write(f"{';'.join(stack)} {micros}\n")
+
+
+PROFILER = RenderProfiler()
+
+
+def traced(method):
+    """Замерять вызов метода как участок с его именем"""
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return method(*args, **kwargs)
+        with Span(PROFILER, (name,)):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def traced_dialog(method):
+    """Как traced, но вместе с разметкой окна, построенного методом (self.root)"""
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not PROFILER.enabled:
+            return method(self, *args, **kwargs)
+        with Span(PROFILER, (name,)):
+            result = method(self, *args, **kwargs)
+            PROFILER.layout(self.root)
+            return result
+    return wrapper
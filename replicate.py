@@ -0,0 +1,207 @@
+# replicate.py
+"""Инкрементальная репликация базы магазина по журналу изменений (таблица changes)
+
+Запуск: python replicate.py furniture_shop.db office.db [--follow] [--interval 1] [--batch 1000]
+Если реплики ещё нет, она создаётся снимком источника (backup API SQLite),
+дальше переносятся только новые строки журнала. Пачка применяется одной
+транзакцией вместе с номером последнего изменения в replication_state, а
+изменения несут полный образ строки, поэтому повторное применение ничего
+не портит: после сбоя репликация продолжается с сохранённого seq.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from database import CANCELLED_STATUS, CHANGE_TABLES, DEFAULT_PROFILE, apply_order_sales, connect, migrate
+from services import IN_BATCH, ShopError
+
+# Изменений в одной транзакции реплики
+REPLICATION_BATCH = 1000
+
+# Пауза между проверками журнала в режиме --follow, с
+REPLICATION_INTERVAL = 1.0
+
+# (вставка или замена строки, удаление) для каждой таблицы журнала
+APPLY_SQL = {
+    table: (f'''
+        INSERT INTO {table} (id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})
+        ON CONFLICT (id) DO UPDATE SET {', '.join(f'{col} = excluded.{col}' for col in columns)}
+    ''', f'DELETE FROM {table} WHERE id = ?')
+    for table, columns in CHANGE_TABLES.items()
+}
+
+
+def has_change_log(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'changes'").fetchone() is not None
+
+
+def snapshot(source, target_path):
+    """Создать реплику копией источника; вернуть seq, на котором снят снимок"""
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+        last_seq = target.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        target.close()
+    except BaseException:
+        target.close()
+        os.remove(target_path)
+        raise
+    return last_seq
+
+
+class Replicator:
+    """Переносит изменения из базы source_path в реплику target_path"""
+    
+    def __init__(self, source_path, target_path, profile=DEFAULT_PROFILE, batch=REPLICATION_BATCH, name=None):
+        if not os.path.exists(source_path):
+            raise ShopError(f"Нет базы-источника: {source_path}")
+        self.name = name or os.path.abspath(source_path)
+        self.batch = batch
+        self.source = connect(source_path, profile)
+        if not has_change_log(self.source):
+            self.source.close()
+            raise ShopError("В источнике нет журнала изменений: откройте его новой версией программы")
+        self.source.execute('PRAGMA query_only = ON')
+        
+        start_seq = snapshot(self.source, target_path) if not os.path.exists(target_path) else None
+        self.target = connect(target_path, profile)
+        migrate(self.target)
+        if start_seq is not None:
+            self.save_position(start_seq)
+            self.target.commit()
+        self.position = self.target.execute(
+            "SELECT last_seq FROM replication_state WHERE source = ?", (self.name,)).fetchone()
+        if self.position is None:
+            raise ShopError(f"Реплика {target_path} не создана из {self.name}: удалите её, чтобы снять снимок заново")
+        self.position = self.position[0]
+        self.applied = 0
+    
+    def save_position(self, seq):
+        self.target.execute('''
+            INSERT INTO replication_state (source, last_seq, applied_at) VALUES (?, ?, ?)
+            ON CONFLICT (source) DO UPDATE SET last_seq = excluded.last_seq, applied_at = excluded.applied_at
+        ''', (self.name, seq, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    
+    def pending(self):
+        """Сколько изменений источника ещё не применено"""
+        return self.source.execute("SELECT COUNT(*) FROM changes WHERE seq > ?", (self.position,)).fetchone()[0]
+    
+    def lag(self):
+        """Задержка реплики, с: возраст самого старого неприменённого изменения (0 — догнала)"""
+        row = self.source.execute(
+            "SELECT changed_at FROM changes WHERE seq > ? ORDER BY seq LIMIT 1", (self.position,)).fetchone()
+        if row is None:
+            return 0.0
+        changed = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc)
+        return max(0.0, (datetime.now(timezone.utc) - changed).total_seconds())
+    
+    def apply_batch(self):
+        """Применить следующую пачку изменений одной транзакцией; вернуть их число"""
+        rows = self.source.execute('''
+            SELECT seq, table_name, row_id, op, data FROM changes
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        ''', (self.position, self.batch)).fetchall()
+        if not rows:
+            return 0
+        
+        cursor = self.target.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Сводки продаж в SQLite-триггерах не ведутся: заказы, которых коснулась
+            # пачка, вычитаются из сводок до изменений и добавляются после
+            orders = self.touched_orders(cursor, rows)
+            self.apply_sales(cursor, orders, -1)
+            for seq, table, row_id, op, data in rows:
+                upsert, delete = APPLY_SQL[table]
+                if op == 'D':
+                    cursor.execute(delete, (row_id,))
+                else:
+                    image = json.loads(data)
+                    cursor.execute(upsert, [row_id] + [image[col] for col in CHANGE_TABLES[table]])
+            self.apply_sales(cursor, orders, 1)
+            self.save_position(rows[-1][0])
+            self.target.commit()
+        except BaseException:
+            if self.target.in_transaction:
+                self.target.rollback()
+            raise
+        self.position = rows[-1][0]
+        self.applied += len(rows)
+        return len(rows)
+    
+    @staticmethod
+    def touched_orders(cursor, rows):
+        """Номера заказов, чьи строки или строки их позиций меняет пачка (в реплике и в источнике)"""
+        orders, items = set(), []
+        for seq, table, row_id, op, data in rows:
+            if table == 'orders':
+                orders.add(row_id)
+            elif table == 'order_items':
+                orders.add(json.loads(data)['order_id'])
+                items.append(row_id)
+        for i in range(0, len(items), IN_BATCH):
+            batch = items[i:i + IN_BATCH]
+            orders.update(order_id for order_id, in cursor.execute(
+                f"SELECT order_id FROM order_items WHERE id IN ({','.join('?' * len(batch))})", batch))
+        return sorted(order_id for order_id in orders if order_id is not None)
+    
+    @staticmethod
+    def apply_sales(cursor, orders, sign):
+        for order_id in orders:
+            row = cursor.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+            if row is not None and row[0] != CANCELLED_STATUS:
+                apply_order_sales(cursor, order_id, sign)
+    
+    def sync(self):
+        """Применить все накопившиеся изменения; вернуть их число"""
+        total = 0
+        while True:
+            count = self.apply_batch()
+            total += count
+            if count < self.batch:
+                return total
+    
+    def close(self):
+        self.source.close()
+        self.target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help='база салона с журналом изменений')
+    parser.add_argument('target', help='реплика (создаётся снимком, если её нет)')
+    parser.add_argument('--follow', action='store_true', help='не завершаться, переносить новые изменения')
+    parser.add_argument('--interval', type=float, default=REPLICATION_INTERVAL, help='пауза между проверками, с')
+    parser.add_argument('--batch', type=int, default=REPLICATION_BATCH, help='изменений в одной транзакции')
+    parser.add_argument('--name', help='имя источника в replication_state (по умолчанию путь к базе)')
+    parser.add_argument('--db-profile', default=DEFAULT_PROFILE, help='профиль соединений')
+    args = parser.parse_args()
+    
+    try:
+        replicator = Replicator(args.source, args.target, args.db_profile, args.batch, args.name)
+    except ShopError as e:
+        parser.exit(1, f"❌ {e}\n")
+    try:
+        while True:
+            started = time.perf_counter()
+            count = replicator.sync()
+            elapsed = time.perf_counter() - started
+            if count or not args.follow:
+                print(f"Применено {count:,} изменений за {elapsed:.2f} с ({count / max(elapsed, 1e-9):,.0f} в с), "
+                      f"позиция {replicator.position}", flush=True)
+            if not args.follow:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        replicator.close()
+
+
+if __name__ == '__main__':
+    main()
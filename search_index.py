@@ -0,0 +1,161 @@
+# search_index.py
+"""Индекс в памяти для поиска по мере ввода: префиксы слов без обращения к базе"""
+import heapq
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+# Если совпала хотя бы 1/BROAD_SHARE записей, страницу набираем обходом общего порядка
+BROAD_SHARE = 4
+
+
+def tokenize(text):
+    """Слова в нижнем регистре, «ё» сведена к «е»"""
+    return re.findall(r'\w+', text.lower().replace('ё', 'е')) if text else []
+
+
+class PrefixIndex:
+    """Отсортированный словарь слов со списками записей и общий порядок записей.
+    
+    Слово запроса сопоставляется всем словам словаря с таким префиксом
+    (бинарный поиск по диапазону), слова запроса объединяются через И.
+    Результат выдаётся в порядке ключа сортировки, страницами после after.
+    Чтобы не сравнивать строки, у каждой записи есть числовой ранг её места
+    в общем порядке: новая запись получает середину между соседями.
+    Методы можно вызывать из разных потоков.
+    """
+    
+    def __init__(self):
+        self.words = []       # отсортированные различные слова
+        self.postings = {}    # слово -> множество id
+        self.docs = {}        # id -> (ключ сортировки, слова)
+        self.order = []       # отсортированные (ключ сортировки, id)
+        self.rank = {}        # id -> число, возрастающее вместе с order
+        self.lock = threading.Lock()
+    
+    def load(self, rows):
+        """Заполнить индекс строками (id, ключ сортировки, поля...) за один проход"""
+        with self.lock:
+            for doc_id, sort_key, *fields in rows:
+                words = self.doc_words(fields)
+                self.docs[doc_id] = (sort_key, words)
+                self.order.append((sort_key, doc_id))
+                for word in words:
+                    self.postings.setdefault(word, set()).add(doc_id)
+            self.order.sort()
+            self.renumber()
+            self.words = sorted(self.postings)
+    
+    @staticmethod
+    def doc_words(fields):
+        """Слова записи; у полей из цифр с разделителями (телефон) ещё и все цифры подряд"""
+        words = set()
+        for field in fields:
+            words.update(tokenize(field))
+            if field and re.fullmatch(r'[\d\s()+\-]+', field):
+                words.add(re.sub(r'\D', '', field))
+        words.discard('')
+        return words
+    
+    def renumber(self):
+        """Раздать ранги заново с равным шагом"""
+        self.rank = {doc_id: float(i) for i, (sort_key, doc_id) in enumerate(self.order)}
+    
+    def add(self, doc_id, sort_key, *fields):
+        """Добавить или заменить запись"""
+        with self.lock:
+            self._remove(doc_id)
+            words = self.doc_words(fields)
+            self.docs[doc_id] = (sort_key, words)
+            self.insert_order((sort_key, doc_id))
+            for word in words:
+                posting = self.postings.get(word)
+                if posting is None:
+                    posting = self.postings[word] = set()
+                    self.words.insert(bisect_left(self.words, word), word)
+                posting.add(doc_id)
+    
+    def insert_order(self, key):
+        """Вставить запись в общий порядок и выдать ей ранг между соседями"""
+        pos = bisect_left(self.order, key)
+        self.order.insert(pos, key)
+        prev = self.rank[self.order[pos - 1][1]] if pos > 0 else None
+        following = self.rank[self.order[pos + 1][1]] if pos + 1 < len(self.order) else None
+        if prev is None and following is None:
+            rank = 0.0
+        elif following is None:
+            rank = prev + 1
+        elif prev is None:
+            rank = following - 1
+        else:
+            rank = (prev + following) / 2
+        if rank in (prev, following):
+            # Между соседями не осталось чисел — перенумеровываем всё
+            self.renumber()
+        else:
+            self.rank[key[1]] = rank
+    
+    def remove(self, doc_id):
+        """Удалить запись, если она есть"""
+        with self.lock:
+            self._remove(doc_id)
+    
+    def _remove(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        sort_key, words = doc
+        del self.order[bisect_left(self.order, (sort_key, doc_id))]
+        del self.rank[doc_id]
+        for word in words:
+            posting = self.postings[word]
+            posting.discard(doc_id)
+            if not posting:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+    
+    def matches(self, prefix):
+        """Множество id записей, у которых есть слово с этим префиксом"""
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + '\uffff', start)
+        if end - start == 1:
+            return set(self.postings[self.words[start]])
+        result = set()
+        for word in self.words[start:end]:
+            result |= self.postings[word]
+        return result
+    
+    def search(self, text, after=None, limit=None):
+        """id записей со всеми словами запроса, по ключу сортировки после after=(ключ, id)"""
+        with self.lock:
+            start = bisect_right(self.order, after) if after is not None else 0
+            prefixes = sorted(set(tokenize(text)), key=len, reverse=True)
+            if not prefixes:
+                stop = None if limit is None else start + limit
+                return [doc_id for sort_key, doc_id in islice(self.order, start, stop)]
+            if start >= len(self.order):
+                return []
+            
+            # Начинаем с самого длинного префикса — у него обычно меньше всего совпадений
+            found = self.matches(prefixes[0])
+            for prefix in prefixes[1:]:
+                if not found:
+                    break
+                found &= self.matches(prefix)
+            
+            if limit is not None and len(found) * BROAD_SHARE >= len(self.order):
+                # Совпадает большая часть записей — страница набирается за короткий обход
+                matched = (doc_id for sort_key, doc_id in islice(self.order, start, None) if doc_id in found)
+                return list(islice(matched, limit))
+            
+            rank = self.rank.__getitem__
+            if start:
+                floor = rank(self.order[start][1])
+                found = [doc_id for doc_id in found if rank(doc_id) >= floor]
+            if limit is None:
+                return sorted(found, key=rank)
+            return heapq.nsmallest(limit, found, key=rank)
+    
+    def __len__(self):
+        return len(self.docs)
@@ -0,0 +1,435 @@
+# server.py
+"""HTTP/JSON API магазина для веб- и мобильных касс на asyncio из стандартной библиотеки
+
+Запуск: python app.py serve [--host 127.0.0.1] [--port 8080] [--readers 4] [--db furniture_shop.db]
+Чтения выполняются параллельно в пуле потоков, у каждого своё соединение;
+все изменения идут через GroupCommitWriter — единственное пишущее соединение,
+которое фиксирует одновременные заказы общими транзакциями, поэтому кассы не
+спорят за блокировку записи SQLite. Заказ записывается тем же
+OrderService.add_order, что и при кнопке «Оформить заказ».
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from database import DB_PATH, DEFAULT_PROFILE, connect, has_search_index, migrate
+from services import (ORDER_STATUSES, PAGE_SIZE, PAYMENT_METHODS, OrderService, OutOfStockError, ShopError,
+                      ShopRepository, available_to_promise, fts_query)
+from writer import GroupCommitWriter
+
+# Соединений (и потоков) для чтения
+READERS = 4
+
+# Строк на странице ответа, если клиент не указал limit
+DEFAULT_LIMIT = 50
+
+# Наибольшее тело запроса, байт
+MAX_BODY = 1 << 20
+
+PRODUCT_FIELDS = ('id', 'name', 'price', 'stock', 'category', 'material', 'color')
+CUSTOMER_FIELDS = ('id', 'first_name', 'last_name', 'phone', 'email',
+                   'orders', 'lifetime_value', 'last_order', 'favourite_category')
+CATEGORY_FIELDS = ('id', 'name', 'product_count', 'total_stock', 'stock_value')
+ORDER_FIELDS = ('id', 'order_date', 'customer', 'total_amount', 'status', 'payment_method')
+ORDER_ITEM_FIELDS = ('product', 'quantity', 'price_per_unit', 'subtotal')
+
+logger = logging.getLogger('furniture_shop.server')
+
+
+class HttpError(Exception):
+    """Ответ с кодом ошибки и текстом для клиента"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Потоки со своими соединениями к базе; задачи ставятся в общую очередь пула"""
+    
+    def __init__(self, db_path, profile, size, name):
+        self.db_path = db_path
+        self.profile = profile
+        self.executor = ThreadPoolExecutor(size, thread_name_prefix=name)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+    
+    def connection(self):
+        """Соединение текущего потока пула"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = connect(self.db_path, self.profile, check_same_thread=False)
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+    
+    async def run(self, task):
+        """Выполнить task(conn) в потоке пула и дождаться результата"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: task(self.connection()))
+    
+    def close(self):
+        self.executor.shutdown()
+        for conn in self.connections:
+            conn.close()
+
+
+def encode_cursor(row):
+    """Ключ следующей страницы: последняя строка в виде строки для URL"""
+    return base64.urlsafe_b64encode(json.dumps(list(row), ensure_ascii=False).encode()).decode()
+
+
+def decode_cursor(text, fields, keys):
+    """Строка из ключа страницы: fields столбцов, keys — {номер столбца ключа: допустимые типы}"""
+    try:
+        row = json.loads(base64.urlsafe_b64decode(text.encode()))
+    except ValueError:
+        row = None
+    if (not isinstance(row, list) or len(row) != len(fields)
+            or any(isinstance(row[index], bool) or not isinstance(row[index], kind) for index, kind in keys.items())):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Неверный параметр after")
+    return row
+
+
+def as_dicts(fields, rows):
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def limit_param(query):
+    """Размер страницы из ?limit=, не больше PAGE_SIZE"""
+    try:
+        limit = int(query.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "limit должен быть числом")
+    return max(1, min(limit, PAGE_SIZE))
+
+
+def date_param(query, name):
+    """Дата ГГГГ-ММ-ДД из параметра запроса или None"""
+    text = query.get(name)
+    if not text:
+        return None
+    try:
+        datetime.strptime(text, '%Y-%m-%d')
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} должен быть датой ГГГГ-ММ-ДД")
+    return text
+
+
+def require(body, name, kind, optional=False):
+    """Поле тела запроса нужного типа"""
+    value = body.get(name)
+    if value is None and optional:
+        return None
+    if not isinstance(value, kind) or isinstance(value, bool) or value == '':
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Поле {name} не заполнено или имеет неверный тип")
+    return value
+
+
+class ShopApi:
+    """Обработчики маршрутов API поверх пула чтения и пишущей очереди"""
+    
+    def __init__(self, db_path=DB_PATH, profile=DEFAULT_PROFILE, readers=READERS):
+        conn = connect(db_path, profile)
+        migrate(conn)
+        self.fts_enabled = has_search_index(conn.cursor())
+        conn.close()
+        self.reads = ConnectionPool(db_path, profile, readers, 'db-read')
+        self.writer = GroupCommitWriter(db_path, profile)
+        # (метод, шаблон пути, обработчик); числа из пути передаются обработчику
+        self.routes = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in [
+            ('GET', r'/api/health', self.health),
+            ('GET', r'/api/products', self.list_products),
+            ('GET', r'/api/products/(\d+)', self.get_product),
+            ('GET', r'/api/categories', self.list_categories),
+            ('GET', r'/api/customers', self.list_customers),
+            ('POST', r'/api/customers', self.add_customer),
+            ('GET', r'/api/customers/(\d+)', self.get_customer),
+            ('GET', r'/api/orders', self.list_orders),
+            ('POST', r'/api/orders', self.place_order),
+            ('GET', r'/api/orders/(\d+)', self.get_order),
+            ('PATCH', r'/api/orders/(\d+)', self.set_order_status),
+        ]]
+    
+    def read(self, task):
+        """Выполнить task(repo) на соединении для чтения"""
+        return self.reads.run(lambda conn: task(ShopRepository(conn, fts_enabled=self.fts_enabled)))
+    
+    def write(self, mutation):
+        """Выполнить mutation(conn) в очереди писателя и дождаться фиксации"""
+        return asyncio.wrap_future(self.writer.submit(mutation))
+    
+    def close(self):
+        self.reads.close()
+        self.writer.close()
+    
+    async def dispatch(self, method, target, body):
+        """Обработать запрос; вернуть (код, объект JSON)"""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return HTTPStatus.BAD_REQUEST, {'error': "Тело запроса должно быть объектом JSON"}
+            try:
+                return await handler(query, data, *map(int, match.groups()))
+            except HttpError as e:
+                return e.status, {'error': str(e)}
+            except OutOfStockError as e:
+                lines = [{'product_id': product_id, 'requested': need, 'available': available}
+                         for product_id, need, available in e.lines]
+                return HTTPStatus.CONFLICT, {'error': str(e), 'lines': lines}
+            except ShopError as e:
+                return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+            except sqlite3.IntegrityError as e:
+                return HTTPStatus.CONFLICT, {'error': str(e)}
+            except Exception:
+                logger.exception("Ошибка обработки %s %s", method, target)
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Внутренняя ошибка сервера"}
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Метод не поддерживается"}
+        return HTTPStatus.NOT_FOUND, {'error': "Нет такого адреса"}
+    
+    # ========== ЧТЕНИЕ ==========
+    
+    async def health(self, query, body):
+        return HTTPStatus.OK, {'status': 'ok'}
+    
+    async def list_products(self, query, body):
+        """Страница товаров: ?q= поиск, ?category= фильтр, ?after= ключ из next"""
+        limit = limit_param(query)
+        text, category = query.get('q'), query.get('category')
+        after = None
+        if 'after' in query:
+            if text and self.fts_enabled and fts_query(text):
+                # Найденные через FTS5 идут по (релевантность, id) и несут релевантность восьмым столбцом
+                after = decode_cursor(query['after'], PRODUCT_FIELDS + ('rank',), {0: int, 7: (int, float)})
+            else:
+                after = decode_cursor(query['after'], PRODUCT_FIELDS, {0: int, 1: str})
+        
+        def fetch(repo):
+            if text:
+                return repo.search_products(text, after, limit, category).fetchall()
+            return repo.list_products(after, limit, category).fetchall()
+        
+        rows = await self.read(fetch)
+        return HTTPStatus.OK, {'items': as_dicts(PRODUCT_FIELDS, rows),
+                               'next': encode_cursor(rows[-1]) if len(rows) == limit else None}
+    
+    async def get_product(self, query, body, product_id):
+        """Товар и available — сколько можно продать с учётом резервов в корзинах касс"""
+        row, available = await self.read(lambda repo: (
+            repo.get_product(product_id), available_to_promise(repo.conn, [product_id]).get(product_id, 0)))
+        if row is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Товар {product_id} не найден")
+        return HTTPStatus.OK, dict(zip(PRODUCT_FIELDS, row), available=max(0, available))
+    
+    async def list_categories(self, query, body):
+        rows = await self.read(lambda repo: repo.list_categories().fetchall())
+        return HTTPStatus.OK, {'items': as_dicts(CATEGORY_FIELDS, rows)}
+    
+    async def list_customers(self, query, body):
+        """Клиенты по фамилии или найденные по ?q="""
+        limit, text = limit_param(query), query.get('q')
+        rows = await self.read(
+            lambda repo: (repo.search_customers(text) if text else repo.list_customers()).fetchmany(limit))
+        return HTTPStatus.OK, {'items': as_dicts(CUSTOMER_FIELDS, rows)}
+    
+    async def get_customer(self, query, body, customer_id):
+        row = await self.read(lambda repo: repo.get_customer(customer_id))
+        if row is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Клиент {customer_id} не найден")
+        return HTTPStatus.OK, dict(zip(CUSTOMER_FIELDS, row))
+    
+    async def list_orders(self, query, body):
+        """Страница заказов от новых к старым: ?status=, период ?from=&to=, ?after= ключ из next"""
+        limit, status = limit_param(query), query.get('status')
+        start, end = date_param(query, 'from'), date_param(query, 'to')
+        after = decode_cursor(query['after'], ORDER_FIELDS, {0: int}) if 'after' in query else None
+        rows = await self.read(lambda repo: repo.list_orders(status, start, end, after, limit).fetchall())
+        return HTTPStatus.OK, {'items': as_dicts(ORDER_FIELDS, rows),
+                               'next': encode_cursor(rows[-1]) if len(rows) == limit else None}
+    
+    async def get_order(self, query, body, order_id):
+        def fetch(repo):
+            row = repo.get_order(order_id)
+            return row, repo.order_items(order_id) if row else []
+        
+        row, items = await self.read(fetch)
+        if row is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Заказ {order_id} не найден")
+        return HTTPStatus.OK, {**dict(zip(ORDER_FIELDS, row)), 'items': as_dicts(ORDER_ITEM_FIELDS, items)}
+    
+    # ========== ИЗМЕНЕНИЯ ==========
+    
+    async def add_customer(self, query, body):
+        values = [require(body, 'first_name', str), require(body, 'last_name', str),
+                  require(body, 'phone', str, optional=True), require(body, 'email', str, optional=True)]
+        customer_id = await self.write(
+            lambda conn: ShopRepository(conn, autocommit=False).add_customer(*values))
+        return HTTPStatus.CREATED, {'id': customer_id}
+    
+    async def place_order(self, query, body):
+        """Оформить заказ {customer_id, payment_method, items: [{product_id, quantity}]} по текущим ценам"""
+        customer_id = require(body, 'customer_id', int)
+        payment = require(body, 'payment_method', str)
+        if payment not in PAYMENT_METHODS:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Способ оплаты: {', '.join(PAYMENT_METHODS)}")
+        lines = require(body, 'items', list)
+        if not lines:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "В заказе нет товаров")
+        cart = []
+        for line in lines:
+            if not isinstance(line, dict):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Строка заказа должна быть объектом")
+            quantity = require(line, 'quantity', int)
+            if quantity <= 0:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Количество должно быть больше нуля")
+            cart.append({'id': require(line, 'product_id', int), 'quantity': quantity})
+        
+        def place(conn):
+            # Цены берутся из базы в той же транзакции записи, а не от клиента
+            repo = ShopRepository(conn, autocommit=False)
+            if repo.get_customer(customer_id) is None:
+                raise HttpError(HTTPStatus.NOT_FOUND, f"Клиент {customer_id} не найден")
+            products = {row[0]: row for row in repo.products_by_ids({item['id'] for item in cart})}
+            for item in cart:
+                product = products.get(item['id'])
+                if product is None:
+                    raise HttpError(HTTPStatus.NOT_FOUND, f"Товар {item['id']} не найден")
+                item['name'], item['price'] = product[1], product[2]
+            order_id = OrderService(conn).add_order(conn.cursor(), customer_id, cart, payment)
+            return order_id, sum(item['quantity'] * item['price'] for item in cart)
+        
+        order_id, total = await self.write(place)
+        return HTTPStatus.CREATED, {'id': order_id, 'total_amount': total}
+    
+    async def set_order_status(self, query, body, order_id):
+        status = require(body, 'status', str)
+        if status not in ORDER_STATUSES:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Статус: {', '.join(ORDER_STATUSES)}")
+        
+        def update(conn):
+            # Без JOIN клиентов: заказ удалённого клиента тоже существует
+            if conn.execute("SELECT 1 FROM orders WHERE id = ?", (order_id,)).fetchone() is None:
+                raise HttpError(HTTPStatus.NOT_FOUND, f"Заказ {order_id} не найден")
+            OrderService(conn).change_status(conn.cursor(), order_id, status)
+        
+        await self.write(update)
+        return HTTPStatus.OK, {'id': order_id, 'status': status}
+
+
+class ShopServer:
+    """HTTP/1.1 с keep-alive поверх asyncio.start_server: тело и ответ — JSON"""
+    
+    def __init__(self, api):
+        self.api = api
+    
+    async def handle(self, reader, writer):
+        """Обслужить соединение клиента: запросы по одному, пока он его не закроет"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # Некоторые клиенты шлют адрес в UTF-8 без %-кодирования
+                method, target, version = request_line.decode('utf-8', 'replace').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                       {'error': "Слишком большой запрос"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.api.dispatch(method, target, body)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Клиент оборвал соединение или прислал не HTTP
+            pass
+        finally:
+            writer.close()
+    
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+    
+    async def serve(self, host, port, ready=None):
+        """Принимать соединения до отмены; ready(порт) вызывается, когда сокет открыт"""
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
+def serve(db_path=DB_PATH, host='127.0.0.1', port=8080, readers=READERS, profile=DEFAULT_PROFILE):
+    """Запустить API и обслуживать запросы до Ctrl+C"""
+    api = ShopApi(db_path, profile, readers)
+    
+    def ready(bound_port):
+        print(f"API магазина: http://{host}:{bound_port}/api/products (база {db_path}, Ctrl+C — остановить)",
+              flush=True)
+    
+    try:
+        asyncio.run(ShopServer(api).serve(host, port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+
+
+def add_server_arguments(parser):
+    """Параметры сервера — общие для python server.py и python app.py serve"""
+    parser.add_argument('--db', default=DB_PATH, help='файл базы')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес (0.0.0.0 — для всех интерфейсов)')
+    parser.add_argument('--port', type=int, default=8080, help='порт (0 — любой свободный)')
+    parser.add_argument('--readers', type=int, default=READERS, help='соединений для чтения')
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__.splitlines()[0])
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(message)s')
+    serve(args.db, args.host, args.port, args.readers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,767 @@
+# services.py
+"""Бизнес-операции магазина без привязки к интерфейсу"""
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from database import CANCELLED_STATUS, CUSTOMERS_QUERY, ORDERS_QUERY, PRODUCTS_QUERY, apply_order_sales, has_search_index
+
+# Размер страницы по умолчанию
+PAGE_SIZE = 200
+
+# Сколько id подставлять в один запрос IN (...)
+IN_BATCH = 500
+
+ORDER_STATUSES = ['Новый', 'В обработке', 'Доставлен', 'Отменен']
+
+PAYMENT_METHODS = ['Наличные', 'Карта']
+
+# Сколько товаров держать в кэше; вытесняются давно не использованные
+PRODUCT_CACHE_SIZE = 20000
+
+# Сколько секунд держится резерв товара в корзине после её последнего изменения
+RESERVATION_TTL = 15 * 60
+
+# Остаток товаров за вычетом действующих резервов других корзин (idx_reservations_product)
+AVAILABLE_SQL = '''
+    SELECT p.id, p.stock - COALESCE((
+        SELECT SUM(r.quantity) FROM reservations r
+        WHERE r.product_id = p.id AND r.expires_at > ? AND r.cart IS NOT ?
+    ), 0)
+    FROM products p
+    WHERE p.id IN ({})
+'''
+
+
+def available_to_promise(conn, product_ids, cart=None):
+    """Доступно к продаже корзине cart: {product_id: остаток − резервы других корзин}.
+    
+    Без cart вычитаются резервы всех корзин — так продаёт касса без корзины (HTTP API).
+    Значение может быть отрицательным, если остаток уменьшили после резервирования.
+    """
+    product_ids, now, available = list(product_ids), time.time(), {}
+    for i in range(0, len(product_ids), IN_BATCH):
+        batch = product_ids[i:i + IN_BATCH]
+        available.update(conn.execute(AVAILABLE_SQL.format(','.join('?' * len(batch))), [now, cart] + batch))
+    return available
+
+
+def customer_email(email):
+    """Email для колонки customers.email: пустой — NULL, иначе UNIQUE не пустит второго клиента без почты"""
+    return (email or '').strip() or None
+
+
+def fts_query(text):
+    """Запрос MATCH: каждое слово ищется по префиксу, слова объединяются через И"""
+    words = re.findall(r'\w+', text.replace('ё', 'е').replace('Ё', 'Е'))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class ShopError(Exception):
+    """Операция нарушает правила магазина; текст можно показать пользователю"""
+
+
+class OutOfStockError(ShopError):
+    """Недостаточно товара на складе для части строк заказа"""
+    
+    def __init__(self, lines):
+        # lines: [(product_id, запрошено, доступно)]
+        self.lines = lines
+        super().__init__(', '.join(f"товар {product_id}: нужно {need}, доступно {available}"
+                                   for product_id, need, available in lines))
+
+
+class Product:
+    """Товар каталога с типизированными полями (строка PRODUCTS_QUERY)"""
+    
+    __slots__ = ('id', 'name', 'price', 'stock', 'category', 'material', 'color')
+    
+    def __init__(self, product_id, name, price, stock, category, material, color):
+        self.id = product_id
+        self.name = name
+        self.price = price
+        self.stock = stock
+        self.category = category
+        self.material = material
+        self.color = color
+    
+    @classmethod
+    def from_row(cls, row):
+        """Товар из строки запроса; лишние столбцы (например, релевантность) игнорируются"""
+        return cls(*row[:7])
+
+
+class ProductCache:
+    """Товары по id, заполняется строками запросов каталога.
+    
+    Если товара нет в кэше (вытеснен или ещё не загружался), он читается
+    из базы одним запросом по первичному ключу.
+    """
+    
+    def __init__(self, repo, max_size=PRODUCT_CACHE_SIZE):
+        self.repo = repo
+        self.max_size = max_size
+        self.products = OrderedDict()
+    
+    def put(self, row):
+        """Запомнить товар из строки запроса и вернуть его"""
+        product = Product.from_row(row)
+        self.products[product.id] = product
+        self.products.move_to_end(product.id)
+        if len(self.products) > self.max_size:
+            self.products.popitem(last=False)
+        return product
+    
+    def get(self, product_id):
+        """Товар по id или None, если его больше нет в базе"""
+        product = self.products.get(product_id)
+        if product is not None:
+            self.products.move_to_end(product_id)
+            return product
+        row = self.repo.get_product(product_id)
+        return self.put(row) if row is not None else None
+    
+    def refresh(self, product_id):
+        """Перечитать товар из базы после изменения; None, если он удалён"""
+        self.discard(product_id)
+        return self.get(product_id)
+    
+    def discard(self, product_id):
+        """Забыть товар (удалён или изменён, пока не показан)"""
+        self.products.pop(product_id, None)
+    
+    def __contains__(self, product_id):
+        return product_id in self.products
+    
+    def __len__(self):
+        return len(self.products)
+
+
+class ShopRepository:
+    """Чтение и изменение товаров, категорий, клиентов и заказов.
+    
+    Методы списков возвращают курсор, чтобы строки можно было читать
+    частями. Постраничные методы принимают after — последнюю строку
+    предыдущей страницы (keyset-пагинация). С autocommit=False изменения
+    не фиксируются — так их выполняет GroupCommitWriter внутри своей транзакции.
+    """
+    
+    def __init__(self, conn, fts_enabled=None, autocommit=True):
+        self.conn = conn
+        self._fts_enabled = fts_enabled
+        self.autocommit = autocommit
+    
+    @property
+    def fts_enabled(self):
+        """Есть ли в базе полнотекстовый индекс (иначе поиск через LIKE)"""
+        if self._fts_enabled is None:
+            self._fts_enabled = has_search_index(self.conn.cursor())
+        return self._fts_enabled
+    
+    def commit(self):
+        """Зафиксировать изменение, если репозиторий сам управляет транзакциями"""
+        if self.autocommit:
+            self.conn.commit()
+    
+    def rows_by_ids(self, sql, ids):
+        """Строки запроса sql с «IN ({})» по id (первый столбец) в порядке ids, пачками"""
+        ids = list(ids)
+        for i in range(0, len(ids), IN_BATCH):
+            batch = ids[i:i + IN_BATCH]
+            rows = {row[0]: row for row in self.conn.execute(sql.format(','.join('?' * len(batch))), batch)}
+            yield from (rows[row_id] for row_id in batch if row_id in rows)
+    
+    def add_test_data(self):
+        """Добавление тестовых данных в пустую базу"""
+        cursor = self.conn.cursor()
+        # Категории
+        cursor.execute("SELECT COUNT(*) FROM categories")
+        if cursor.fetchone()[0] == 0:
+            categories = ['Диваны', 'Кресла', 'Столы', 'Стулья', 'Шкафы', 'Кровати', 'Матрасы', 'Комоды']
+            cursor.executemany("INSERT INTO categories (name) VALUES (?)", [(cat,) for cat in categories])
+        
+        # Товары
+        cursor.execute("SELECT COUNT(*) FROM products")
+        if cursor.fetchone()[0] == 0:
+            products = [
+                ('Диван "Комфорт"', 45000, 5, 1, 'Ткань, дерево', 'Бежевый', 'Мягкий удобный диван'),
+                ('Диван "Престиж"', 65000, 3, 1, 'Кожа, дерево', 'Коричневый', 'Кожаный диван'),
+                ('Диван "Маленький"', 25000, 7, 1, 'Ткань', 'Серый', 'Компактный диван'),
+                ('Кресло "Релакс"', 15000, 8, 2, 'Ткань, металл', 'Серый', 'Удобное кресло'),
+                ('Кресло-качалка', 18000, 4, 2, 'Дерево', 'Натуральный', 'Для уюта'),
+                ('Стол обеденный', 25000, 4, 3, 'Дерево', 'Дуб', 'Большой стол'),
+                ('Стол компьютерный', 12000, 6, 3, 'ЛДСП', 'Белый', 'С полками'),
+                ('Стул деревянный', 5000, 15, 4, 'Дерево', 'Натуральный', 'Удобный стул'),
+                ('Стул мягкий', 7000, 10, 4, 'Ткань, металл', 'Синий', 'С подлокотниками'),
+                ('Шкаф-купе', 55000, 2, 5, 'ЛДСП', 'Белый', 'Вместительный шкаф'),
+                ('Шкаф для одежды', 35000, 3, 5, 'Дерево', 'Венге', 'С зеркалом'),
+                ('Кровать двуспальная', 35000, 3, 6, 'Дерево', 'Венге', 'Спальная кровать'),
+                ('Кровать односпальная', 18000, 5, 6, 'Металл', 'Белый', 'Для подростка'),
+                ('Матрас ортопедический', 15000, 8, 7, 'Пена', 'Белый', 'Жесткий'),
+                ('Матрас мягкий', 10000, 6, 7, 'Пружины', 'Бежевый', 'Мягкий'),
+                ('Комод', 22000, 4, 8, 'Дерево', 'Дуб', '6 ящиков')
+            ]
+            cursor.executemany('''
+                INSERT INTO products (name, price, stock, category_id, material, color, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', products)
+        
+        # Клиенты
+        cursor.execute("SELECT COUNT(*) FROM customers")
+        if cursor.fetchone()[0] == 0:
+            customers = [
+                ('Иван', 'Петров', '+7 (999) 123-45-67', 'ivan@mail.com'),
+                ('Мария', 'Иванова', '+7 (999) 765-43-21', 'maria@mail.com'),
+                ('Петр', 'Сидоров', '+7 (999) 555-55-55', 'petr@mail.com'),
+                ('Анна', 'Козлова', '+7 (999) 111-22-33', 'anna@mail.com'),
+                ('Сергей', 'Смирнов', '+7 (999) 444-55-66', 'sergey@mail.com'),
+                ('Елена', 'Попова', '+7 (999) 777-88-99', 'elena@mail.com')
+            ]
+            cursor.executemany('''
+                INSERT INTO customers (first_name, last_name, phone, email)
+                VALUES (?, ?, ?, ?)
+            ''', customers)
+        
+        self.commit()
+    
+    # ========== ТОВАРЫ ==========
+    
+    def list_products(self, after=None, limit=PAGE_SIZE, category=None):
+        """Страница товаров по (name, id), при необходимости — одной категории"""
+        conditions, args = [], []
+        if category is not None:
+            conditions.append('c.name = ?')
+            args.append(category)
+        if after is not None:
+            conditions.append('(p.name, p.id) > (?, ?)')
+            args += [after[1], after[0]]
+        
+        sql = PRODUCTS_QUERY
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY p.name, p.id LIMIT ?'
+        args.append(limit)
+        return self.conn.execute(sql, args)
+    
+    def search_products(self, text, after=None, limit=PAGE_SIZE, category=None):
+        """Страница найденных товаров: по релевантности, а без FTS5 — по названию"""
+        if not self.fts_enabled:
+            pattern = f'%{text}%'
+            sql = PRODUCTS_QUERY + '''
+                WHERE (p.name LIKE ? OR p.material LIKE ? OR p.color LIKE ? OR p.description LIKE ?)
+            '''
+            args = [pattern, pattern, pattern, pattern]
+            if category is not None:
+                sql += ' AND c.name = ?'
+                args.append(category)
+            if after is not None:
+                sql += ' AND (p.name, p.id) > (?, ?)'
+                args += [after[1], after[0]]
+            sql += ' ORDER BY p.name, p.id LIMIT ?'
+            args.append(limit)
+            return self.conn.execute(sql, args)
+        
+        match = fts_query(text)
+        if not match:
+            return self.list_products(after, limit, category)
+        
+        # Восьмой столбец — релевантность, по ней и id строится ключ страницы
+        sql = '''
+            SELECT p.id, p.name, p.price, p.stock, c.name, p.material, p.color, f.rank
+            FROM products_fts f
+            JOIN products p ON p.id = f.rowid
+            LEFT JOIN categories c ON p.category_id = c.id
+            WHERE products_fts MATCH ?
+        '''
+        args = [match]
+        if category is not None:
+            sql += ' AND c.name = ?'
+            args.append(category)
+        if after is not None:
+            sql += ' AND (f.rank, p.id) > (?, ?)'
+            args += [after[7], after[0]]
+        sql += ' ORDER BY f.rank, p.id LIMIT ?'
+        args.append(limit)
+        return self.conn.execute(sql, args)
+    
+    def get_product(self, product_id):
+        """Строка одного товара или None"""
+        return self.conn.execute(PRODUCTS_QUERY + ' WHERE p.id = ?', (product_id,)).fetchone()
+    
+    def products_by_ids(self, product_ids):
+        """Строки товаров в порядке product_ids"""
+        return self.rows_by_ids(PRODUCTS_QUERY + ' WHERE p.id IN ({})', product_ids)
+    
+    def product_search_fields(self):
+        """Строки для индекса поиска по мере ввода: id, ключ сортировки, поля"""
+        return self.conn.execute("SELECT id, name, name, material, color FROM products")
+    
+    def add_product(self, name, price, stock, category, material, color, description):
+        """Добавить товар в категорию с названием category, вернуть его id"""
+        row = self.conn.execute("SELECT id FROM categories WHERE name=?", (category,)).fetchone()
+        if row is None:
+            raise ShopError(f"Категория '{category}' не найдена")
+        
+        cursor = self.conn.execute('''
+            INSERT INTO products (name, price, stock, category_id, material, color, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (name, price, stock, row[0], material, color, description))
+        self.commit()
+        return cursor.lastrowid
+    
+    def update_product(self, product_id, name, price, stock, material, color):
+        """Изменить товар"""
+        self.conn.execute('''
+            UPDATE products
+            SET name=?, price=?, stock=?, material=?, color=?
+            WHERE id=?
+        ''', (name, price, stock, material, color, product_id))
+        self.commit()
+    
+    def delete_product(self, product_id):
+        """Удалить товар"""
+        self.conn.execute("DELETE FROM products WHERE id=?", (product_id,))
+        self.commit()
+    
+    # ========== КАТЕГОРИИ ==========
+    
+    def list_categories(self):
+        """Категории со сводкой: число товаров, остаток на складе, стоимость запаса"""
+        return self.conn.execute('''
+            SELECT c.id, c.name, s.product_count, s.total_stock, s.stock_value
+            FROM categories c
+            JOIN category_stats s ON s.category_id = c.id
+            ORDER BY c.name
+        ''')
+    
+    def category_names(self):
+        """Названия категорий по алфавиту"""
+        return [row[0] for row in self.conn.execute("SELECT name FROM categories ORDER BY name")]
+    
+    def add_category(self, name):
+        """Добавить категорию, вернуть её id"""
+        try:
+            cursor = self.conn.execute("INSERT INTO categories (name) VALUES (?)", (name,))
+        except sqlite3.IntegrityError:
+            raise ShopError("Такая категория уже существует")
+        self.commit()
+        return cursor.lastrowid
+    
+    def can_delete_category(self, category_id):
+        """В категории нет товаров"""
+        row = self.conn.execute("SELECT product_count FROM category_stats WHERE category_id=?",
+                                (category_id,)).fetchone()
+        return row is None or row[0] == 0
+    
+    def delete_category(self, category_id):
+        """Удалить категорию, если в ней нет товаров"""
+        if not self.can_delete_category(category_id):
+            raise ShopError("Нельзя удалить категорию с товарами")
+        self.conn.execute("DELETE FROM categories WHERE id=?", (category_id,))
+        self.commit()
+    
+    # ========== КЛИЕНТЫ ==========
+    
+    def list_customers(self):
+        """Все клиенты по фамилии со сводкой покупок (CUSTOMERS_QUERY)"""
+        return self.conn.execute(CUSTOMERS_QUERY + ' ORDER BY c.last_name')
+    
+    def search_customers(self, text):
+        """Найденные клиенты: по релевантности, а без FTS5 — по фамилии"""
+        if not self.fts_enabled:
+            pattern = f'%{text}%'
+            return self.conn.execute(CUSTOMERS_QUERY + '''
+                WHERE c.first_name LIKE ? OR c.last_name LIKE ? OR c.phone LIKE ? OR c.email LIKE ?
+                ORDER BY c.last_name
+            ''', (pattern, pattern, pattern, pattern))
+        
+        match = fts_query(text)
+        if not match:
+            return self.list_customers()
+        
+        return self.conn.execute(CUSTOMERS_QUERY + '''
+            JOIN customers_fts f ON f.rowid = c.id
+            WHERE customers_fts MATCH ?
+            ORDER BY f.rank
+        ''', (match,))
+    
+    def get_customer(self, customer_id):
+        """Строка одного клиента со сводкой покупок или None"""
+        return self.conn.execute(CUSTOMERS_QUERY + ' WHERE c.id = ?', (customer_id,)).fetchone()
+    
+    def customers_by_ids(self, customer_ids):
+        """Строки клиентов в порядке customer_ids"""
+        return self.rows_by_ids(CUSTOMERS_QUERY + ' WHERE c.id IN ({})', customer_ids)
+    
+    def customer_categories(self, customer_id):
+        """Покупки клиента по категориям: (категория, единиц, сумма), сначала самые крупные"""
+        return self.conn.execute('''
+            SELECT k.name, s.units, s.revenue
+            FROM customer_category_sales s
+            LEFT JOIN categories k ON k.id = s.category_id
+            WHERE s.customer_id = ? AND s.units > 0
+            ORDER BY s.revenue DESC
+        ''', (customer_id,))
+    
+    def customer_orders(self, customer_id, limit=20):
+        """Последние заказы клиента: (id, дата, сумма, статус, оплата), новые первыми"""
+        return self.conn.execute('''
+            SELECT id, order_date, total_amount, status, payment_method
+            FROM orders
+            WHERE customer_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (customer_id, limit))
+    
+    def customer_search_fields(self):
+        """Строки для индекса поиска по мере ввода: id, ключ сортировки, поля"""
+        return self.conn.execute("SELECT id, last_name, first_name, last_name, phone, email FROM customers")
+    
+    def add_customer(self, first_name, last_name, phone, email):
+        """Добавить клиента, вернуть его id"""
+        cursor = self.conn.execute('''
+            INSERT INTO customers (first_name, last_name, phone, email)
+            VALUES (?, ?, ?, ?)
+        ''', (first_name, last_name, phone, customer_email(email)))
+        self.commit()
+        return cursor.lastrowid
+    
+    def update_customer(self, customer_id, first_name, last_name, phone, email):
+        """Изменить данные клиента"""
+        self.conn.execute('''
+            UPDATE customers
+            SET first_name=?, last_name=?, phone=?, email=?
+            WHERE id=?
+        ''', (first_name, last_name, phone, customer_email(email), customer_id))
+        self.commit()
+    
+    def delete_customer(self, customer_id):
+        """Удалить клиента, если у него нет заказов (и отменённых, которые в сводку не входят)"""
+        has_orders = self.conn.execute("SELECT EXISTS (SELECT 1 FROM orders WHERE customer_id=?)",
+                                       (customer_id,)).fetchone()[0]
+        if has_orders:
+            raise ShopError("Нельзя удалить клиента с заказами")
+        self.conn.execute("DELETE FROM customers WHERE id=?", (customer_id,))
+        self.commit()
+    
+    # ========== ЗАКАЗЫ ==========
+    
+    def list_orders(self, status=None, start=None, end=None, after=None, limit=PAGE_SIZE):
+        """Страница заказов от новых к старым по id, с фильтрами по статусу и датам start..end включительно.
+        
+        after — последняя строка предыдущей страницы. Статус с датами отбирается
+        по индексу (status, order_date), только статус — по (status, id).
+        """
+        conditions, args = [], []
+        if status is not None:
+            conditions.append('o.status = ?')
+            args.append(status)
+        if start:
+            conditions.append('o.order_date >= ?')
+            args.append(start)
+        if end:
+            # order_date хранит и время: граница — начало следующего дня
+            conditions.append("o.order_date < date(?, '+1 day')")
+            args.append(end)
+        if after is not None:
+            conditions.append('o.id < ?')
+            args.append(after[0])
+        
+        sql = ORDERS_QUERY
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY o.id DESC LIMIT ?'
+        args.append(limit)
+        return self.conn.execute(sql, args)
+    
+    def get_order(self, order_id):
+        """Строка одного заказа или None"""
+        return self.conn.execute(ORDERS_QUERY + ' WHERE o.id = ?', (order_id,)).fetchone()
+    
+    def order_customer_id(self, order_id):
+        """Клиент заказа или None"""
+        row = self.conn.execute("SELECT customer_id FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return row[0] if row else None
+    
+    def order_items(self, order_id):
+        """Строки заказа: товар, количество, цена, сумма"""
+        return self.conn.execute('''
+            SELECT p.name, oi.quantity, oi.price_per_unit, oi.subtotal
+            FROM order_items oi
+            JOIN products p ON oi.product_id = p.id
+            WHERE oi.order_id = ?
+        ''', (order_id,)).fetchall()
+
+
+class OrderService:
+    """Оформление заказов и смена их статуса"""
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def place_order(self, customer_id, items, payment_method, status='Новый', cart=None):
+        """Оформить заказ одной транзакцией и вернуть его номер.
+        
+        items — строки корзины с ключами 'id', 'quantity' и 'price'.
+        Склад списывается только если хватает всех товаров с учётом
+        резервов других корзин; иначе транзакция откатывается и
+        выбрасывается OutOfStockError. Резервы корзины cart снимаются.
+        """
+        cursor = self.conn.cursor()
+        # IMMEDIATE сразу берёт блокировку записи: остатки не изменит
+        # другая касса, пока заказ не зафиксирован
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            order_id = self.add_order(cursor, customer_id, items, payment_method, status, cart)
+            self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        return order_id
+    
+    def add_order(self, cursor, customer_id, items, payment_method, status='Новый', cart=None):
+        """Записать заказ в уже открытой транзакции записи и вернуть его номер.
+        
+        Если товара не хватает, выбрасывает OutOfStockError, ничего не изменив;
+        при других ошибках откатить частично записанный заказ должен вызывающий.
+        """
+        required = {}
+        for item in items:
+            required[item['id']] = required.get(item['id'], 0) + item['quantity']
+        # В транзакции записи остатки и резервы никто не изменит между проверкой и списанием
+        shortages = self.find_shortages(required, cart)
+        if shortages:
+            raise OutOfStockError(shortages)
+        
+        # Условие stock >= ? не даёт остатку уйти в минус
+        cursor.executemany('''
+            UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?
+        ''', [(need, product_id, need) for product_id, need in required.items()])
+        if cursor.rowcount != len(required):
+            raise ShopError("Остаток изменился во время оформления заказа")
+        
+        cursor.execute('''
+            INSERT INTO orders (customer_id, order_date, total_amount, status, payment_method)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (
+            customer_id,
+            datetime.now().strftime("%Y-%m-%d %H:%M"),
+            sum(item['quantity'] * item['price'] for item in items),
+            status,
+            payment_method
+        ))
+        order_id = cursor.lastrowid
+        
+        cursor.executemany('''
+            INSERT INTO order_items (order_id, product_id, quantity, price_per_unit, subtotal)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(order_id, item['id'], item['quantity'], item['price'], item['quantity'] * item['price'])
+              for item in items])
+        if status != CANCELLED_STATUS:
+            apply_order_sales(cursor, order_id)
+        if cart is not None:
+            # Товар списан со склада — резервы корзины больше не нужны
+            cursor.execute("DELETE FROM reservations WHERE cart = ?", (cart,))
+        return order_id
+    
+    def find_shortages(self, required, cart=None):
+        """Строки, для которых не хватает доступного корзине cart: [(product_id, нужно, доступно)]"""
+        available = available_to_promise(self.conn, required, cart)
+        return [(product_id, need, max(0, available.get(product_id, 0)))
+                for product_id, need in required.items()
+                if available.get(product_id, 0) < need]
+    
+    def set_status(self, order_id, status):
+        """Изменить статус заказа; отмена вычитает заказ из сводок продаж, возврат из отмены — добавляет"""
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            self.change_status(cursor, order_id, status)
+            self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+    
+    def change_status(self, cursor, order_id, status):
+        """Изменить статус заказа в уже открытой транзакции записи"""
+        if status not in ORDER_STATUSES:
+            raise ShopError(f"Неизвестный статус заказа: {status}")
+        row = cursor.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+        if row is None:
+            raise ShopError(f"Заказ {order_id} не найден")
+        cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (status, order_id))
+        was_counted, counted = row[0] != CANCELLED_STATUS, status != CANCELLED_STATUS
+        if was_counted != counted:
+            apply_order_sales(cursor, order_id, 1 if counted else -1)
+
+
+class ReservationService:
+    """Резервы товаров корзины cart: пока касса собирает заказ, товар не продадут другие.
+    
+    Каждое изменение корзины продлевает все её резервы на ttl секунд; резервы
+    брошенной корзины (или упавшей кассы) истекают сами. Истёкшие строки
+    перестают учитываться сразу, а удаляются при следующем резервировании.
+    """
+    
+    def __init__(self, conn, cart, ttl=RESERVATION_TTL):
+        self.conn = conn
+        self.cart = cart
+        self.ttl = ttl
+    
+    def available(self, product_ids):
+        """Доступно этой корзине: {product_id: остаток − резервы других корзин}"""
+        return available_to_promise(self.conn, product_ids, self.cart)
+    
+    def held(self):
+        """Действующие резервы корзины: {product_id: количество}"""
+        return dict(self.conn.execute(
+            "SELECT product_id, quantity FROM reservations WHERE cart = ? AND expires_at > ?",
+            (self.cart, time.time())))
+    
+    def hold(self, product_id, quantity):
+        """Держать за корзиной quantity шт. товара (всего, 0 — снять резерв) и продлить её резервы.
+        
+        Если столько не доступно, выбрасывает OutOfStockError и ничего не меняет.
+        """
+        cursor = self.conn.cursor()
+        # IMMEDIATE: между проверкой доступного и записью резерв не возьмёт другая касса
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            cursor.execute("DELETE FROM reservations WHERE expires_at <= ?", (now,))
+            if quantity > 0:
+                available = self.available([product_id]).get(product_id, 0)
+                if available < quantity:
+                    raise OutOfStockError([(product_id, quantity, max(0, available))])
+                cursor.execute('''
+                    INSERT INTO reservations (cart, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (cart, product_id) DO UPDATE SET quantity = excluded.quantity
+                ''', (self.cart, product_id, quantity, now + self.ttl))
+            else:
+                cursor.execute("DELETE FROM reservations WHERE cart = ? AND product_id = ?", (self.cart, product_id))
+            cursor.execute("UPDATE reservations SET expires_at = ? WHERE cart = ?", (now + self.ttl, self.cart))
+            self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+    
+    def release(self):
+        """Снять все резервы корзины"""
+        try:
+            self.conn.execute("DELETE FROM reservations WHERE cart = ?", (self.cart,))
+            self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+
+
+# Группировка дневных сводок для отчёта о выручке: ключ периода по колонке day
+REPORT_PERIODS = {
+    'day': 'day',
+    'week': "date(day, '-6 days', 'weekday 1')",   # понедельник недели
+    'month': 'substr(day, 1, 7)',
+}
+
+
+def date_range(column, start, end):
+    """Условие и параметры для отбора column по датам start..end включительно (None — без границы)"""
+    conditions, params = ['1'], []
+    if start:
+        conditions.append(f'{column} >= ?')
+        params.append(start)
+    if end:
+        conditions.append(f'{column} <= ?')
+        params.append(end)
+    return ' AND '.join(conditions), params
+
+
+class ReportService:
+    """Отчёты о продажах по сводкам sales_*: время не зависит от числа заказов.
+    
+    Границы периода — строки 'ГГГГ-ММ-ДД' включительно. Отменённые заказы
+    не учитываются. Топ товаров сведён по месяцам, поэтому его границы
+    округляются до целых месяцев.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def revenue(self, period='day', start=None, end=None):
+        """Выручка по дням, неделям или месяцам: (период, заказов, единиц, выручка, средний чек)"""
+        if period not in REPORT_PERIODS:
+            raise ShopError(f"Неизвестный период отчёта: {period}")
+        where, params = date_range('day', start, end)
+        return self.conn.execute(f'''
+            SELECT {REPORT_PERIODS[period]} AS period, SUM(orders), SUM(units), SUM(revenue),
+                   SUM(revenue) / NULLIF(SUM(orders), 0)
+            FROM sales_daily
+            WHERE {where}
+            GROUP BY period
+            HAVING SUM(orders) > 0
+            ORDER BY period
+        ''', params).fetchall()
+    
+    def summary(self, start=None, end=None):
+        """Итог за период: (заказов, единиц, выручка, средний чек)"""
+        where, params = date_range('day', start, end)
+        return self.conn.execute(f'''
+            SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(units), 0), COALESCE(SUM(revenue), 0),
+                   COALESCE(SUM(revenue) / NULLIF(SUM(orders), 0), 0)
+            FROM sales_daily
+            WHERE {where}
+        ''', params).fetchone()
+    
+    def top_products(self, start=None, end=None, limit=10):
+        """Самые продаваемые по выручке товары: (id, название, единиц, выручка)"""
+        if not start and not end:
+            # За всё время — первые строки индекса по выручке
+            return self.conn.execute('''
+                SELECT s.product_id, COALESCE(p.name, 'Товар ' || s.product_id), s.units, s.revenue
+                FROM sales_product s
+                LEFT JOIN products p ON p.id = s.product_id
+                ORDER BY s.revenue DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        where, params = date_range('s.month', start and start[:7], end and end[:7])
+        return self.conn.execute(f'''
+            SELECT s.product_id, COALESCE(p.name, 'Товар ' || s.product_id), SUM(s.units), SUM(s.revenue)
+            FROM sales_monthly_product s
+            LEFT JOIN products p ON p.id = s.product_id
+            WHERE {where}
+            GROUP BY s.product_id
+            ORDER BY SUM(s.revenue) DESC
+            LIMIT ?
+        ''', params + [limit]).fetchall()
+    
+    def category_mix(self, start=None, end=None):
+        """Доли категорий в выручке: (категория, единиц, выручка, доля в %)"""
+        where, params = date_range('s.day', start, end)
+        return self.conn.execute(f'''
+            SELECT COALESCE(c.name, 'Без категории'), SUM(s.units), SUM(s.revenue),
+                   SUM(s.revenue) * 100.0 / NULLIF(SUM(SUM(s.revenue)) OVER (), 0)
+            FROM sales_daily_category s
+            LEFT JOIN categories c ON c.id = s.category_id
+            WHERE {where}
+            GROUP BY s.category_id
+            HAVING SUM(s.units) > 0
+            ORDER BY SUM(s.revenue) DESC
+        ''', params).fetchall()
+    
+    def payment_split(self, start=None, end=None):
+        """Выручка по способам оплаты: (способ, заказов, выручка, доля в %)"""
+        where, params = date_range('day', start, end)
+        return self.conn.execute(f'''
+            SELECT payment_method, SUM(orders), SUM(revenue),
+                   SUM(revenue) * 100.0 / NULLIF(SUM(SUM(revenue)) OVER (), 0)
+            FROM sales_daily
+            WHERE {where}
+            GROUP BY payment_method
+            HAVING SUM(orders) > 0
+            ORDER BY SUM(revenue) DESC
+        ''', params).fetchall()
@@ -0,0 +1,30 @@
+# tests/conftest.py
+"""Общие фикстуры: временная база магазина с тестовыми данными"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import connect, migrate
+from services import ShopRepository
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Путь к свежей базе со схемой последней версии и тестовыми данными"""
+    path = str(tmp_path / 'shop.db')
+    conn = connect(path)
+    migrate(conn)
+    ShopRepository(conn).add_test_data()
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = connect(db_path)
+    yield conn
+    conn.close()
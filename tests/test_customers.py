@@ -0,0 +1,12 @@
+# tests/test_customers.py
+from services import ShopRepository
+
+
+def test_blank_email_is_stored_as_null(conn):
+    repo = ShopRepository(conn)
+    first = repo.add_customer('Олег', 'Без почты', '', '')
+    second = repo.add_customer('Ольга', 'Без почты', '', '  ')
+    repo.update_customer(1, 'Иван', 'Петров', '', '')
+    emails = conn.execute("SELECT id, email FROM customers WHERE id IN (?, ?, 1) ORDER BY id",
+                          (first, second)).fetchall()
+    assert emails == [(1, None), (first, None), (second, None)]
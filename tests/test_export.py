@@ -0,0 +1,78 @@
+# tests/test_export.py
+import json
+import os
+
+import pytest
+
+import export
+from services import OrderService
+
+
+def place(conn):
+    OrderService(conn).place_order(1, [{'id': 1, 'quantity': 1, 'price': 1000.0}], 'Карта')
+
+
+def listing(out_dir):
+    return sorted(name for name in os.listdir(out_dir) if not name.startswith('.'))
+
+
+def test_full_export_replaces_increments(conn, tmp_path):
+    out_dir = str(tmp_path / 'export')
+    place(conn)
+    export.export_history(conn, out_dir, 'csv')
+    place(conn)
+    export.export_history(conn, out_dir, 'csv')
+    assert len([name for name in listing(out_dir) if name.startswith('orders_')]) == 2
+    
+    result = export.export_history(conn, out_dir, 'csv', full=True)
+    until = result['until']
+    assert listing(out_dir) == sorted([f'orders_000000001_{until:09d}.csv', f'order_items_000000001_{until:09d}.csv',
+                                       'products.csv', export.STATE_FILE])
+
+
+def test_failed_full_export_keeps_history(conn, tmp_path, monkeypatch):
+    out_dir = str(tmp_path / 'export')
+    place(conn)
+    export.export_history(conn, out_dir, 'csv')
+    place(conn)
+    export.export_history(conn, out_dir, 'csv')
+    before = listing(out_dir)
+    with open(os.path.join(out_dir, export.STATE_FILE), encoding='utf-8') as f:
+        state = json.load(f)
+    
+    def fail(conn, path, table, *args, **kwargs):
+        if table == 'order_items':
+            raise OSError('диск заполнен')
+        return real(conn, path, table, *args, **kwargs)
+    real = export.export_table
+    monkeypatch.setattr(export, 'export_table', fail)
+    with pytest.raises(OSError):
+        export.export_history(conn, out_dir, 'csv', full=True)
+    
+    assert os.listdir(out_dir) == [name for name in os.listdir(out_dir) if not name.startswith('.')]
+    assert listing(out_dir) == before
+    with open(os.path.join(out_dir, export.STATE_FILE), encoding='utf-8') as f:
+        assert json.load(f) == state
+
+
+def test_failed_incremental_export_leaves_no_chunk(conn, tmp_path, monkeypatch):
+    out_dir = str(tmp_path / 'export')
+    real = export.export_table
+    
+    def fail(conn, path, table, *args, **kwargs):
+        if table == 'order_items':
+            raise OSError('диск заполнен')
+        return real(conn, path, table, *args, **kwargs)
+    place(conn)
+    monkeypatch.setattr(export, 'export_table', fail)
+    with pytest.raises(OSError):
+        export.export_history(conn, out_dir, 'csv')
+    assert listing(out_dir) == []
+    
+    # Следующий запуск выгружает заказы заново одной порцией, без пересечений
+    monkeypatch.setattr(export, 'export_table', real)
+    place(conn)
+    result = export.export_history(conn, out_dir, 'csv')
+    assert [name for name in listing(out_dir) if name.startswith('orders_')] == [
+        f"orders_000000001_{result['until']:09d}.csv"]
+    assert sorted(os.listdir(out_dir)) == listing(out_dir)
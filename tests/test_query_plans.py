@@ -0,0 +1,29 @@
+# tests/test_query_plans.py
+import sqlite3
+
+import pytest
+
+from database import find_full_scans, migrate
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    """Пустая база со схемой последней версии"""
+    conn = sqlite3.connect(str(tmp_path / 'shop.db'))
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes(migrated):
+    assert find_full_scans(migrated) == []
+
+
+def test_scan_with_suffix_is_reported(migrated):
+    queries = [
+        ('bare', 'SELECT * FROM products p WHERE p.price > ?', (0,), ()),
+        ('index order', 'SELECT * FROM products p ORDER BY p.name', (), ()),
+        ('allowed', 'SELECT * FROM products p WHERE p.price > ?', (0,), ('p',)),
+        ('search', 'SELECT * FROM products p WHERE p.id = ?', (0,), ()),
+    ]
+    assert [name for name, detail in find_full_scans(migrated, queries)] == ['bare', 'index order']
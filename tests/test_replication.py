@@ -0,0 +1,46 @@
+# tests/test_replication.py
+"""Реплика совпадает с источником после заказов и массовой загрузки"""
+from database import CHANGE_TABLES, connect
+from importer import BulkImporter
+from replicate import Replicator
+from services import OrderService
+
+
+def dump(path):
+    """Строки таблиц журнала изменений по id"""
+    conn = connect(path)
+    try:
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in CHANGE_TABLES}
+    finally:
+        conn.close()
+
+
+def test_replica_matches_after_order(conn, db_path, tmp_path):
+    replica = str(tmp_path / 'replica.db')
+    Replicator(db_path, replica).close()
+    OrderService(conn).place_order(1, [{'id': 1, 'quantity': 1, 'price': 1000.0}], 'Карта')
+    
+    replicator = Replicator(db_path, replica)
+    assert replicator.sync() > 0
+    replicator.close()
+    assert dump(replica) == dump(db_path)
+
+
+def test_replica_matches_after_bulk_import(conn, db_path, tmp_path):
+    replica = str(tmp_path / 'replica.db')
+    Replicator(db_path, replica).close()
+    
+    products = tmp_path / 'products.csv'
+    products.write_text('Название,Цена,Количество,Категория\n'
+                        'Стол "Тест",1000,5,Столы\n'
+                        'Стул "Тест",500,10,Стулья\n', encoding='utf-8')
+    customers = tmp_path / 'customers.csv'
+    customers.write_text('Имя,Фамилия,Телефон,Email\nИван,Тестов,,\nПётр,Тестов,,\n', encoding='utf-8')
+    # rebuild=True снимает индексы и триггеры таблицы на время загрузки
+    assert BulkImporter(conn, 'products', rebuild=True).run(str(products))['inserted'] == 2
+    assert BulkImporter(conn, 'customers', rebuild=True).run(str(customers))['inserted'] == 2
+    
+    replicator = Replicator(db_path, replica)
+    assert replicator.sync() == 4
+    replicator.close()
+    assert dump(replica) == dump(db_path)
@@ -0,0 +1,133 @@
+# tests/test_reservations.py
+import itertools
+import sqlite3
+import threading
+
+import pytest
+
+import services
+from database import connect
+from services import OrderService, OutOfStockError, ReservationService
+
+STOCK = 50
+CASHIERS = 8
+
+
+@pytest.fixture
+def product(conn):
+    """Товар 1 с остатком STOCK"""
+    conn.execute("UPDATE products SET stock = ? WHERE id = 1", (STOCK,))
+    conn.commit()
+    return 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время для сроков резервов"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(services.time, 'time', lambda: now[0])
+    return now
+
+
+def run_cashiers(db_path, sell):
+    """CASHIERS потоков вызывают sell(conn, касса) до OutOfStockError; вернуть число продаж"""
+    sold = []
+    
+    def cashier(number):
+        own = connect(db_path, timeout=30)
+        try:
+            while True:
+                try:
+                    sell(own, number)
+                except OutOfStockError:
+                    break
+                sold.append(number)
+        finally:
+            own.close()
+    
+    threads = [threading.Thread(target=cashier, args=(number,)) for number in range(CASHIERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(sold)
+
+
+def test_concurrent_orders_do_not_oversell(conn, db_path, product):
+    sold = run_cashiers(db_path, lambda own, number: OrderService(own).place_order(
+        1, [{'id': product, 'quantity': 1, 'price': 1000.0}], 'Наличные'))
+    assert sold == STOCK
+    assert conn.execute("SELECT stock FROM products WHERE id = ?", (product,)).fetchone()[0] == 0
+
+
+def test_concurrent_holds_do_not_oversell(conn, db_path, product):
+    # Каждая продажа — своя корзина: резерв и оформление заказа по нему
+    carts = itertools.count()
+    
+    def sell(own, number):
+        reservations = ReservationService(own, f'касса {number}, корзина {next(carts)}')
+        reservations.hold(product, 1)
+        OrderService(own).place_order(1, [{'id': product, 'quantity': 1, 'price': 1000.0}], 'Карта',
+                                      cart=reservations.cart)
+    
+    assert run_cashiers(db_path, sell) == STOCK
+    assert conn.execute("SELECT stock FROM products WHERE id = ?", (product,)).fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] == 0
+
+
+def test_hold_is_reserved_for_other_carts(conn, product, clock):
+    first, second = ReservationService(conn, 'первая', ttl=60), ReservationService(conn, 'вторая', ttl=60)
+    first.hold(product, 30)
+    assert first.held() == {product: 30}
+    assert first.available([product]) == {product: STOCK}
+    assert second.available([product]) == {product: STOCK - 30}
+    with pytest.raises(OutOfStockError):
+        second.hold(product, STOCK - 29)
+    assert second.held() == {}
+    
+    first.hold(product, 0)
+    assert first.held() == {}
+    second.hold(product, STOCK)
+
+
+def test_expired_hold_is_released(conn, product, clock):
+    first, second = ReservationService(conn, 'первая', ttl=60), ReservationService(conn, 'вторая', ttl=60)
+    first.hold(product, STOCK)
+    clock[0] += 59
+    assert second.available([product]) == {product: 0}
+    
+    clock[0] += 1
+    assert first.held() == {}
+    assert second.available([product]) == {product: STOCK}
+    second.hold(product, STOCK)
+    assert conn.execute("SELECT cart FROM reservations").fetchall() == [('вторая',)]
+
+
+def test_hold_extends_whole_cart(conn, product, clock):
+    cart, other = ReservationService(conn, 'корзина', ttl=60), ReservationService(conn, 'другая', ttl=60)
+    cart.hold(product, 10)
+    clock[0] += 50
+    cart.hold(2, 1)
+    clock[0] += 50
+    assert cart.held() == {product: 10, 2: 1}
+    assert other.available([product]) == {product: STOCK - 10}
+
+
+def test_locked_database_keeps_holds(conn, db_path, product):
+    cart = ReservationService(conn, 'корзина', ttl=60)
+    cart.hold(product, 5)
+    cart.conn = connect(db_path)
+    cart.conn.execute('PRAGMA busy_timeout = 0')
+    other = connect(db_path)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            cart.hold(product, 0)
+        with pytest.raises(sqlite3.OperationalError):
+            cart.release()
+        assert not cart.conn.in_transaction
+    finally:
+        other.rollback()
+        other.close()
+        cart.conn.close()
+    assert ReservationService(conn, 'корзина').held() == {product: 5}
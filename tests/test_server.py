@@ -0,0 +1,56 @@
+# tests/test_server.py
+import asyncio
+import base64
+import json
+from http import HTTPStatus
+
+import pytest
+
+from server import ShopApi
+
+
+@pytest.fixture
+def api(db_path):
+    api = ShopApi(db_path, readers=1)
+    yield api
+    api.close()
+
+
+def call(api, method, target, body=None):
+    return asyncio.run(api.dispatch(method, target, json.dumps(body).encode() if body else b''))
+
+
+def cursor(row):
+    return base64.urlsafe_b64encode(json.dumps(row).encode()).decode()
+
+
+@pytest.mark.parametrize('target', ['/api/products', '/api/products?q=Дерево', '/api/orders'])
+@pytest.mark.parametrize('row', [[1], ['Стол', 1], [None] * 8, 'строка'])
+def test_bad_cursor_is_rejected(api, target, row):
+    separator = '&' if '?' in target else '?'
+    status, body = call(api, 'GET', f'{target}{separator}after={cursor(row)}')
+    assert status == HTTPStatus.BAD_REQUEST, body
+
+
+def test_product_pages_follow_cursor(api):
+    status, first = call(api, 'GET', '/api/products?limit=5')
+    assert status == HTTPStatus.OK and first['next']
+    status, second = call(api, 'GET', f"/api/products?limit=5&after={first['next']}")
+    assert status == HTTPStatus.OK
+    assert first['items'][-1]['name'] <= second['items'][0]['name']
+
+
+def test_search_keeps_category_filter(api):
+    status, body = call(api, 'GET', '/api/products?q=Дерево&category=Столы')
+    assert status == HTTPStatus.OK
+    assert [item['name'] for item in body['items']] == ['Стол обеденный']
+
+
+def test_status_of_order_without_customer(api, conn):
+    order_id = conn.execute("INSERT INTO orders (customer_id, total_amount, status, payment_method) "
+                            "VALUES (NULL, 0, 'Новый', 'Карта')").lastrowid
+    conn.commit()
+    status, body = call(api, 'PATCH', f'/api/orders/{order_id}', {'status': 'Доставлен'})
+    assert status == HTTPStatus.OK, body
+    status, body = call(api, 'PATCH', '/api/orders/999999', {'status': 'Доставлен'})
+    assert status == HTTPStatus.NOT_FOUND
@@ -0,0 +1,136 @@
+# worker.py
+"""Фоновый поток для запросов к базе данных, чтобы не блокировать интерфейс"""
+import queue
+import sqlite3
+import threading
+from itertools import islice
+
+from database import DB_PATH, DEFAULT_PROFILE, connect
+from render_profile import PROFILER
+
+# Сколько строк передавать в интерфейс за один раз
+CHUNK_SIZE = 200
+
+
+class Job:
+    """Запрос, поставленный в очередь фонового потока"""
+    
+    def __init__(self, query, on_chunk, on_done, on_error, key):
+        self.query = query
+        self.on_chunk = on_chunk
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+        self.cancelled = False
+        # Участки профилировщика, открытые при постановке: колбэки продолжают их
+        self.trace = PROFILER.stack()
+
+
+class DbWorker:
+    """Поток с собственным соединением: выполняет запросы и отдаёт строки частями.
+    
+    Колбэки вызываются в потоке Tk через root.after. Новая задача с тем же
+    ключом отменяет предыдущую: она снимается с очереди, а если уже
+    выполняется — прерывается через sqlite3_interrupt.
+    """
+    
+    def __init__(self, root, db_path=DB_PATH, profile=DEFAULT_PROFILE, chunk_size=CHUNK_SIZE, poll_ms=20,
+                 factory=sqlite3.Connection):
+        self.root = root
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.poll_ms = poll_ms
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.latest = {}      # key -> последняя поданная задача
+        self.running = None
+        self.lock = threading.Lock()
+        self.conn = connect(db_path, profile, check_same_thread=False, factory=factory)
+        self.thread = threading.Thread(target=self.run, name='db-worker', daemon=True)
+        self.thread.start()
+        self.poll_id = self.root.after(self.poll_ms, self.poll)
+    
+    def submit(self, query, on_chunk=None, on_done=None, on_error=None, key=None):
+        """Поставить запрос query(conn) -> итерируемые строки в очередь"""
+        job = Job(query, on_chunk, on_done, on_error, key)
+        if key is not None:
+            self.cancel(key)
+            self.latest[key] = job
+        self.jobs.put(job)
+        return job
+    
+    def cancel(self, key):
+        """Отменить последнюю задачу с этим ключом"""
+        job = self.latest.pop(key, None)
+        if job is None:
+            return
+        with self.lock:
+            job.cancelled = True
+            if self.running is job:
+                self.conn.interrupt()
+    
+    def run(self):
+        """Цикл фонового потока"""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            with self.lock:
+                if job.cancelled:
+                    continue
+                self.running = job
+            result = None
+            try:
+                with PROFILER.span(*job.trace, 'query'):
+                    result = job.query(self.conn)
+                    rows = iter(result)
+                    while not job.cancelled:
+                        chunk = list(islice(rows, self.chunk_size))
+                        if not chunk:
+                            break
+                        self.results.put((job, 'chunk', chunk))
+                self.results.put((job, 'done', None))
+            except Exception as e:
+                # Прерванный запрос отменённой задачи — не ошибка
+                if not job.cancelled:
+                    self.results.put((job, 'error', e))
+            finally:
+                # Закрываем курсор, чтобы не держать блокировку чтения
+                if hasattr(result, 'close'):
+                    result.close()
+                with self.lock:
+                    self.running = None
+    
+    def poll(self):
+        """Передать готовые результаты колбэкам в потоке Tk"""
+        try:
+            while True:
+                job, kind, payload = self.results.get_nowait()
+                if job.cancelled:
+                    continue
+                if kind != 'chunk' and self.latest.get(job.key) is job:
+                    del self.latest[job.key]
+                with PROFILER.span(*job.trace):
+                    if kind == 'chunk':
+                        if job.on_chunk:
+                            job.on_chunk(payload)
+                    elif kind == 'done':
+                        if job.on_done:
+                            job.on_done()
+                    elif job.on_error:
+                        job.on_error(payload)
+                    else:
+                        raise payload
+        except queue.Empty:
+            pass
+        finally:
+            self.poll_id = self.root.after(self.poll_ms, self.poll)
+    
+    def close(self):
+        """Остановить поток и закрыть соединение"""
+        self.root.after_cancel(self.poll_id)
+        for key in list(self.latest):
+            self.cancel(key)
+        self.jobs.put(None)
+        self.thread.join()
+        self.conn.close()
@@ -0,0 +1,128 @@
+# writer.py
+"""Единственный пишущий поток: изменения из любых потоков фиксируются общими транзакциями"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from database import DB_PATH, DEFAULT_PROFILE, connect
+from services import OrderService
+
+# Сколько ждать попутных изменений после первого в пачке, мс. При 0 в пачку идёт
+# то, что накопилось в очереди, пока фиксировалась предыдущая, — без лишней задержки
+GROUP_WINDOW_MS = 0
+
+# Наибольшее число изменений в одной транзакции
+MAX_BATCH = 256
+
+
+class GroupCommitWriter:
+    """Очередь изменений базы с групповой фиксацией.
+    
+    submit(mutation) ставит mutation(conn) в очередь и сразу возвращает
+    concurrent.futures.Future. Поток писателя открывает BEGIN IMMEDIATE,
+    выполняет накопившиеся изменения (каждое в своей точке сохранения:
+    ошибка одного откатывает только его) и фиксирует их одним COMMIT.
+    Результат становится доступен через Future только после фиксации.
+    Изменения не должны сами вызывать commit — для этого есть
+    ShopRepository(conn, autocommit=False) и OrderService.add_order.
+    """
+    
+    def __init__(self, db_path=DB_PATH, profile=DEFAULT_PROFILE, window_ms=GROUP_WINDOW_MS, max_batch=MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.committed = 0
+        self.conn = connect(db_path, profile, check_same_thread=False)
+        self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+        self.thread.start()
+    
+    def submit(self, mutation):
+        """Поставить mutation(conn) -> результат в очередь; вернуть Future"""
+        future = Future()
+        self.requests.put((mutation, future))
+        return future
+    
+    def place_order(self, customer_id, items, payment_method, status='Новый'):
+        """Оформить заказ; Future с его номером или OutOfStockError"""
+        return self.submit(lambda conn: OrderService(conn).add_order(
+            conn.cursor(), customer_id, items, payment_method, status))
+    
+    def set_status(self, order_id, status):
+        """Изменить статус заказа; Future с None"""
+        return self.submit(lambda conn: OrderService(conn).change_status(conn.cursor(), order_id, status))
+    
+    def run(self):
+        """Цикл потока: собрать пачку, выполнить, зафиксировать"""
+        closing = False
+        while not closing:
+            first = self.requests.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+            self.commit_batch(batch)
+    
+    def commit_batch(self, batch):
+        """Выполнить пачку в одной транзакции; Future получают результаты после COMMIT"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            for mutation, future in batch:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        
+        done = []
+        for mutation, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if not self.conn.in_transaction:
+                # Предыдущая ошибка откатила всю транзакцию — остальные не выполняются
+                future.set_exception(sqlite3.OperationalError("Транзакция пачки прервана"))
+                continue
+            cursor.execute('SAVEPOINT mutation')
+            try:
+                result = mutation(self.conn)
+            except Exception as e:
+                if self.conn.in_transaction:
+                    cursor.execute('ROLLBACK TO mutation')
+                    cursor.execute('RELEASE mutation')
+                future.set_exception(e)
+                continue
+            cursor.execute('RELEASE mutation')
+            done.append((future, result))
+        
+        try:
+            if self.conn.in_transaction:
+                self.conn.commit()
+            elif done:
+                raise sqlite3.OperationalError("Транзакция пачки прервана")
+        except sqlite3.Error as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            for future, result in done:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.committed += len(done)
+        for future, result in done:
+            future.set_result(result)
+    
+    def close(self):
+        """Выполнить уже поставленные изменения, остановить поток и закрыть соединение"""
+        self.requests.put(None)
+        self.thread.join()
+        self.conn.close()